@@ -1,17 +1,26 @@
-import tkinter as tk
-from tkinter import filedialog, scrolledtext, ttk
+import argparse
+import codecs
+import collections
+import contextlib
+import contextvars
+import gc
+import re
 import threading
 import os
 import sys
 import datetime
 import webbrowser
-import whisper
 import wave
 import json
-from vosk import Model, KaldiRecognizer
 import shutil
-from pydub.utils import which
-from pydub import AudioSegment
+import subprocess
+import tempfile
+import time
+import hashlib
+import sqlite3
+
+# Тяжёлые модули (tkinter, whisper, vosk, numpy) импортируются по месту использования,
+# чтобы консольный режим на серверах без дисплея стартовал быстро и не грузил лишний движок.
 
 
 # Автопуть для ffmpeg/ffprobe если приложение собрано
@@ -24,296 +33,3337 @@ else:
     ffmpeg_path = os.path.join(os.getcwd(), "ffmpeg", "ffmpeg.exe")
     ffprobe_path = os.path.join(os.getcwd(), "ffmpeg", "ffprobe.exe")
 
-AudioSegment.converter = ffmpeg_path
-AudioSegment.ffprobe = ffprobe_path
+# Бандл ffmpeg — только под Windows; на Linux/macOS серверах берём ffmpeg из PATH
+if os.name != "nt" or not os.path.exists(ffmpeg_path):
+    ffmpeg_path = shutil.which("ffmpeg") or "ffmpeg"
+if os.name != "nt" or not os.path.exists(ffprobe_path):
+    ffprobe_path = shutil.which("ffprobe") or "ffprobe"
+
+if getattr(sys, 'frozen', False):
+    base_path = sys._MEIPASS
+
+    # Обновляем PATH
+    os.environ['PATH'] = os.pathsep.join([
+        os.path.join(base_path, 'vosk'),
+        os.environ['PATH']
+    ])
+
+    # Для корректной работы Vosk DLL
+    try:
+        os.add_dll_directory(os.path.join(base_path, 'vosk'))
+    except (AttributeError, FileNotFoundError):
+        pass
+
+
+# Ensure mel_filters.npz is available
+if getattr(sys, 'frozen', False):
+    whisper_asset_path = os.path.join(sys._MEIPASS, "whisper", "assets", "mel_filters.npz")
+else:
+    whisper_asset_path = os.path.join(os.getcwd(), "whisper", "assets", "mel_filters.npz")
+
+os.environ["WHISPER_ASSETS"] = os.path.dirname(whisper_asset_path)
+
+
+MODELS_INFO = {
+    'tiny':   {'size': '75MB',  'speed': 5, 'quality': 1},
+    'base':   {'size': '142MB', 'speed': 5, 'quality': 1},
+    'small':  {'size': '456MB', 'speed': 4, 'quality': 2},
+    'medium': {'size': '1.5GB', 'speed': 3, 'quality': 4},
+    'large':  {'size': '2.9GB', 'speed': 1, 'quality': 5},
+}
+WHISPER_LANGUAGES = {
+    "🌐 Auto-detect": None,
+    "🇬🇧 English": "en",
+    "🇷🇺 Russian": "ru",
+    "🇫🇷 French": "fr",
+    "🇩🇪 German": "de",
+    "🇪🇸 Spanish": "es",
+    "🇮🇹 Italian": "it",
+    "🇨🇳 Chinese": "zh",
+    "🇯🇵 Japanese": "ja",
+    "🇰🇷 Korean": "ko",
+    "🇺🇦 Ukrainian": "uk",
+    "🇵🇱 Polish": "pl",
+    "🇧🇷 Portuguese": "pt",
+    "🇹🇷 Turkish": "tr"
+    # Добавляй по мере необходимости
+}
+
+# Точность весов Whisper на CPU: int8 — динамически квантованные линейные слои, bf16 — autocast энкодера и декодера
+WHISPER_PRECISIONS = ("fp32", "int8", "bf16")
+
+def model_label(name, precision="fp32"):
+    info = MODELS_INFO[name]
+    if precision != "fp32":
+        return f"{name.capitalize()} {precision} — {info['size']} в fp32 | CPU, пониженная точность"
+    return f"{name.capitalize()} — {info['size']} | Speed {info['speed']}/5 | Quality {info['quality']}/5"
+
+def parse_whisper_spec(spec):
+    # "small", "small:int8", "Small int8 — ..." (подпись из списка) -> ("small", "int8")
+    name, _, precision = spec.split(" — ")[0].strip().lower().replace(" ", ":").partition(":")
+    return name, precision or "fp32"
+
+def whisper_spec(name, precision="fp32"):
+    return name if precision == "fp32" else f"{name}:{precision}"
+
+SUPPORTED_EXT = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".mpeg", ".mpg")
+SAMPLE_RATE = 16000
+OUTPUT_FORMATS = ("txt", "json", "srt", "vtt")
+
+# Остановка: у каждого запуска (кнопка GUI, задание сервера) свой threading.Event. Функции распознавания
+# проверяют событие текущего запуска через cancel_requested(), так что параллельные запуски не мешают друг другу
+CANCEL = contextvars.ContextVar("vidtotxt_cancel", default=None)
+
+def cancel_requested():
+    cancel = CANCEL.get()
+    return (cancel is not None and cancel.is_set()) or worker_stop_requested()
+
+@contextlib.contextmanager
+def cancel_scope(cancel=None):
+    cancel = cancel or threading.Event()
+    token = CANCEL.set(cancel)
+    try:
+        yield cancel
+    finally:
+        CANCEL.reset(token)
+
+def submit_in_context(pool, fn, *args):
+    # Потоки пула не наследуют контекст: передаём его, чтобы cancel_requested() видел событие запуска
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+def find_video_files(paths, index=None, rescan=False):
+    # Принимает папку, файл или список папок/файлов
+    return [entry.path for entry in scan_media(paths, ("video",), index, rescan=rescan)]
+
+def error_log_dir(paths):
+    if isinstance(paths, str):
+        paths = [paths]
+    first = paths[0] if paths else os.getcwd()
+    return first if os.path.isdir(first) else os.path.dirname(os.path.abspath(first))
+
+class AudioExtractionError(RuntimeError):
+    pass
+
+def _subprocess_flags():
+    # Не показывать консольное окно ffmpeg в собранном exe
+    return subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+def open_wav_writer(wav_path):
+    wf = wave.open(wav_path, "wb")
+    wf.setnchannels(1)
+    wf.setsampwidth(2)
+    wf.setframerate(SAMPLE_RATE)
+    return wf
+
+def probe_duration(video_path):
+    cmd = [ffprobe_path, "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", video_path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, timeout=60, creationflags=_subprocess_flags())
+        return float(out.stdout.decode().strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+def stream_pcm(video_path, chunk_frames=4000, pcm_path=None, start=None, duration=None):
+    # ffmpeg декодирует видео в 16 kHz mono s16le и отдаёт PCM кусками через pipe,
+    # без промежуточного .wav и без загрузки всего файла в память.
+    # С pcm_path тот же PCM параллельно пишется в файл (см. AudioCache): файл появляется, только если ffmpeg
+    # дочитал видео до конца. start/duration (сек) — только этот отрезок
+    seek = ["-ss", f"{start:.6f}"] if start else []
+    limit = ["-t", f"{duration:.6f}"] if duration is not None else []
+    cmd = [ffmpeg_path, "-nostdin", "-v", "error", *seek, "-i", video_path, *limit, "-vn",
+           "-ac", "1", "-ar", str(SAMPLE_RATE), "-acodec", "pcm_s16le", "-f", "s16le", "-"]
+    chunk_bytes = chunk_frames * 2
+    # stderr во временный файл: pipe мог бы переполниться и подвесить ffmpeg
+    with tempfile.TemporaryFile() as err_file:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err_file, creationflags=_subprocess_flags())
+        except OSError as e:
+            raise AudioExtractionError(f"не удалось запустить ffmpeg: {e}")
+        out = part_path = None
+        completed = False
+        try:
+            if pcm_path:
+                fd, part_path = tempfile.mkstemp(prefix=".", suffix=".part",
+                                                 dir=os.path.dirname(os.path.abspath(pcm_path)))
+                out = os.fdopen(fd, "wb")
+            while True:
+                data = proc.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                if out:
+                    out.write(data)
+                yield data
+            if proc.wait() != 0:
+                err_file.seek(0)
+                err = err_file.read().decode("utf-8", errors="replace").strip()
+                raise AudioExtractionError(err or f"ffmpeg завершился с кодом {proc.returncode}")
+            completed = True
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            if out:
+                out.close()
+            if part_path:
+                if completed:
+                    os.replace(part_path, pcm_path)
+                elif os.path.exists(part_path):
+                    os.remove(part_path)
+
+def iter_wav_chunks(wav_path, chunk_frames=4000):
+    with wave.open(wav_path, "rb") as wf:
+        while True:
+            data = wf.readframes(chunk_frames)
+            if not data:
+                break
+            yield data
+
+def load_pcm_array(video_path, start=None, duration=None):
+    # Весь файл (или отрезок start/duration) как int16 массив 16 kHz (2 байта на сэмпл)
+    import numpy as np
+    buf = bytearray()
+    for data in stream_pcm(video_path, SAMPLE_RATE * 10, start=start, duration=duration):
+        buf += data
+    return np.frombuffer(buf, np.int16)
+
+def pcm_to_float(pcm):
+    # int16 -> float32 [-1, 1) для Whisper: одна копия, без промежуточного массива
+    import numpy as np
+    audio = pcm.astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+def load_audio_array(video_path):
+    # Аналог whisper.load_audio, но через наш ffmpeg
+    return pcm_to_float(load_pcm_array(video_path))
+
+def pcm_chunks(pcm, chunk_frames, start=0, end=None):
+    # Куски int16 массива (например, memmap из AudioCache) как bytes для KaldiRecognizer.
+    # Vosk принимает только bytes, поэтому копируется один кусок за раз, а не весь сигнал
+    end = len(pcm) if end is None else min(end, len(pcm))
+    for i in range(start, end, chunk_frames):
+        yield pcm[i:min(i + chunk_frames, end)].tobytes()
+
+def extract_audio(video_path, wav_path):
+    wf = open_wav_writer(wav_path)
+    try:
+        for data in stream_pcm(video_path, chunk_frames=SAMPLE_RATE * 10):
+            wf.writeframes(data)
+    finally:
+        wf.close()
+
+# --- VAD: поиск участков речи по энергии сигнала, тишина не распознаётся ---
+
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 10.0
+VAD_MIN_DB = -60.0
+VAD_SPEECH_HEADROOM_DB = 20.0
+VAD_MIN_SILENCE = 0.5
+VAD_MIN_SPEECH = 0.25
+VAD_PAD = 0.2
+VAD_MAX_REGION = 120.0
+
+def frame_energy_db(audio, frame_ms=VAD_FRAME_MS):
+    # Энергия кадров в dBFS; int16 обрабатывается блоками, без копии всего файла во float
+    import numpy as np
+    samples = np.asarray(audio)
+    frame = SAMPLE_RATE * frame_ms // 1000
+    n_frames = len(samples) // frame
+    scale = 32768.0 ** 2 if samples.dtype == np.int16 else 1.0
+    energy = np.empty(n_frames, dtype=np.float64)
+    block = 4096
+    for start in range(0, n_frames, block):
+        stop = min(n_frames, start + block)
+        frames = samples[start * frame:stop * frame].reshape(-1, frame).astype(np.float32)
+        energy[start:stop] = np.mean(frames * frames, axis=1) / scale
+    return 10.0 * np.log10(energy + 1e-12)
+
+def split_at_quiet(db, s, e, max_frames):
+    # Делит [s, e) (в кадрах) на куски не длиннее max_frames, разрез — по самому тихому кадру в конце куска
+    import numpy as np
+    parts = []
+    while e - s > max_frames:
+        window_start = s + int(max_frames * 0.7)
+        cut = window_start + int(np.argmin(db[window_start:s + max_frames]))
+        parts.append((s, cut))
+        s = cut
+    parts.append((s, e))
+    return parts
+
+def speech_regions(audio, frame_ms=VAD_FRAME_MS, margin_db=VAD_MARGIN_DB, min_silence=VAD_MIN_SILENCE,
+                   min_speech=VAD_MIN_SPEECH, pad=VAD_PAD, max_region=VAD_MAX_REGION):
+    # Возвращает [(начало, конец)] в сэмплах. Порог — уровень шума (10-й перцентиль) + margin_db,
+    # но не выше громких кадров (90-й перцентиль) - VAD_SPEECH_HEADROOM_DB: запись без пауз целиком остаётся речью.
+    # Паузы короче min_silence не режут речь, длинные участки делятся по самому тихому кадру
+    import numpy as np
+    db = frame_energy_db(audio, frame_ms)
+    if len(db) == 0:
+        return []
+    noise, loud = np.percentile(db, [10, 90])
+    threshold = max(min(noise + margin_db, loud - VAD_SPEECH_HEADROOM_DB), VAD_MIN_DB)
+    voiced = db > threshold
+    frame = SAMPLE_RATE * frame_ms // 1000
+    fps = 1000.0 / frame_ms
+
+    regions = []
+    start = None
+    silence = 0
+    max_gap = int(min_silence * fps)
+    for i, v in enumerate(voiced):
+        if v:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence > max_gap:
+                regions.append([start, i - silence + 1])
+                start = None
+                silence = 0
+    if start is not None:
+        regions.append([start, len(voiced) - silence])
+
+    pad_frames = int(pad * fps)
+    max_frames = int(max_region * fps)
+    min_frames = int(min_speech * fps)
+    result = []
+    for s, e in regions:
+        if e - s < min_frames:
+            continue
+        s = max(0, s - pad_frames)
+        e = min(len(db), e + pad_frames)
+        result.extend(split_at_quiet(db, s, e, max_frames))
+
+    # Соседние участки после расширения могут перекрыться — склеиваем
+    merged = []
+    for s, e in result:
+        if merged and s <= merged[-1][1]:
+            prev_s, prev_e = merged[-1]
+            if e - prev_s <= max_frames:
+                merged[-1] = (prev_s, max(e, prev_e))
+                continue
+            s = prev_e
+        if e > s:
+            merged.append((s, e))
+    return [(s * frame, min(len(audio), e * frame)) for s, e in merged if e > s]
+
+def split_windows(audio, regions=None, max_seconds=30.0, frame_ms=VAD_FRAME_MS):
+    # Окна не длиннее max_seconds из участков речи (или всего файла) с разрезами по тихим местам
+    db = frame_energy_db(audio, frame_ms)
+    frame = SAMPLE_RATE * frame_ms // 1000
+    if regions is None:
+        regions = [(0, len(audio))] if len(audio) else []
+    max_frames = int(max_seconds * 1000 / frame_ms)
+    windows = []
+    for start, end in regions:
+        for s, e in split_at_quiet(db, start // frame, -(-end // frame), max_frames):
+            windows.append((max(start, s * frame), min(end, e * frame)))
+    return [(s, e) for s, e in windows if e > s]
+
+def describe_regions(regions, total_samples):
+    speech = sum(e - s for s, e in regions)
+    share = 100 * speech / total_samples if total_samples else 0
+    return (f"🔇 VAD: речь {share:.0f}% ({datetime.timedelta(seconds=int(speech / SAMPLE_RATE))} из "
+            f"{datetime.timedelta(seconds=int(total_samples / SAMPLE_RATE))}), фрагментов: {len(regions)}")
+
+# --- Кэш результатов: ключ — быстрый хэш содержимого видео + движок, модель и параметры ---
+
+# 2 — в кэше фразы со словами и временем (см. TranscriptWriter), а не готовый текст
+CACHE_VERSION = 2
+CACHE_MAX_MB = 2048
+CACHE_MAX_AGE_DAYS = 180
+HASH_BLOCK = 256 * 1024
+
+def default_cache_dir():
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "VidToTXT")
+
+def content_hash(path):
+    # Размер + начало, середина и конец файла: переименованные и скопированные видео дают тот же хэш,
+    # а чтение занимает доли секунды даже для многочасовых записей на сетевом диске
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= HASH_BLOCK * 3:
+            h.update(f.read())
+        else:
+            for offset in (0, size // 2 - HASH_BLOCK // 2, size - HASH_BLOCK):
+                f.seek(offset)
+                h.update(f.read(HASH_BLOCK))
+    return h.hexdigest()
+
+def atomic_write_text(path, text):
+    # Пишем во временный файл рядом и подменяем: оборванный запуск не оставит половину .txt
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".part", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class TranscriptCache:
+    def __init__(self, path=None, max_mb=CACHE_MAX_MB, max_age_days=CACHE_MAX_AGE_DAYS):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "transcripts.sqlite")
+        elif os.path.isdir(path):
+            path = os.path.join(path, "transcripts.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY, content_hash TEXT, engine TEXT, model TEXT,
+                payload TEXT, size INTEGER, created REAL, accessed REAL);
+            CREATE INDEX IF NOT EXISTS transcripts_accessed ON transcripts(accessed);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime REAL, content_hash TEXT);
+        """)
+        self.evict()
+
+    def file_hash(self, video_path):
+        # Хэш пересчитывается только если файл изменился (размер или mtime)
+        path = os.path.abspath(video_path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime, content_hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            return row[2]
+        digest = content_hash(path)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, st.st_size, st.st_mtime, digest))
+        return digest
+
+    def key_for(self, video_path, engine, model, options):
+        # -> (ключ, хэш содержимого); хэш передаётся в put вместе с ключом
+        params = json.dumps([CACHE_VERSION, engine, model, options], sort_keys=True, ensure_ascii=False)
+        digest = self.file_hash(video_path)
+        return hashlib.blake2b((digest + params).encode("utf-8"), digest_size=20).hexdigest(), digest
+
+    def get(self, key):
+        with self._lock, self._db:
+            row = self._db.execute("SELECT payload FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE transcripts SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, payload, engine, model, digest=None):
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, digest, engine, model, data, len(data.encode("utf-8")), now, now))
+
+    def evict(self):
+        # Сначала старше max_age, затем самые давно использованные, пока размер не уложится в лимит
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM transcripts WHERE accessed < ?", (time.time() - self.max_age,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._db.execute("SELECT key, size FROM transcripts ORDER BY accessed").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._db.executemany("DELETE FROM transcripts WHERE key = ?", stale)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def open_transcript_cache(cache, log):
+    # cache: True — кэш по умолчанию, str — путь к файлу/папке, TranscriptCache — готовый, False/None — без кэша.
+    # Возвращает (кэш, нужно ли закрыть)
+    if not cache:
+        return None, False
+    if isinstance(cache, TranscriptCache):
+        return cache, False
+    try:
+        return TranscriptCache(cache if isinstance(cache, str) else None), True
+    except (OSError, sqlite3.Error) as e:
+        log(f"⚠️ Кэш недоступен, работаем без него: {e}")
+        return None, False
+
+def apply_transcript_cache(cache, video_files, engine, model, options, write, log, keys):
+    # Генератор: для найденных в кэше файлов сразу пишет результат, остальные отдаёт дальше.
+    # keys заполняется парами (ключ кэша, хэш содержимого) по мере проверки
+    hits = 0
+    left = 0
+    for video_path in video_files:
+        try:
+            key, digest = cache.key_for(video_path, engine, model, options)
+        except OSError as e:
+            log(f"    ⚠️ Не удалось вычислить хэш {video_path}: {e}")
+            left += 1
+            yield video_path
+            continue
+        keys[video_path] = key, digest
+        payload = cache.get(key)
+        if payload is not None and write(video_path, payload) == "ok":
+            hits += 1
+        else:
+            left += 1
+            yield video_path
+    if hits:
+        log(f"♻️ Взято из кэша: {hits}, осталось распознать: {left}")
+
+def cache_store(cache, keys, engine, model):
+    # Функция сохранения результата в кэш (или None без кэша)
+    if cache is None:
+        return None
+
+    def store(video_path, payload):
+        if video_path not in keys:
+            return
+        try:
+            key, digest = keys[video_path]
+            cache.put(key, payload, engine, model, digest)
+        except sqlite3.Error as e:
+            print(f"⚠️ Не удалось сохранить в кэш {video_path}: {e}")
+
+    return store
+
+def caching_writer(write, store, to_payload=None):
+    # to_payload(result) — что класть в кэш, если результат сам не сериализуется в JSON
+    if store is None:
+        return write
+
+    def write_and_store(video_path, payload):
+        # Запись для кэша берётся до write: у потокового результата черновики после записи удаляются
+        cached = to_payload(payload) if to_payload else payload
+        status = write(video_path, payload)
+        if status == "ok":
+            store(video_path, cached)
+        return status
+
+    return write_and_store
+
+# --- Кэш извлечённого аудио: один раз декодированное видео читают оба движка ---
+AUDIO_CACHE_MAX_MB = 8192
+# Недописанные .part старше суток — остатки упавших процессов
+AUDIO_CACHE_STALE_PART = 24 * 3600
+
+class AudioCache:
+    # Извлечённое аудио (16 kHz mono s16le без заголовка) по хэшу содержимого видео: <хэш>.pcm.
+    # Whisper и Vosk читают один и тот же файл через numpy.memmap без повторного запуска ffmpeg, так что
+    # сравнение движков на одной папке декодирует каждое видео один раз. Время последнего использования —
+    # mtime файла; сверх max_mb удаляются давно не использованные. Общий для процессов пула и запусков
+    def __init__(self, path=None, max_mb=AUDIO_CACHE_MAX_MB):
+        self.path = path or os.path.join(default_cache_dir(), "audio")
+        os.makedirs(self.path, exist_ok=True)
+        self.max_mb = max_mb
+
+    def file(self, key):
+        return os.path.join(self.path, key + ".pcm")
+
+    def load(self, key):
+        # int16 memmap только для чтения или None, если аудио нет в кэше
+        import numpy as np
+        path = self.file(key)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        if size < 2:
+            # Пустой файл не отображается в память
+            return np.zeros(0, np.int16)
+        return np.memmap(path, np.int16, mode="r", shape=(size // 2,))
+
+    def decode(self, video_path, key):
+        # ffmpeg пишет аудио прямо в файл кэша, весь сигнал в памяти не держится
+        for _ in stream_pcm(video_path, SAMPLE_RATE * 10, self.file(key)):
+            pass
+        self.evict(keep=key)
+        pcm = self.load(key)
+        return pcm if pcm is not None else load_pcm_array(video_path)
+
+    def get(self, video_path, key=None):
+        key = key or content_hash(video_path)
+        pcm = self.load(key)
+        return pcm if pcm is not None else self.decode(video_path, key)
+
+    def stream(self, video_path, key, chunk_frames):
+        # Куски PCM от ffmpeg для потокового распознавания; дочитанный до конца файл остаётся в кэше
+        yield from stream_pcm(video_path, chunk_frames, self.file(key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.path):
+            try:
+                st = entry.stat()
+                if entry.name.endswith(".part") and now - st.st_mtime > AUDIO_CACHE_STALE_PART:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+            if entry.name.endswith(".pcm") and entry.name[:-4] != keep:
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            with contextlib.suppress(OSError):
+                total += os.path.getsize(self.file(keep))
+        limit = self.max_mb * 1024 * 1024
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # На Windows файл, открытый через memmap другим запуском, удалить нельзя — удалим в следующий раз
+                continue
+
+    def clear(self):
+        # -> (число удалённых файлов, освобождено байт). Свежие .part пишет идущий сейчас запуск — их не трогаем
+        now = time.time()
+        count = freed = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith((".pcm", ".part")):
+                continue
+            try:
+                st = entry.stat()
+                if entry.name.endswith(".part") and now - st.st_mtime <= AUDIO_CACHE_STALE_PART:
+                    continue
+                size = st.st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            count += 1
+            freed += size
+        return count, freed
+
+def open_audio_cache(audio_cache, log, max_mb=AUDIO_CACHE_MAX_MB):
+    # Как open_folder_index: True — кэш по умолчанию, str — папка, AudioCache — готовый, False/None — без кэша
+    if not audio_cache:
+        return None
+    if isinstance(audio_cache, AudioCache):
+        return audio_cache
+    try:
+        return AudioCache(audio_cache if isinstance(audio_cache, str) else None, max_mb)
+    except OSError as e:
+        log(f"⚠️ Кэш аудио недоступен, декодируем без него: {e}")
+        return None
+
+def pool_audio_cache(options):
+    # В процессе пула кэш аудио открывается заново по папке из options
+    path = options.get("audio_cache")
+    return AudioCache(path, options.get("audio_cache_max_mb", AUDIO_CACHE_MAX_MB)) if path else None
+
+def audio_cache_options(audio_cache):
+    if audio_cache is None:
+        return {}
+    return {"audio_cache": audio_cache.path, "audio_cache_max_mb": audio_cache.max_mb}
+
+# --- Поиск файлов: os.scandir параллельно по подпапкам и постоянный индекс папок ---
+# Папка, у которой не изменился mtime (файлы не добавлялись, не удалялись и не переименовывались), повторно
+# не читается: её файлы берутся из индекса. Запись .txt рядом с видео меняет mtime папки, так что статусы
+# «уже обработан» в индексе не устаревают
+
+SCAN_JOBS = 8
+SCAN_COMMIT_DIRS = 500
+# На файловых системах с грубым mtime (FAT — 2 с) изменение сразу после чтения папки может его не сдвинуть:
+# такие папки в следующий раз читаются заново
+SCAN_MTIME_SLACK_NS = 2 * 10 ** 9
+
+# kind: video/txt/wav; status: для видео done (рядом есть .txt) или pending, для .txt/.wav — paired или orphan
+ScanEntry = collections.namedtuple("ScanEntry", "path size mtime_ns kind status")
+
+def media_kind(name):
+    lower = name.lower()
+    if lower.endswith(SUPPORTED_EXT):
+        return "video"
+    if lower.endswith(".txt"):
+        return "txt"
+    if lower.endswith(".wav"):
+        return "wav"
+    return None
+
+def media_status(kind, name, names, video_stems):
+    stem = os.path.normcase(os.path.splitext(name)[0])
+    if kind == "video":
+        return "done" if stem + ".txt" in names else "pending"
+    return "paired" if stem in video_stems else "orphan"
+
+def media_entry(path):
+    # Файл, указанный явно: статус по соседним файлам
+    kind = media_kind(path)
+    st = os.stat(path)
+    stem = os.path.splitext(path)[0]
+    if kind == "video":
+        status = "done" if os.path.exists(stem + ".txt") else "pending"
+    else:
+        status = "paired" if any(os.path.exists(stem + ext) for ext in SUPPORTED_EXT) else "orphan"
+    return ScanEntry(path, st.st_size, st.st_mtime_ns, kind, status)
+
+def list_media_dir(path):
+    # Один проход os.scandir: медиафайлы с размером и mtime и подпапки (ссылки на папки, как в os.walk,
+    # не раскрываются). Остальные файлы даже не stat-ятся
+    files = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.name)
+                    continue
+            except OSError:
+                continue
+            kind = media_kind(entry.name)
+            if kind is None:
+                continue
+            try:
+                st = entry.stat()
+                files.append((entry.name, st.st_size, st.st_mtime_ns, kind))
+            except OSError:
+                files.append((entry.name, -1, 0, kind))
+    names = {os.path.normcase(f[0]) for f in files}
+    video_stems = {os.path.normcase(os.path.splitext(f[0])[0]) for f in files if f[3] == "video"}
+    entries = [ScanEntry(os.path.join(path, name), size, mtime_ns, kind,
+                         media_status(kind, name, names, video_stems))
+               for name, size, mtime_ns, kind in sorted(files)]
+    return entries, sorted(subdirs)
+
+class FolderIndex:
+    # Для каждой прочитанной папки: её mtime, подпапки и медиафайлы (путь, размер, mtime, тип, статус)
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "scan-index.sqlite")
+        elif os.path.isdir(path):
+            path = os.path.join(path, "scan-index.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirs TEXT);
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY, dir TEXT, size INTEGER, mtime_ns INTEGER, kind TEXT, status TEXT);
+            CREATE INDEX IF NOT EXISTS entries_dir ON entries(dir);
+        """)
+
+    def lookup(self, path, mtime_ns):
+        # (записи, подпапки) или None, если папки нет в индексе или она изменилась
+        with self._lock:
+            row = self._db.execute("SELECT mtime_ns, subdirs FROM dirs WHERE path = ?", (path,)).fetchone()
+            if row is None or row[0] != mtime_ns:
+                return None
+            rows = self._db.execute("SELECT path, size, mtime_ns, kind, status FROM entries WHERE dir = ? "
+                                    "ORDER BY path", (path,)).fetchall()
+        return [ScanEntry(*r) for r in rows], json.loads(row[1])
+
+    def store(self, path, mtime_ns, entries, subdirs):
+        with self._lock:
+            row = self._db.execute("SELECT subdirs FROM dirs WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                for name in set(json.loads(row[0])) - set(subdirs):
+                    self._forget(os.path.join(path, name))
+            self._db.execute("DELETE FROM entries WHERE dir = ?", (path,))
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(e.path, path, e.size, e.mtime_ns, e.kind, e.status) for e in entries])
+            self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+                             (path, mtime_ns, json.dumps(subdirs, ensure_ascii=False)))
+            # Коммит пачками: на сотнях тысяч папок коммит на каждую стоил бы дороже самого чтения
+            self._uncommitted += 1
+            if self._uncommitted >= SCAN_COMMIT_DIRS:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def _forget(self, path):
+        # Удалённая подпапка: убираем её вместе со всем поддеревом
+        prefix = path + os.sep
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?", (path, len(prefix), prefix))
+        self._db.execute("DELETE FROM entries WHERE dir = ? OR substr(dir, 1, ?) = ?", (path, len(prefix), prefix))
+
+    def flush(self):
+        with self._lock:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+def open_folder_index(index, log):
+    # Как open_transcript_cache: True — индекс по умолчанию, str — путь, FolderIndex — готовый, False/None — без него
+    if not index:
+        return None, False
+    if isinstance(index, FolderIndex):
+        return index, False
+    try:
+        return FolderIndex(index if isinstance(index, str) else None), True
+    except (OSError, sqlite3.Error) as e:
+        log(f"⚠️ Индекс папок недоступен, просматриваем всё заново: {e}")
+        return None, False
+
+def scan_media(paths, kinds=("video",), index=None, jobs=SCAN_JOBS, rescan=False, stats=None):
+    # Генератор ScanEntry в порядке обхода в глубину: файлы папки по имени, затем подпапки по имени.
+    # Подпапки читаются в jobs потоках и заранее, пока вызывающий обрабатывает уже найденные файлы.
+    # rescan — перечитать все папки, не доверяя индексу. stats заполняется счётчиками dirs/listed/files
+    from concurrent.futures import ThreadPoolExecutor
+
+    if isinstance(paths, str):
+        paths = [paths]
+    if stats is None:
+        stats = {}
+    stats.update(dirs=0, listed=0, files=0)
+    pool = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="vidtotxt-scan")
+
+    def visit(path):
+        # -> (записи, futures подпапок, читалась ли папка с диска)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return [], [], False
+        cached = None if index is None or rescan else index.lookup(path, mtime_ns)
+        if cached is None:
+            try:
+                entries, subdirs = list_media_dir(path)
+            except OSError:
+                return [], [], False
+            if index is not None:
+                stable = time.time_ns() - mtime_ns >= SCAN_MTIME_SLACK_NS
+                index.store(path, mtime_ns if stable else -1, entries, subdirs)
+            listed = True
+        else:
+            entries, subdirs = cached
+            listed = False
+        children = []
+        for name in subdirs:
+            try:
+                children.append(pool.submit(visit, os.path.join(path, name)))
+            except RuntimeError:
+                # Пул уже закрыт: обход прерван
+                break
+        return entries, children, listed
+
+    try:
+        for path in paths:
+            if os.path.isfile(path):
+                if media_kind(path) in kinds:
+                    stats["files"] += 1
+                    yield media_entry(path)
+                continue
+            if not os.path.isdir(path):
+                continue
+            pending = [pool.submit(visit, os.path.abspath(path))]
+            while pending:
+                entries, children, listed = pending.pop().result()
+                stats["dirs"] += 1
+                stats["listed"] += listed
+                for entry in entries:
+                    if entry.kind in kinds:
+                        stats["files"] += 1
+                        yield entry
+                pending.extend(reversed(children))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if index is not None:
+            index.flush()
+
+def iter_videos(paths, index, rescan, skip_existing, log, stats=None):
+    # Видео по мере обхода папок; с skip_existing пропускаются те, для которых рядом уже есть .txt
+    stats = {} if stats is None else stats
+    for entry in scan_media(paths, ("video",), index, rescan=rescan, stats=stats):
+        if skip_existing and entry.status == "done":
+            log(f"    ⏭️ Пропущен (уже есть .txt): {os.path.splitext(entry.path)[0]}.txt")
+            continue
+        yield entry.path
+    log(f"🔎 Найдено файлов: {stats['files']} (папок: {stats['dirs']}, прочитано заново: {stats['listed']})")
+
+class FileFeed:
+    # Список файлов, который наполняется в фоновом потоке: обработка начинается с первыми найденными файлами,
+    # а поиск и проверка кэша идут параллельно с ней. Итерироваться можно несколько раз
+    def __init__(self, source, log, name="vidtotxt-scan-feed"):
+        self._items = []
+        self._done = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._fill, source, log),
+                                        name=name, daemon=True)
+        self._thread.start()
+
+    def _fill(self, source, log):
+        try:
+            for item in source:
+                with self._cond:
+                    if self._closed:
+                        break
+                    self._items.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            log(f"⚠️ Ошибка при поиске файлов: {e}")
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            with self._cond:
+                while idx >= len(self._items) and not self._done:
+                    self._cond.wait()
+                if idx >= len(self._items) or self._closed:
+                    return
+                item = self._items[idx]
+            idx += 1
+            yield item
+
+    def __bool__(self):
+        # Ждёт первый файл или окончания поиска
+        with self._cond:
+            while not self._items and not self._done:
+                self._cond.wait()
+            return bool(self._items)
+
+    def total(self):
+        # Число файлов, когда поиск закончен, иначе None
+        with self._cond:
+            return len(self._items) if self._done else None
+
+    def close(self):
+        # Прерывает поиск; цепочка FileFeed поверх этого (например, проверка кэша) тоже заканчивается
+        with self._cond:
+            self._closed = True
+            self._done = True
+            self._cond.notify_all()
+
+def file_total(video_files):
+    # Для announce: "?" пока папки ещё просматриваются
+    if isinstance(video_files, FileFeed):
+        total = video_files.total()
+        return "?" if total is None else total
+    return len(video_files)
+
+
+# --- summary.txt и поиск по транскриптам ---
+# summary.txt собирается инкрементально: транскрипты с прежними размером и mtime копируются кусками из прошлой
+# сводки по смещениям из манифеста, заново читаются только новые и изменённые. Фразы с временем хранятся
+# в полнотекстовом индексе SQLite FTS5, общем для всех папок
+
+SUMMARY_CHUNK = 64 * 1024
+SEGMENT_LINE = re.compile(r"^\[(\d+(?::\d{1,2}){0,2}(?:\.\d+)?)\]\s*(.*)$")
+
+def parse_timestamp(text):
+    # "0:01:05" (Whisper) или "65.3" (Vosk) -> секунды
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def is_transcript_header(line, txt_path):
+    # Транскрипты начинаются с "# имя.mp4" (Whisper) или "# имя | Длительность: ..." (Vosk):
+    # посторонний .txt рядом с одноимённым видео в сводку не попадает
+    prefix = "# " + os.path.splitext(os.path.basename(txt_path))[0]
+    line = line.lstrip("\ufeff").rstrip("\r\n")
+    if not line.startswith(prefix):
+        return False
+    rest = line[len(prefix):]
+    return rest.startswith(" |") or rest.lower() in SUPPORTED_EXT
+
+class SegmentParser:
+    # Куски байт транскрипта -> фразы (начало в секундах, текст); строки без времени пропускаются
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+        self.segments = []
+
+    def feed(self, data, final=False):
+        lines = (self._tail + self._decoder.decode(data, final)).split("\n")
+        self._tail = "" if final else lines.pop()
+        for line in lines:
+            match = SEGMENT_LINE.match(line.strip())
+            if match and match.group(2):
+                self.segments.append((parse_timestamp(match.group(1)), match.group(2)))
+
+def fts_query(text):
+    # Слова запроса по префиксу ("лекци" найдёт «лекция», «лекции»), все должны встретиться во фразе
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in re.findall(r"\w+", text))
+
+class TranscriptIndex:
+    # Манифест сводки каждой папки (порядок, размер/mtime/хэш транскрипта, смещение в summary.txt)
+    # и фразы всех транскриптов с полнотекстовым поиском
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "transcripts-index.sqlite")
+        elif os.path.isdir(path):
+            path = os.path.join(path, "transcripts-index.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS summaries (folder TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+            CREATE TABLE IF NOT EXISTS manifest (
+                folder TEXT, position INTEGER, path TEXT, size INTEGER, mtime_ns INTEGER, hash TEXT,
+                offset INTEGER, length INTEGER, PRIMARY KEY (folder, position));
+            CREATE TABLE IF NOT EXISTS docs (path TEXT PRIMARY KEY, hash TEXT);
+            CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, path TEXT, start REAL, text TEXT);
+            CREATE INDEX IF NOT EXISTS segments_path ON segments(path);
+            CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, content='segments', content_rowid='id');
+            CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+                INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+                INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+        """)
+
+    def manifest(self, folder):
+        # -> ((размер, mtime_ns) сводки или None, [строки манифеста по порядку])
+        with self._lock:
+            summary = self._db.execute("SELECT size, mtime_ns FROM summaries WHERE folder = ?", (folder,)).fetchone()
+            rows = self._db.execute("SELECT path, size, mtime_ns, hash, offset, length FROM manifest "
+                                    "WHERE folder = ? ORDER BY position", (folder,)).fetchall()
+        keys = ("path", "size", "mtime_ns", "hash", "offset", "length")
+        return summary, [dict(zip(keys, row)) for row in rows]
+
+    def save_manifest(self, folder, size, mtime_ns, rows):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (folder, size, mtime_ns))
+            self._db.execute("DELETE FROM manifest WHERE folder = ?", (folder,))
+            self._db.executemany("INSERT INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [(folder, pos, r["path"], r["size"], r["mtime_ns"], r["hash"], r["offset"],
+                                   r["length"]) for pos, r in enumerate(rows)])
+
+    def doc_hash(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM docs WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def replace_segments(self, path, digest, segments):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM segments WHERE path = ?", (path,))
+            self._db.executemany("INSERT INTO segments (path, start, text) VALUES (?, ?, ?)",
+                                 [(path, start, text) for start, text in segments])
+            self._db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?)", (path, digest))
+
+    def forget(self, paths):
+        with self._lock, self._db:
+            for path in paths:
+                self._db.execute("DELETE FROM segments WHERE path = ?", (path,))
+                self._db.execute("DELETE FROM docs WHERE path = ?", (path,))
+
+    def search(self, query, folder=None, limit=20):
+        # -> [(путь транскрипта, начало фразы в секундах, фрагмент с [выделением])], лучшие совпадения первыми
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ("SELECT s.path, s.start, snippet(segments_fts, 0, '[', ']', '…', 16) FROM segments_fts "
+               "JOIN segments s ON s.id = segments_fts.rowid WHERE segments_fts MATCH ?")
+        params = [match]
+        if folder:
+            prefix = os.path.join(os.path.abspath(folder), "")
+            sql += " AND substr(s.path, 1, ?) = ?"
+            params += [len(prefix), prefix]
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def open_transcript_index(index, log):
+    # Как open_transcript_cache: True — индекс по умолчанию, str — путь, TranscriptIndex — готовый
+    if not index:
+        return None, False
+    if isinstance(index, TranscriptIndex):
+        return index, False
+    try:
+        return TranscriptIndex(index if isinstance(index, str) else None), True
+    except (OSError, sqlite3.Error) as e:
+        log(f"⚠️ Индекс транскриптов недоступен, summary.txt собирается целиком без поиска: {e}")
+        return None, False
+
+def copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(SUMMARY_CHUNK, length))
+        if not chunk:
+            raise OSError("прошлая сводка короче, чем записано в манифесте")
+        dst.write(chunk)
+        length -= len(chunk)
+
+def append_transcript(entry, out, search_index):
+    # Дописывает транскрипт в сводку кусками по SUMMARY_CHUNK, попутно считая хэш и разбирая фразы.
+    # Возвращает строку манифеста; offset None — файл не транскрипт и в сводку не попал
+    row = {"path": entry.path, "size": entry.size, "mtime_ns": entry.mtime_ns, "hash": None,
+           "offset": None, "length": None}
+    digest = hashlib.blake2b(digest_size=20)
+    parser = SegmentParser()
+    with open(entry.path, "rb") as f:
+        first = f.readline(SUMMARY_CHUNK)
+        if not is_transcript_header(first.decode("utf-8", "replace"), entry.path):
+            return row
+        row["offset"] = out.tell()
+        name = os.path.basename(entry.path)
+        out.write(f"{os.linesep}{os.linesep}--- {name} ---{os.linesep}".encode("utf-8"))
+        chunk = first
+        while chunk:
+            out.write(chunk)
+            digest.update(chunk)
+            parser.feed(chunk)
+            chunk = f.read(SUMMARY_CHUNK)
+    parser.feed(b"", final=True)
+    row["length"] = out.tell() - row["offset"]
+    row["hash"] = digest.hexdigest()
+    if search_index is not None and search_index.doc_hash(entry.path) != row["hash"]:
+        search_index.replace_segments(entry.path, row["hash"], parser.segments)
+    return row
+
+def merge_transcripts(base_folder, log, folder_index=True, search_index=True):
+    # Собирает summary.txt в папке из транскриптов в порядке обхода. Возвращает путь к сводке или None
+    folder = os.path.abspath(base_folder)
+    summary_path = os.path.join(folder, "summary.txt")
+    folder_index, close_folder_index = open_folder_index(folder_index, log)
+    search_index, close_search_index = open_transcript_index(search_index, log)
+    try:
+        entries = []
+        for entry in scan_media(folder, ("txt",), folder_index):
+            if entry.status != "paired" or entry.path == summary_path:
+                continue
+            # Индекс папок не видит правку файла на месте (mtime папки не меняется): размер и mtime
+            # транскрипта берём заново — один stat всё равно дешевле чтения файла
+            try:
+                st = os.stat(entry.path)
+            except OSError:
+                continue
+            entries.append(entry._replace(size=st.st_size, mtime_ns=st.st_mtime_ns))
+        summary, old_rows = search_index.manifest(folder) if search_index is not None else (None, [])
+        try:
+            st = os.stat(summary_path)
+            reusable = summary is not None and (st.st_size, st.st_mtime_ns) == tuple(summary)
+        except OSError:
+            reusable = False
+        if reusable and [(e.path, e.size, e.mtime_ns) for e in entries] == \
+                [(r["path"], r["size"], r["mtime_ns"]) for r in old_rows]:
+            log(f"\n📄 summary.txt не изменился: {summary_path}")
+            return summary_path
+
+        known = {r["path"]: r for r in old_rows}
+        rows = []
+        copied = read = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".part", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as out, \
+                    (open(summary_path, "rb") if reusable else contextlib.nullcontext()) as prev:
+                for entry in entries:
+                    row = known.get(entry.path)
+                    if row and (row["size"], row["mtime_ns"]) == (entry.size, entry.mtime_ns) and \
+                            (prev is not None or row["offset"] is None):
+                        if row["offset"] is not None:
+                            offset = out.tell()
+                            copy_range(prev, out, row["offset"], row["length"])
+                            row = dict(row, offset=offset)
+                        rows.append(row)
+                        copied += 1
+                        continue
+                    offset = out.tell()
+                    try:
+                        rows.append(append_transcript(entry, out, search_index))
+                        read += 1
+                    except OSError as e:
+                        out.seek(offset)
+                        out.truncate()
+                        log(f"⚠️ Не удалось прочитать {entry.path}: {e}")
+            os.replace(tmp_path, summary_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if search_index is not None:
+            st = os.stat(summary_path)
+            search_index.save_manifest(folder, st.st_size, st.st_mtime_ns, rows)
+            current = {r["path"] for r in rows}
+            search_index.forget([p for p in known if p not in current and not os.path.exists(p)])
+        merged = sum(1 for r in rows if r["offset"] is not None)
+        log(f"\n📄 Файл summary.txt сохранён в: {summary_path}")
+        log(f"    Транскриптов: {merged} (прочитано заново: {read}, без изменений: {copied})")
+        return summary_path
+    except (OSError, sqlite3.Error) as e:
+        log(f"⚠️ Не удалось собрать summary.txt: {e}")
+        return None
+    finally:
+        if close_folder_index:
+            folder_index.close()
+        if close_search_index:
+            search_index.close()
+
+
+def transcribe_regions_whisper(audio, model, transcribe_args, regions):
+    # Каждый участок речи распознаётся отдельно, времена сдвигаются к началу файла.
+    # Модель Whisper не потокобезопасна, поэтому участки идут по очереди; язык фиксируется по первому
+    # участку, а хвост предыдущего текста подаётся как подсказка для связности
+    segments = []
+    args = dict(transcribe_args)
+    for start, end in regions:
+        if cancel_requested():
+            break
+        offset = start / SAMPLE_RATE
+        result = model.transcribe(audio[start:end], **args)
+        if not args.get("language") and result.get("language"):
+            args["language"] = result["language"]
+        for segment in result.get("segments", []):
+            segment["start"] += offset
+            segment["end"] += offset
+            for word in segment.get("words", []):
+                word["start"] += offset
+                word["end"] += offset
+            segments.append(segment)
+        if result.get("text"):
+            args["initial_prompt"] = result["text"][-200:]
+    return {"segments": segments, "language": args.get("language")}
+
+# --- Пакетное декодирование Whisper: 30-секундные окна нескольких участков/файлов одним тензором ---
+
+WHISPER_WINDOW = 30.0
+
+def tokens_to_segments(tokens, tokenizer, offset, window_end):
+    # Разбор токенов-меток времени <|t|> текст <|t|> в сегменты с абсолютным временем
+    segments = []
+    start = None
+    last = offset
+    text_tokens = []
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            last = offset + (token - tokenizer.timestamp_begin) * 0.02
+            if text_tokens:
+                segments.append({"start": last if start is None else start, "end": last,
+                                 "text": tokenizer.decode(text_tokens)})
+                text_tokens = []
+                start = None
+            else:
+                start = last
+        elif token < tokenizer.eot:
+            if not text_tokens and start is None:
+                start = last
+            text_tokens.append(token)
+    if text_tokens:
+        segments.append({"start": start, "end": window_end, "text": tokenizer.decode(text_tokens)})
+    return segments
+
+def decode_whisper_windows(model, items, language=None):
+    # items: [(audio, начало, конец)] в сэмплах -> список сегментов на каждое окно.
+    # Без перебора температур и контекста предыдущего окна, как в model.transcribe — ради размера пакета
+    import torch
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[s:e]), model.dims.n_mels)
+        for audio, s, e in items
+    ]).to(model.device)
+    options = whisper.DecodingOptions(task="transcribe", language=language, without_timestamps=False,
+                                      fp16=model.device.type == "cuda")
+    with torch.no_grad():
+        results = whisper.decode(model, mel, options)
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task="transcribe")
+    windows = []
+    for (audio, s, e), res in zip(items, results):
+        if res.no_speech_prob > 0.6 and res.avg_logprob < -1.0:
+            windows.append([])
+            continue
+        windows.append(tokens_to_segments(res.tokens, tokenizer, s / SAMPLE_RATE, e / SAMPLE_RATE))
+    return windows
+
+def windows_language(model, audio, windows):
+    # Язык файла по первым LANG_SAMPLE_SECONDS его окон (только речь, если окна из VAD). Определяется один раз
+    # на файл: иначе каждое окно выбирало бы язык само и один файл распознавался бы вперемешку
+    import numpy as np
+    sample = []
+    left = LANG_SAMPLE_SECONDS * SAMPLE_RATE
+    for s, e in windows:
+        if left <= 0:
+            break
+        sample.append(audio[s:min(e, s + left)])
+        left -= len(sample[-1])
+    return detect_language(model, np.concatenate(sample))[0]
+
+def transcribe_windows_whisper(audio, model, language, windows, batch_size):
+    if language is None and windows:
+        language = windows_language(model, audio, windows)
+    segments = []
+    for i in range(0, len(windows), batch_size):
+        if cancel_requested():
+            break
+        batch = [(audio, s, e) for s, e in windows[i:i + batch_size]]
+        for window_segments in decode_whisper_windows(model, batch, language):
+            segments.extend(window_segments)
+    return {"segments": segments, "language": language}
+
+class WhisperBatcher:
+    # Копит окна нескольких файлов и декодирует их пакетами по batch_size; в пакете — окна одного языка.
+    # Без заданного языка он определяется один раз на файл (см. windows_language).
+    # on_done(key, transcript) вызывается, когда готовы все окна файла (transcript=None — ошибка)
+    def __init__(self, model, language, batch_size, on_done):
+        self.model = model
+        self.language = language
+        self.batch_size = batch_size
+        self.on_done = on_done
+        self._pending = []
+        self._results = {}
+        self._remaining = {}
+        self._meta = {}
+
+    def add(self, key, audio, windows):
+        duration = round(len(audio) / SAMPLE_RATE, 2)
+        language = self.language or (windows_language(self.model, audio, windows) if windows else None)
+        if not windows:
+            self.on_done(key, whisper_transcript([], duration, language))
+            return
+        self._results[key] = [None] * len(windows)
+        self._remaining[key] = len(windows)
+        self._meta[key] = (duration, language)
+        for i, (s, e) in enumerate(windows):
+            self._pending.append((key, i, audio, s, e, language))
+        while len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def finish(self):
+        while self._pending:
+            self._flush()
+
+    def _flush(self):
+        # Самое старое окно в очереди и следующие за ним окна того же языка
+        language = self._pending[0][5]
+        batch, rest = [], []
+        for item in self._pending:
+            (batch if len(batch) < self.batch_size and item[5] == language else rest).append(item)
+        self._pending = rest
+        started = time.perf_counter()
+        try:
+            with whisper_inference_context(self.model):
+                decoded = decode_whisper_windows(self.model, [(audio, s, e) for _, _, audio, s, e, _ in batch],
+                                                 language)
+        except Exception as e:
+            print(f"⚠️ Ошибка в Whisper: {e}")
+            failed = {key for key, *_ in batch}
+            self._pending = [item for item in self._pending if item[0] not in failed]
+            for key in failed:
+                self._results.pop(key, None)
+                self._remaining.pop(key, None)
+                self._meta.pop(key, None)
+                self.on_done(key, None)
+            return
+        # Время пакета делится между файлами по числу их окон в нём
+        elapsed = time.perf_counter() - started
+        for key, count in collections.Counter(key for key, *_ in batch).items():
+            METRICS.add(key, "transcribe", elapsed * count / len(batch))
+        for (key, i, *_), window_segments in zip(batch, decoded):
+            if key not in self._results:
+                continue
+            self._results[key][i] = window_segments
+            self._remaining[key] -= 1
+            if self._remaining[key] == 0:
+                parts = self._results.pop(key)
+                del self._remaining[key]
+                duration, language = self._meta.pop(key)
+                self.on_done(key, whisper_transcript([seg for part in parts for seg in part], duration, language))
+
+
+# --- Форматы результата: txt, json (фразы + слова с уверенностью), srt, vtt ---
+# Фраза — {"start", "end", "text", "words": [{"word", "start", "end", "conf"}]}, время в секундах
+
+def parse_formats(spec):
+    # "srt,vtt" -> ("txt", "srt", "vtt"): .txt пишется всегда — по нему работают --skip-existing и сводка
+    formats = ["txt"]
+    for fmt in (spec or "").replace(" ", "").lower().split(","):
+        if not fmt or fmt in formats:
+            continue
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"неизвестный формат: {fmt}")
+        formats.append(fmt)
+    return tuple(formats)
+
+def subtitle_time(seconds, separator):
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    return f"{hours:02d}:{minutes:02d}:{ms // 1000:02d}{separator}{ms % 1000:03d}"
+
+def txt_line(engine, segment):
+    if engine == "whisper":
+        return f"[{datetime.timedelta(seconds=int(segment['start']))}] {segment['text']}"
+    return f"[{segment['start']:.1f}] {segment['text']}"
+
+def txt_header(engine, video_path, duration):
+    if engine == "whisper":
+        return f"# {os.path.basename(video_path)}\n\n"
+    return f"# {os.path.basename(os.path.splitext(video_path)[0])} | Длительность: {duration} сек\n"
+
+def transcript_text(transcript):
+    # Текст .txt без заголовка
+    return "\n".join(txt_line(transcript["engine"], segment) for segment in transcript["segments"])
+
+FORMAT_HEADS = {"json": '{"segments":[', "vtt": "WEBVTT\n\n"}
+
+def render_segment(fmt, engine, number, segment):
+    if fmt == "txt":
+        line = txt_line(engine, segment)
+        return line if number == 1 else "\n" + line
+    if fmt == "json":
+        data = json.dumps(segment, ensure_ascii=False, separators=(",", ":"))
+        return data if number == 1 else "," + data
+    separator = "," if fmt == "srt" else "."
+    cue = (f"{subtitle_time(segment['start'], separator)} --> {subtitle_time(segment['end'], separator)}\n"
+           f"{segment['text']}\n\n")
+    return f"{number}\n{cue}" if fmt == "srt" else cue
+
+class TranscriptWriter:
+    # Все форматы пишутся за один проход: каждая фраза сразу дописывается в черновики рядом с видео, поэтому
+    # память не растёт с длиной записи. Черновик JSON есть всегда — из него берётся запись для кэша.
+    # close() дописывает концовки, commit() атомарно подменяет файлы результата, discard() удаляет черновики
+    def __init__(self, video_path, engine, formats=("txt",)):
+        self.video_path = video_path
+        self.engine = engine
+        self.formats = formats
+        self.base_path = os.path.splitext(video_path)[0]
+        self.txt_path = self.base_path + ".txt"
+        self.duration = None
+        self.segments = 0
+        self.words = 0
+        self._parts = {}
+        self._files = {}
+        folder = os.path.dirname(os.path.abspath(video_path))
+        try:
+            for fmt in dict.fromkeys(formats + ("json",)):
+                fd, self._parts[fmt] = tempfile.mkstemp(prefix=".", suffix=".part", dir=folder)
+                self._files[fmt] = os.fdopen(fd, "w", encoding="utf-8")
+                self._files[fmt].write(FORMAT_HEADS.get(fmt, ""))
+        except BaseException:
+            self.discard()
+            raise
+
+    def add(self, segments):
+        for segment in segments:
+            self.segments += 1
+            self.words += len(segment.get("words", ()))
+            for fmt, f in self._files.items():
+                f.write(render_segment(fmt, self.engine, self.segments, segment))
+
+    def close(self, duration, language=None):
+        self.duration = duration
+        meta = {"engine": self.engine, "duration": duration}
+        if language:
+            meta["language"] = language
+        self._files["json"].write("]," + json.dumps(meta, ensure_ascii=False, separators=(",", ":"))[1:])
+        for f in self._files.values():
+            f.close()
+        # Без открытых файлов объект можно вернуть из процесса пула
+        self._files = {}
+
+    def transcript(self):
+        # Результат целиком ({"segments", "engine", "duration"}) — до commit(), пока черновик JSON на месте
+        with open(self._parts["json"], encoding="utf-8") as f:
+            return json.load(f)
+
+    def commit(self):
+        # Возвращает пути записанных файлов; .txt получает заголовок с длительностью
+        written = []
+        try:
+            for fmt in self.formats:
+                target = f"{self.base_path}.{fmt}"
+                if fmt == "txt":
+                    self._commit_txt(target)
+                else:
+                    os.replace(self._parts[fmt], target)
+                written.append(target)
+        finally:
+            self.discard()
+        return written
+
+    def _commit_txt(self, target):
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".part", dir=os.path.dirname(os.path.abspath(target)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as out, open(self._parts["txt"], encoding="utf-8") as body:
+                out.write(txt_header(self.engine, self.video_path, self.duration))
+                shutil.copyfileobj(body, out)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def discard(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        for path in self._parts.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self._parts = {}
+
+def write_transcript(video_path, transcript, formats=("txt",)):
+    # Результат, уже целиком находящийся в памяти (Whisper, кэш, Vosk с VAD) -> файлы всех форматов
+    writer = TranscriptWriter(video_path, transcript["engine"], formats)
+    try:
+        writer.add(transcript["segments"])
+        writer.close(transcript.get("duration"), transcript.get("language"))
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.commit()
+
+def describe_written(paths):
+    extra = [os.path.splitext(p)[1] for p in paths[1:]]
+    return paths[0] + (f" (+ {', '.join(extra)})" if extra else "")
+
+def whisper_segments(segments):
+    # Сегменты Whisper -> фразы с точным временем и словами (probability -> conf)
+    phrases = []
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        phrase = {"start": round(float(segment["start"]), 3), "end": round(float(segment["end"]), 3), "text": text}
+        words = [{"word": w["word"].strip(), "start": round(float(w["start"]), 3), "end": round(float(w["end"]), 3),
+                  "conf": round(float(w.get("probability", 0.0)), 3)} for w in segment.get("words") or ()]
+        if words:
+            phrase["words"] = words
+        phrases.append(phrase)
+    return phrases
+
+def whisper_transcript(segments, duration=None, language=None):
+    return {"engine": "whisper", "duration": duration, "language": language, "segments": whisper_segments(segments)}
+
+def transcribe_audio_whisper(audio, model, language=None, regions=None, batch_size=1):
+    # audio — путь к файлу или float32 массив 16 kHz (см. load_audio_array);
+    # regions — участки речи от speech_regions, тогда тишина не распознаётся;
+    # batch_size > 1 — окна файла декодируются пакетами (только для массива).
+    # Возвращает результат для TranscriptWriter или None при ошибке
+    try:
+        transcribe_args = {'verbose': False, "word_timestamps": True}
+        if language:
+            transcribe_args["language"] = language
+        with whisper_inference_context(model):
+            if batch_size > 1 and not isinstance(audio, str):
+                windows = split_windows(audio, regions, WHISPER_WINDOW)
+                result = transcribe_windows_whisper(audio, model, language, windows, batch_size)
+            elif regions is not None:
+                result = transcribe_regions_whisper(audio, model, transcribe_args, regions)
+            else:
+                result = model.transcribe(audio, **transcribe_args)
+        return whisper_transcript(result.get("segments", []), language=result.get("language") or language)
+    except Exception as e:
+        print(f"⚠️ Ошибка в Whisper: {e}")
+        return None
+
+
+
+def decode_whisper_audio(video_path, audio_cache=None):
+    if audio_cache is None:
+        return load_audio_array(video_path)
+    return pcm_to_float(audio_cache.get(video_path))
+
+def run_whisper_stage(video_path, get_audio, model, log, lang_code=None, vad=False, batch_size=1):
+    # Извлечение аудио и распознавание одного файла. Возвращает результат (см. whisper_transcript) или None
+    try:
+        log("    🎧 Вытаскивание аудио...")
+        audio = get_audio()
+        log("    🎧 Аудио успешно извлечено.")
+    except Exception as e:
+        log(f"    ⚠️ Ошибка при извлечении аудио: {e}")
+        return None
+
+    try:
+        METRICS.note(video_path, audio_seconds=round(len(audio) / SAMPLE_RATE, 2))
+        regions = None
+        if vad:
+            regions = METRICS.timed(video_path, "vad", speech_regions, audio)
+            log("    " + describe_regions(regions, len(audio)))
+        log("    🖋️ Транскрибация аудио...")
+        with METRICS.stage(video_path, "transcribe"):
+            transcript = transcribe_audio_whisper(audio, model, lang_code, regions, batch_size)
+        if transcript is None:
+            log(f"    ⚠️ Не удалось получить текст для {video_path}")
+        else:
+            transcript["duration"] = round(len(audio) / SAMPLE_RATE, 2)
+        del audio
+        return transcript
+    except Exception as e:
+        log(f"    ⚠️ Ошибка транскрипции: {e}")
+        return None
+
+def write_whisper_result(video_path, transcript, log, formats=("txt",)):
+    txt_path = os.path.splitext(video_path)[0] + ".txt"
+    try:
+        written = write_transcript(video_path, transcript, formats)
+        log(f"    ✅ Текст сохранён в: {describe_written(written)}")
+    except Exception as e:
+        log(f"    ⚠️ Ошибка записи {txt_path}: {e}")
+        return "error"
+    return "ok"
+
+def queue_whisper_batch(video_path, get_audio, batcher, log, vad=False):
+    # Пакетный режим: окна файла уходят в общий пакет, текст придёт в on_done батчера
+    try:
+        log("    🎧 Вытаскивание аудио...")
+        audio = get_audio()
+        log("    🎧 Аудио успешно извлечено.")
+    except Exception as e:
+        log(f"    ⚠️ Ошибка при извлечении аудио: {e}")
+        return None
+    try:
+        METRICS.note(video_path, audio_seconds=round(len(audio) / SAMPLE_RATE, 2))
+        regions = None
+        if vad:
+            regions = METRICS.timed(video_path, "vad", speech_regions, audio)
+            log("    " + describe_regions(regions, len(audio)))
+        windows = split_windows(audio, regions, WHISPER_WINDOW)
+        log(f"    🖋️ В очередь пакетной транскрибации: окон {len(windows)}")
+        METRICS.note(video_path, pending=True)
+        batcher.add(video_path, audio, windows)
+    except Exception as e:
+        log(f"    ⚠️ Ошибка транскрипции: {e}")
+        METRICS.note(video_path, pending=False)
+    return None
+
+def transcribe_file_whisper(video_path, model, log, lang_code=None, audio_cache=None, vad=False, batch_size=1,
+                            formats=("txt",)):
+    # Обработка одного видео: аудио -> фразы -> .txt и другие форматы. Возвращает (статус "ok"/"error", результат)
+    transcript = run_whisper_stage(video_path, lambda: METRICS.timed(video_path, "decode", decode_whisper_audio, video_path,
+                                                               audio_cache),
+                             model, log, lang_code, vad, batch_size)
+    if transcript is None:
+        METRICS.finish(video_path, "error")
+        return "error", None
+    status = METRICS.timed(video_path, "write", write_whisper_result, video_path, transcript, log, formats)
+    METRICS.finish(video_path, status)
+    return status, transcript
+
+
+def process_videos_whisper(base_folder, model_key, log, skip_existing, lang_code, audio_cache=False,
+                           workers=1, threads_per_worker=None, decode_ahead=2, write_queue=4, cache=True, vad=False,
+                           batch_size=1, index=True, rescan=False, formats=("txt",), cancel=None):
+    # cancel — threading.Event запуска: set() останавливает обработку (кнопка «Остановить», отмена задания).
+    # audio_cache — кэш извлечённого аудио (см. open_audio_cache)
+    with cancel_scope(cancel) as cancel:
+        model_name = whisper_spec(*parse_whisper_spec(model_key))
+
+        # Файлы отдаются по мере обхода папок: распознавание первого начинается, пока остальные ещё ищутся
+        index, close_index = open_folder_index(index, log)
+        scan_stats = {}
+        video_files = FileFeed(iter_videos(base_folder, index, rescan, skip_existing, log, scan_stats), log)
+        if not video_files and not scan_stats.get("files"):
+            log("❌ Видео-файлы не найдены.")
+            if close_index:
+                index.close()
+            return
+
+        cache, close_cache = open_transcript_cache(cache, log)
+        audio_cache = open_audio_cache(audio_cache, log)
+        run = METRICS.begin_run("whisper", model_name, workers)
+        try:
+            process_whisper_files(video_files, model_name, log, lang_code, audio_cache, workers, threads_per_worker,
+                                  decode_ahead, write_queue, cache, vad, batch_size, formats)
+        finally:
+            METRICS.end_run(run, cancel.is_set())
+            video_files.close()
+            if close_cache:
+                cache.close()
+            if close_index:
+                index.close()
+
+
+def process_whisper_files(video_files, model_name, log, lang_code, audio_cache, workers, threads_per_worker,
+                          decode_ahead, write_queue, cache, vad=False, batch_size=1, formats=("txt",)):
+    def write(video_path, transcript):
+        return write_whisper_result(video_path, transcript, log, formats)
+
+    keys = {}
+    if cache is not None:
+        video_files = FileFeed(apply_transcript_cache(cache, video_files, "whisper", model_name,
+                                                      {"language": lang_code, "vad": vad, "batched": batch_size > 1},
+                                                      write, log, keys), log, "vidtotxt-cache-check")
+    if not video_files:
+        log("\n✅ Все видео обработаны.")
+        return
+    store = cache_store(cache, keys, "whisper", model_name)
+    write = caching_writer(write, store)
+
+    if workers > 1:
+        # Пулу нужен полный список: дожидаемся конца поиска
+        video_files = list(video_files)
+    if workers > 1 and len(video_files) > 1:
+        options = {"lang_code": lang_code, "vad": vad, "batch_size": batch_size, "formats": formats,
+                   "metrics": METRICS.enabled, **audio_cache_options(audio_cache)}
+        stopped = run_worker_pool("whisper", model_name, video_files, log, workers, threads_per_worker,
+                                  options, cancel_requested, store=store)
+        if stopped:
+            log("⛔ Процесс остановлен.")
+            return
+        log("\n✅ Все видео обработаны.")
+        return
+
+    with MODELS.lease("whisper", model_name, log=log) as model:
+        def announce(idx, total, video_path):
+            log(f"\n🔄 [{idx}/{total}] Обработка файла:")
+            log(f"    📄 {video_path}")
+
+        batcher = None
+        ready = None
+        if batch_size > 1:
+            # Готовые файлы пакета пишет поток записи конвейера, как и остальные
+            ready = collections.deque()
+
+            def on_batch_done(video_path, transcript):
+                if transcript is None:
+                    log(f"    ⚠️ Не удалось получить текст для {video_path}")
+                    METRICS.finish(video_path, "error")
+                    return
+                ready.append((video_path, transcript))
+
+            log(f"📦 Пакетное декодирование: до {batch_size} окон по {int(WHISPER_WINDOW)} с за проход")
+            batcher = WhisperBatcher(model, lang_code, batch_size, on_batch_done)
+
+            def transcribe(video_path, get_audio):
+                return queue_whisper_batch(video_path, get_audio, batcher, log, vad)
+        else:
+            def transcribe(video_path, get_audio):
+                return run_whisper_stage(video_path, get_audio, model, log, lang_code, vad)
+
+        stopped = run_pipeline(
+            video_files,
+            announce,
+            lambda video_path: decode_whisper_audio(video_path, audio_cache),
+            transcribe,
+            write,
+            cancel_requested,
+            decode_ahead, write_queue,
+            finish=batcher.finish if batcher is not None else None,
+            ready=ready,
+        )
+    if stopped:
+        log("⛔ Процесс остановлен.")
+        return
+
+    log("\n✅ Все видео обработаны.")
+
+
+# Запуски из окна: движок -> события остановки всех активных запусков. Повторное нажатие «Обработка» во время
+# запуска начинает ещё один, а «Остановить» останавливает их все
+GUI_RUNS = {"whisper": set(), "vosk": set()}
+
+def start_gui_run(engine, target, args, kwargs):
+    cancel = threading.Event()
+    GUI_RUNS[engine].add(cancel)
+
+    def run():
+        try:
+            target(*args, cancel=cancel, **kwargs)
+        finally:
+            GUI_RUNS[engine].discard(cancel)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def stop_gui_runs(engine):
+    for cancel in list(GUI_RUNS[engine]):
+        cancel.set()
+
+def start_process_whisper(video_path, model_key, log, stop_button, skip_existing, language_ui, audio_cache=False,
+                          workers=1, use_cache=True, vad=False):
+    stop_button.config(state='normal')
+    lang_code = WHISPER_LANGUAGES.get(language_ui)
+    start_gui_run("whisper", process_videos_whisper,
+                  (video_path, model_key, log, skip_existing, lang_code, audio_cache, workers),
+                  {"cache": use_cache, "vad": vad})
+
+
+
+def stop_process_whisper():
+    stop_gui_runs("whisper")
+
+# Сколько секунд аудио отдавать KaldiRecognizer за один вызов AcceptWaveform
+VOSK_FEED_SECONDS = 2.0
+
+def vosk_feed_frames(feed_seconds=VOSK_FEED_SECONDS):
+    return max(1000, int(feed_seconds * SAMPLE_RATE))
+
+def transcribe_audio_vosk(audio, model, log, total_frames=None, on_words=None, feed_seconds=VOSK_FEED_SECONDS):
+    # audio — путь к .wav или итератор PCM-кусков 16 kHz s16le (см. stream_pcm).
+    # Готовые фразы (AcceptWaveform вернул True) забираются через Result() сразу; с on_words они передаются
+    # туда и не копятся в памяти, иначе возвращаются списком в result["result"]
+    from vosk import KaldiRecognizer
+    if isinstance(audio, str):
+        with wave.open(audio, "rb") as wf:
+            total_frames = wf.getnframes()
+        audio = iter_wav_chunks(audio, vosk_feed_frames(feed_seconds))
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+    rec.SetWords(True)
+    words = []
+
+    def collect(raw):
+        utterance = json.loads(raw).get("result", [])
+        if on_words is not None:
+            on_words(utterance)
+        else:
+            words.extend(utterance)
+
+    read = 0
+    last_percent = -1
+    try:
+        for data in audio:
+            if cancel_requested():
+                log("\n❌ Процесс остановлен пользователем.")
+                return None
+            if rec.AcceptWaveform(data):
+                collect(rec.Result())
+            read += len(data) // 2
+            if total_frames:
+                percent = min(100, int(read / total_frames * 100))
+                if percent != last_percent:
+                    log(f"    🟩 Прогресс транскрипции: {percent}%", overwrite=True)
+                    last_percent = percent
+            else:
+                seconds = read // (SAMPLE_RATE * 10) * 10
+                if seconds != last_percent:
+                    log(f"    🟩 Обработано аудио: {seconds} сек", overwrite=True)
+                    last_percent = seconds
+    finally:
+        if hasattr(audio, "close"):
+            audio.close()
+    collect(rec.FinalResult())
+    log("\n    ✅ Распознавание завершено.")
+    return {"result": words, "duration": round(read / SAMPLE_RATE, 1)}
+
+class SentenceFormatter:
+    # Слова Vosk -> фразы {"start", "end", "text", "words"}, новая фраза после паузы длиннее pause_threshold.
+    # Слова можно подавать частями: feed() возвращает уже законченные фразы
+    def __init__(self, pause_threshold=0.8):
+        self.pause_threshold = pause_threshold
+        self._words = []
+        self._last_end = 0
+
+    def feed(self, words):
+        phrases = []
+        for word in words:
+            if word['start'] - self._last_end > self.pause_threshold and self._words:
+                phrases.append(self._flush())
+            self._words.append(word)
+            self._last_end = word['end']
+        return phrases
+
+    def finish(self):
+        return [self._flush()] if self._words else []
+
+    def _flush(self):
+        words, self._words = self._words, []
+        return {"start": words[0]['start'], "end": words[-1]['end'],
+                "text": ' '.join(w['word'] for w in words), "words": words}
+
+def vosk_transcript(result, pause_threshold=0.8):
+    # Результат Vosk со словами ({"result", "duration"}) -> фразы для TranscriptWriter
+    formatter = SentenceFormatter(pause_threshold)
+    return {"engine": "vosk", "duration": result.get("duration"),
+            "segments": formatter.feed(result.get("result", [])) + formatter.finish()}
+
+def format_transcription(result, pause_threshold=0.8):
+    return transcript_text(vosk_transcript(result, pause_threshold))
+
+def vosk_cache_payload(result):
+    # В кэш — фразы со словами; у потокового результата они читаются из черновика JSON, поэтому до записи
+    if isinstance(result, TranscriptWriter):
+        return result.transcript()
+    return result if "segments" in result else vosk_transcript(result)
+
+def recognize_region_vosk(model, pcm, start, end):
+    # Отдельный распознаватель на участок; слова сдвигаются к началу файла. None — остановлено
+    from vosk import KaldiRecognizer
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+    rec.SetWords(True)
+    data = pcm[start:end].tobytes()
+    step = SAMPLE_RATE * 2 * 10
+    words = []
+    for i in range(0, len(data), step):
+        if cancel_requested():
+            return None
+        if rec.AcceptWaveform(data[i:i + step]):
+            words.extend(json.loads(rec.Result()).get("result", []))
+    words.extend(json.loads(rec.FinalResult()).get("result", []))
+    offset = start / SAMPLE_RATE
+    for word in words:
+        word["start"] = round(word["start"] + offset, 3)
+        word["end"] = round(word["end"] + offset, 3)
+    return words
+
+def transcribe_regions_vosk(pcm, model, log, regions, jobs=None):
+    # Участки речи распознаются параллельно независимыми KaldiRecognizer на общей модели
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    jobs = jobs or os.cpu_count() or 1
+    words_by_region = [None] * len(regions)
+    done = 0
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="vosk") as pool:
+        futures = {submit_in_context(pool, recognize_region_vosk, model, pcm, s, e): i
+                   for i, (s, e) in enumerate(regions)}
+        for future in as_completed(futures):
+            words = future.result()
+            if words is None:
+                log("\n❌ Процесс остановлен пользователем.")
+                return None
+            words_by_region[futures[future]] = words
+            done += 1
+            log(f"    🟩 Прогресс транскрипции: {int(done / len(regions) * 100)}%", overwrite=True)
+    log("\n    ✅ Распознавание завершено.")
+    words = [w for region_words in words_by_region for w in region_words]
+    return {"result": words, "text": " ".join(w["word"] for w in words),
+            "duration": round(len(pcm) / SAMPLE_RATE, 1)}
+
+# --- Один длинный файл на несколько ядер: отрезки по тихим местам, у каждого свой KaldiRecognizer и свой ffmpeg ---
+
+VOSK_MIN_SPAN_SECONDS = 120
+VOSK_CUT_SEARCH_SECONDS = 20
+
+def quietest_point(video_path, around, search=VOSK_CUT_SEARCH_SECONDS, pcm=None):
+    # Самое тихое место (сек) в окне search вокруг around: декодируется только это окно
+    # (или берётся срез pcm, если аудио уже в кэше)
+    import numpy as np
+    start = max(0.0, around - search / 2)
+    if pcm is not None:
+        window = pcm[int(start * SAMPLE_RATE):int((start + search) * SAMPLE_RATE)]
+    else:
+        window = load_pcm_array(video_path, start=start, duration=search)
+    db = frame_energy_db(window)
+    if len(db) == 0:
+        return around
+    # Сглаживание ~0.3 с, чтобы резать в паузе, а не в провале между слогами
+    smooth = max(1, 300 // VAD_FRAME_MS)
+    db = np.convolve(db, np.ones(smooth) / smooth, mode="same")
+    return start + (int(np.argmin(db)) + 0.5) * VAD_FRAME_MS / 1000
+
+def plan_vosk_spans(video_path, duration, spans, min_span=VOSK_MIN_SPAN_SECONDS, pcm=None):
+    # [(начало, конец)] в секундах; конец последнего отрезка — None (до конца файла)
+    spans = min(spans, int(duration // min_span))
+    if spans <= 1:
+        return [(0.0, None)]
+    cuts = [quietest_point(video_path, duration * i / spans, pcm=pcm) for i in range(1, spans)]
+    bounds = [0.0] + sorted(cuts)
+    return [(bounds[i], bounds[i + 1] if i + 1 < len(bounds) else None) for i in range(len(bounds))]
+
+def recognize_span_vosk(model, video_path, start, end, feed_seconds, progress, stop_requested, pcm=None):
+    # Слова отрезка со сдвигом к началу файла; progress(сэмплы) — после каждого куска. None — остановлено.
+    # pcm — аудио из кэша: отрезок читается срезами без своего ffmpeg
+    from vosk import KaldiRecognizer
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+    rec.SetWords(True)
+    words = []
+    if pcm is not None:
+        chunks = pcm_chunks(pcm, vosk_feed_frames(feed_seconds), int(start * SAMPLE_RATE),
+                            None if end is None else int(end * SAMPLE_RATE))
+    else:
+        chunks = stream_pcm(video_path, vosk_feed_frames(feed_seconds), start=start,
+                            duration=None if end is None else end - start)
+    try:
+        for data in chunks:
+            if stop_requested():
+                return None
+            if rec.AcceptWaveform(data):
+                words.extend(json.loads(rec.Result()).get("result", []))
+            progress(len(data) // 2)
+    finally:
+        chunks.close()
+    words.extend(json.loads(rec.FinalResult()).get("result", []))
+    for word in words:
+        word["start"] = round(word["start"] + start, 3)
+        word["end"] = round(word["end"] + start, 3)
+    return words
+
+def transcribe_spans_vosk(video_path, model, log, spans, total_frames=None, feed_seconds=VOSK_FEED_SECONDS,
+                          pcm=None):
+    # Отрезки распознаются параллельно на общей модели (Kaldi отпускает GIL), слова склеиваются по порядку
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+    lock = threading.Lock()
+    read = [0]
+    failed = threading.Event()
+
+    def progress(frames):
+        with lock:
+            read[0] += frames
+
+    def stop_requested():
+        return failed.is_set() or cancel_requested()
+
+    log(f"    🧩 Отрезков для параллельного распознавания: {len(spans)}")
+    with ThreadPoolExecutor(max_workers=len(spans), thread_name_prefix="vidtotxt-vosk-span") as pool:
+        futures = [submit_in_context(pool, recognize_span_vosk, model, video_path, s, e, feed_seconds, progress,
+                                     stop_requested, pcm)
+                   for s, e in spans]
+        last_percent = -1
+        pending = futures
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+            if total_frames:
+                percent = min(100, int(read[0] / total_frames * 100))
+                if percent != last_percent:
+                    log(f"    🟩 Прогресс транскрипции: {percent}%", overwrite=True)
+                    last_percent = percent
+            if any(f.exception() is not None for f in done):
+                # Ошибка одного отрезка (например, ffmpeg) останавливает остальные
+                failed.set()
+                break
+    # Исключение отрезка пробрасывается отсюда
+    results = [f.result() for f in futures]
+    if any(words is None for words in results):
+        log("\n❌ Процесс остановлен пользователем.")
+        return None
+    log("\n    ✅ Распознавание завершено.")
+    words = [w for span_words in results for w in span_words]
+    return {"result": words, "duration": round(read[0] / SAMPLE_RATE, 1)}
+
+def append_error_log(error_log_path, line):
+    with open(error_log_path, "a", encoding="utf-8") as log_f:
+        log_f.write(line + "\n")
+
+def decode_vosk_audio(video_path, audio_cache=None, prefetch=0, vad=False, feed_seconds=VOSK_FEED_SECONDS,
+                      spans=1):
+    # Возвращает (ожидаемое число кадров, итератор PCM-кусков по feed_seconds).
+    # prefetch > 0 — ffmpeg читается фоновым потоком в очередь примерно на prefetch секунд аудио.
+    # Для VAD нужен весь сигнал: тогда возвращается (None, int16 массив).
+    # spans > 1 и файл достаточно длинный — (число кадров, None): отрезки декодируют свои ffmpeg,
+    # а с кэшем аудио — (число кадров, int16 memmap): отрезки читают его срезы.
+    # audio_cache — AudioCache: аудио читается из него без ffmpeg или сохраняется туда при декодировании
+    min_span_frames = 2 * VOSK_MIN_SPAN_SECONDS * SAMPLE_RATE
+    frames = vosk_feed_frames(feed_seconds)
+    key = content_hash(video_path) if audio_cache is not None else None
+    pcm = audio_cache.load(key) if key else None
+    if pcm is not None:
+        if vad or (spans > 1 and len(pcm) >= min_span_frames):
+            return None if vad else len(pcm), pcm
+        return len(pcm), pcm_chunks(pcm, frames)
+    if vad:
+        return None, audio_cache.decode(video_path, key) if key else load_pcm_array(video_path)
+    duration_hint = probe_duration(video_path)
+    total_frames = int(duration_hint * SAMPLE_RATE) if duration_hint else None
+    if spans > 1 and duration_hint and duration_hint * SAMPLE_RATE >= min_span_frames:
+        if key:
+            # Одно декодирование в кэш, дальше отрезки параллельно читают его срезы
+            pcm = audio_cache.decode(video_path, key)
+            return len(pcm), pcm
+        return total_frames, None
+    chunks = audio_cache.stream(video_path, key, frames) if key else stream_pcm(video_path, frames)
+    if prefetch:
+        chunks = PrefetchedChunks(chunks, max(1, int(prefetch / feed_seconds)))
+    return total_frames, chunks
+
+def run_vosk_stage(video_path, get_audio, model, log, log_error, vad=False, vad_jobs=None,
+                   feed_seconds=VOSK_FEED_SECONDS, spans=1, formats=("txt",)):
+    # Возвращает результат Vosk (без VAD — TranscriptWriter с уже записанными черновиками) или None
+    # (ошибка или остановка — см. cancel_requested)
+    stream = None
+    try:
+        if vad:
+            log("    📝 Транскрибация участков речи...")
+            _, pcm = get_audio()
+            regions = METRICS.timed(video_path, "vad", speech_regions, pcm)
+            log("    " + describe_regions(regions, len(pcm)))
+            with METRICS.stage(video_path, "transcribe"):
+                result = transcribe_regions_vosk(pcm, model, log, regions, vad_jobs)
+        else:
+            total_frames, chunks = get_audio()
+            # Отрезки: None — каждый декодирует свой ffmpeg, int16 массив — срезы аудио из кэша
+            if chunks is None or hasattr(chunks, "dtype"):
+                log("    📝 Транскрибация отрезками (по тихим местам)...")
+                plan = METRICS.timed(video_path, "plan_spans", plan_vosk_spans, video_path,
+                                     total_frames / SAMPLE_RATE, spans, VOSK_MIN_SPAN_SECONDS, chunks)
+                with METRICS.stage(video_path, "transcribe"):
+                    result = transcribe_spans_vosk(video_path, model, log, plan, total_frames, feed_seconds, chunks)
+            else:
+                log("    📝 Транскрибация (потоковое извлечение аудио)...")
+                stream = TranscriptWriter(video_path, "vosk", formats)
+                formatter = SentenceFormatter()
+                # Декодирование идёт потоком вместе с распознаванием и входит во время transcribe
+                with METRICS.stage(video_path, "transcribe"):
+                    result = transcribe_audio_vosk(chunks, model, log, total_frames,
+                                                   lambda words: stream.add(formatter.feed(words)), feed_seconds)
+                if result is None:
+                    stream.discard()
+                    return None
+                stream.add(formatter.finish())
+                stream.close(result["duration"])
+                result = stream
+        if result is None:
+            return None
+        METRICS.note(video_path, audio_seconds=vosk_duration(result))
+        return result
+    except AudioExtractionError as e:
+        log(f"    ⚠️ Ошибка аудио: {e}")
+        log_error(f"[Audio Error] {video_path}: {e}")
+    except Exception as e:
+        log(f"    ⚠️ Ошибка транскрипции: {e}")
+        log_error(f"[Transcription Error] {video_path}: {e}")
+    if stream is not None:
+        stream.discard()
+    return None
+
+def vosk_duration(result):
+    return result.duration if isinstance(result, TranscriptWriter) else result["duration"]
+
+def write_vosk_result(video_path, result, log, log_error, formats=("txt",)):
+    # result — TranscriptWriter, фразы из кэша ({"segments", ...}) или результат Vosk со словами
+    try:
+        if isinstance(result, TranscriptWriter):
+            written = result.commit()
+        else:
+            written = write_transcript(video_path, result if "segments" in result else vosk_transcript(result),
+                                       formats)
+        log(f"    💾 Сохранено: {describe_written(written)}")
+    except Exception as e:
+        log(f"    ⚠️ Ошибка записи: {e}")
+        log_error(f"[Write Error] {video_path}: {e}")
+        return "error"
+    return "ok"
+
+def transcribe_file_vosk(video_path, model, log, log_error, audio_cache=None, vad=False, vad_jobs=None,
+                         feed_seconds=VOSK_FEED_SECONDS, spans=1, formats=("txt",)):
+    # Возвращает (статус "ok"/"error"/"stopped", запись для кэша); ошибки для error_log.txt уходят в log_error
+    result = run_vosk_stage(video_path, lambda: METRICS.timed(video_path, "decode", decode_vosk_audio, video_path,
+                                                              audio_cache, 0, vad, feed_seconds, spans),
+                            model, log, log_error, vad, vad_jobs, feed_seconds, spans, formats)
+    if result is None:
+        status = "stopped" if cancel_requested() else "error"
+        METRICS.finish(video_path, status)
+        return status, None
+    # До записи: после неё черновики потокового результата удаляются
+    payload = vosk_cache_payload(result)
+    status = METRICS.timed(video_path, "write", write_vosk_result, video_path, result, log, log_error, formats)
+    METRICS.finish(video_path, status)
+    return status, payload if status == "ok" else None
+
+def process_videos_vosk(base_folder, model_path, log, skip_existing=False, audio_cache=False,
+                        workers=1, threads_per_worker=None, decode_ahead=2, write_queue=4, cache=True, vad=False,
+                        vad_jobs=None, feed_seconds=VOSK_FEED_SECONDS, spans=1, index=True, rescan=False,
+                        formats=("txt",), cancel=None):
+    with cancel_scope(cancel) as cancel:
+        index, close_index = open_folder_index(index, log)
+        video_files = FileFeed(iter_videos(base_folder, index, rescan, skip_existing, log), log)
+        error_log_path = os.path.join(error_log_dir(base_folder), "error_log.txt")
+        if os.path.exists(error_log_path):
+            os.remove(error_log_path)
+
+        error_lock = threading.Lock()
+
+        def log_error(line):
+            with error_lock:
+                append_error_log(error_log_path, line)
+
+        cache, close_cache = open_transcript_cache(cache, log)
+        audio_cache = open_audio_cache(audio_cache, log)
+        run = METRICS.begin_run("vosk", os.path.abspath(model_path), workers)
+        try:
+            process_vosk_files(video_files, model_path, log, log_error, audio_cache, workers, threads_per_worker,
+                               decode_ahead, write_queue, cache, vad, vad_jobs, feed_seconds, spans, formats)
+        finally:
+            METRICS.end_run(run, cancel.is_set())
+            video_files.close()
+            if close_cache:
+                cache.close()
+            if close_index:
+                index.close()
+
+def process_vosk_files(video_files, model_path, log, log_error, audio_cache, workers, threads_per_worker,
+                       decode_ahead, write_queue, cache, vad=False, vad_jobs=None, feed_seconds=VOSK_FEED_SECONDS,
+                       spans=1, formats=("txt",)):
+    model_id = os.path.abspath(model_path)
+
+    def write(video_path, result):
+        return write_vosk_result(video_path, result, log, log_error, formats)
+
+    keys = {}
+    if cache is not None:
+        options = {"vad": vad}
+        if spans > 1:
+            # Границы отрезков немного меняют разбивку фраз
+            options["spans"] = True
+        video_files = FileFeed(apply_transcript_cache(cache, video_files, "vosk", model_id, options, write, log, keys),
+                               log, "vidtotxt-cache-check")
+    if not video_files:
+        log("\n✅ Обработка завершена.")
+        return
+    store = cache_store(cache, keys, "vosk", model_id)
+    write = caching_writer(write, store, vosk_cache_payload)
+
+    if workers > 1:
+        # Пулу нужен полный список: дожидаемся конца поиска
+        video_files = list(video_files)
+    if workers > 1 and len(video_files) > 1:
+        stopped = run_worker_pool("vosk", model_path, video_files, log, workers, threads_per_worker,
+                                  {"vad": vad, "vad_jobs": vad_jobs, "feed_seconds": feed_seconds,
+                                   "spans": spans, "formats": formats, "metrics": METRICS.enabled,
+                                   **audio_cache_options(audio_cache)},
+                                  cancel_requested, log_error, store=store)
+        if stopped:
+            log("\n❌ Обработка остановлена пользователем.")
+        log("\n✅ Обработка завершена.")
+        return
+
+    with MODELS.lease("vosk", model_path, log=log) as model:
+        def announce(idx, total, video_path):
+            log(f"\n🔄 [{idx}/{total}] {video_path}")
+
+        stopped = run_pipeline(
+            video_files,
+            announce,
+            lambda video_path: decode_vosk_audio(video_path, audio_cache, PREFETCH_SECONDS, vad, feed_seconds,
+                                                 spans),
+            lambda video_path, get_audio: run_vosk_stage(video_path, get_audio, model, log, log_error, vad,
+                                                         vad_jobs, feed_seconds, spans, formats),
+            write,
+            cancel_requested,
+            decode_ahead, write_queue,
+        )
+    if stopped:
+        log("\n❌ Обработка остановлена пользователем.")
+    log("\n✅ Обработка завершена.")
+
+def start_process_vosk(video_path, model_path, log, stop_button, skip_existing=False, audio_cache=False, workers=1,
+                       use_cache=True, vad=False):
+    stop_button.config(state='normal')
+    start_gui_run("vosk", process_videos_vosk, (video_path, model_path, log, skip_existing, audio_cache, workers),
+                  {"cache": use_cache, "vad": vad})
+
+def stop_process_vosk():
+    stop_gui_runs("vosk")
+
+
+# --- Смешанные архивы: язык каждого файла определяется заранее по короткому фрагменту речи (Whisper tiny),
+# и файл уходит движку и модели, назначенным этому языку ---
+
+LANG_DETECT_MODEL = "tiny"
+# Сколько секунд от начала файла просматривать в поиске речи и сколько речи отдавать детектору
+LANG_SCAN_SECONDS = 120
+LANG_SAMPLE_SECONDS = 30
+# Ниже этой вероятности язык считается неопределённым: файл идёт по маршруту "*" без подсказки языка
+LANG_MIN_PROBABILITY = 0.5
+
+def parse_routes(specs):
+    # ["ru=vosk:/models/vosk-ru", "en,de=whisper:small", "*=whisper:small"] -> {"ru": ("vosk", путь), ...}.
+    # Языки — коды из WHISPER_LANGUAGES, "*" — все остальные. ValueError — неверная запись
+    known = {code for code in WHISPER_LANGUAGES.values() if code}
+    routes = {}
+    for spec in specs:
+        langs, sep, target = spec.partition("=")
+        engine, _, model = target.partition(":")
+        if not sep or engine not in ("whisper", "vosk") or not model:
+            raise ValueError(f"маршрут {spec}: ожидается язык=whisper:модель или язык=vosk:путь")
+        if engine == "whisper":
+            name, precision = parse_whisper_spec(model)
+            if name not in MODELS_INFO or precision not in WHISPER_PRECISIONS:
+                raise ValueError(f"маршрут {spec}: неизвестная модель Whisper {model}")
+            model = whisper_spec(name, precision)
+        elif not os.path.isdir(model):
+            raise ValueError(f"маршрут {spec}: папка модели Vosk не найдена: {model}")
+        for lang in (code.strip().lower() for code in langs.split(",")):
+            if lang != "*" and lang not in known:
+                raise ValueError(f"маршрут {spec}: неизвестный язык {lang} (известны: {', '.join(sorted(known))})")
+            routes[lang] = (engine, model)
+    return routes
+
+def language_sample(video_path, audio_cache=None):
+    # До LANG_SAMPLE_SECONDS речи из первых LANG_SCAN_SECONDS файла (float32 для Whisper): заставки и тишина
+    # в начале не мешают. С кэшем аудио файл декодируется туда целиком и пригодится при распознавании
+    import numpy as np
+    if audio_cache is not None:
+        pcm = audio_cache.get(video_path)[:LANG_SCAN_SECONDS * SAMPLE_RATE]
+    else:
+        pcm = load_pcm_array(video_path, duration=LANG_SCAN_SECONDS)
+    regions = speech_regions(pcm)
+    if regions:
+        pcm = np.concatenate([pcm[s:e] for s, e in regions])
+    return pcm_to_float(pcm[:LANG_SAMPLE_SECONDS * SAMPLE_RATE])
+
+def detect_language(model, audio):
+    # Один проход энкодера по 30-секундному окну и один шаг декодера -> (код языка, вероятность)
+    import torch
+    import whisper
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    with torch.no_grad(), whisper_inference_context(model):
+        _, probs = model.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, round(float(probs[language]), 3)
+
+def route_for(routes, language, probability):
+    # -> (движок, модель, язык для движка) или None, если маршрута нет
+    confident = language is not None and probability >= LANG_MIN_PROBABILITY
+    if confident and language in routes:
+        return (*routes[language], language)
+    if "*" in routes:
+        return (*routes["*"], language if confident else None)
+    return None
+
+def route_videos(video_files, routes, log, cache=None, audio_cache=None, record_path=None):
+    # Определяет язык каждого файла (результат хранится в кэше результатов как движок "langid") и группирует
+    # файлы по маршрутам: {(движок, модель, язык): [файлы]}. Решения пишутся в лог и в record_path
+    groups = {}
+    lines = []
+    detector = None
+    options = {"scan": LANG_SCAN_SECONDS, "sample": LANG_SAMPLE_SECONDS}
+    total = len(video_files)
+    with contextlib.ExitStack() as leases:
+        for idx, video_path in enumerate(video_files, 1):
+            if cancel_requested():
+                break
+            key = digest = found = None
+            if cache is not None:
+                try:
+                    key, digest = cache.key_for(video_path, "langid", LANG_DETECT_MODEL, options)
+                    found = cache.get(key)
+                except (OSError, sqlite3.Error):
+                    key = None
+            if found is not None:
+                language, probability = found["language"], found["probability"]
+            else:
+                language, probability = None, 0.0
+                if detector is None:
+                    try:
+                        detector = leases.enter_context(MODELS.lease("whisper", LANG_DETECT_MODEL, log=log))
+                    except Exception as e:
+                        log(f"⚠️ Модель определения языка недоступна, файлы идут по маршруту *: {e}")
+                        detector = False
+                if detector:
+                    try:
+                        language, probability = detect_language(detector, language_sample(video_path, audio_cache))
+                    except Exception as e:
+                        log(f"    ⚠️ Не удалось определить язык {video_path}: {e}")
+                    else:
+                        if key:
+                            try:
+                                cache.put(key, {"language": language, "probability": probability}, "langid",
+                                          LANG_DETECT_MODEL, digest)
+                            except sqlite3.Error as e:
+                                log(f"    ⚠️ Не удалось сохранить в кэш {video_path}: {e}")
+            route = route_for(routes, language, probability)
+            label = f"{language or '?'} ({probability:.2f})"
+            if route is None:
+                log(f"🌐 [{idx}/{total}] {video_path}: {label} — нет маршрута, пропущен")
+            else:
+                log(f"🌐 [{idx}/{total}] {video_path}: {label} → {route[0]} {route[1]}")
+                groups.setdefault(route, []).append(video_path)
+            lines.append("\t".join((video_path, language or "", f"{probability:.3f}",
+                                    f"{route[0]}:{route[1]}" if route else "-")))
+    if record_path and lines:
+        try:
+            atomic_write_text(record_path, "\n".join(lines) + "\n")
+        except OSError as e:
+            log(f"⚠️ Не удалось записать {record_path}: {e}")
+    return groups
+
+def process_videos_routed(base_folder, routes, log, skip_existing=False, audio_cache=False, workers=1,
+                          threads_per_worker=None, decode_ahead=2, write_queue=4, cache=True, vad=False,
+                          batch_size=1, vad_jobs=None, feed_seconds=VOSK_FEED_SECONDS, spans=1, index=True,
+                          rescan=False, formats=("txt",), cancel=None):
+    # routes — см. parse_routes. Сначала определяется язык всех файлов, затем каждая группа уходит в
+    # process_videos_whisper (с найденным языком — Whisper не определяет его сам) или process_videos_vosk.
+    # Решения сохраняются в language_routes.txt рядом с error_log.txt: путь, язык, вероятность, маршрут
+    with cancel_scope(cancel) as cancel:
+        index, close_index = open_folder_index(index, log)
+        cache, close_cache = open_transcript_cache(cache, log)
+        audio_cache = open_audio_cache(audio_cache, log)
+        try:
+            video_files = list(iter_videos(base_folder, index, rescan, skip_existing, log))
+            if not video_files:
+                log("❌ Видео-файлы не найдены.")
+                return
+            log(f"🌐 Определение языка ({LANG_DETECT_MODEL}) для файлов: {len(video_files)}")
+            groups = route_videos(video_files, routes, log, cache, audio_cache,
+                                  os.path.join(error_log_dir(base_folder), "language_routes.txt"))
+            for (engine, model, language), files in groups.items():
+                if cancel.is_set():
+                    break
+                log(f"\n🧭 {engine} {model}" + (f", язык {language}" if language else "") + f": файлов {len(files)}")
+                if engine == "whisper":
+                    process_videos_whisper(files, model, log, False, language, audio_cache, workers,
+                                           threads_per_worker, decode_ahead, write_queue, cache, vad, batch_size,
+                                           index, False, formats, cancel)
+                else:
+                    process_videos_vosk(files, model, log, False, audio_cache, workers, threads_per_worker,
+                                        decode_ahead, write_queue, cache, vad, vad_jobs, feed_seconds, spans,
+                                        index, False, formats, cancel)
+        finally:
+            if close_cache:
+                cache.close()
+            if close_index:
+                index.close()
+
+
+# --- Метрики: время этапов по каждому файлу (JSON-строки) и сводные счётчики в текстовом формате Prometheus ---
+
+def peak_rss_mb(children=False):
+    # Пиковый RSS процесса (или его завершившихся дочерних процессов) за всё время жизни, МБ
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize",
+                                                             "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                                                             "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                                                             "PagefileUsage", "PeakPagefileUsage")]
+        counters = Counters(cb=ctypes.sizeof(Counters))
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / 2 ** 20, 1)
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux отдаёт КБ, macOS — байты
+    return round(usage.ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except (OSError, ValueError, AttributeError, IndexError):
+        # Не Linux: пиковое значение вместо текущего
+        return peak_rss_mb()
+
+# Запуск, к которому относятся записи файлов текущего потока (см. StageMetrics.begin_run). Как и CANCEL,
+# своя у каждого запуска: параллельные запуски из окна и задания сервера считаются раздельно
+METRICS_RUN = contextvars.ContextVar("vidtotxt_metrics_run", default=None)
+
+class StageMetrics:
+    # Этапы файла копятся в записи по пути к видео и выводятся одной JSON-строкой, когда файл готов.
+    # Пока метрики не включены, stage()/add()/note() ничего не делают.
+    # В процессе пула (collect) записи не пишутся, а возвращаются основному процессу через take()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sink = None
+        self._close_sink = False
+        self._collect = False
+        self._collected = []
+        self._records = {}
+        self._counters = collections.defaultdict(float)
+        self._runs = 0
+        self.serving = False
+
+    @property
+    def enabled(self):
+        return self._sink is not None or self._collect or self.serving
+
+    def enable(self, path):
+        # path: файл JSON-строк (дописывается) или "-" — stderr
+        self.disable()
+        if path == "-":
+            self._sink, self._close_sink = sys.stderr, False
+        else:
+            self._sink, self._close_sink = open(path, "a", encoding="utf-8", buffering=1), True
+
+    def collect(self):
+        self._collect = True
+
+    def disable(self):
+        with self._lock:
+            if self._close_sink:
+                self._sink.close()
+            self._sink, self._close_sink = None, False
+
+    def begin_run(self, engine, model, workers=1):
+        # -> описатель запуска для end_run (None, если метрики выключены). Записи файлов, начатые в этом
+        # контексте, считаются в итоги этого запуска
+        if not self.enabled:
+            return None
+        run = {"engine": engine, "model": model, "workers": workers, "started": time.perf_counter(),
+               "files": collections.Counter(), "audio_seconds": 0.0}
+        run["token"] = METRICS_RUN.set(run)
+        with self._lock:
+            self._runs += 1
+        self._emit({"event": "run_start", "engine": engine, "model": model, "workers": workers})
+        return run
+
+    def end_run(self, run, stopped=False):
+        if run is None:
+            return
+        METRICS_RUN.reset(run.pop("token"))
+        with self._lock:
+            self._runs -= 1
+        wall = time.perf_counter() - run["started"]
+        self._emit({"event": "run_end", "engine": run["engine"], "model": run["model"], "workers": run["workers"],
+                    "stopped": stopped, "files": dict(run["files"]), "audio_seconds": round(run["audio_seconds"], 2),
+                    "wall_seconds": round(wall, 3),
+                    "rtf": round(wall / run["audio_seconds"], 4) if run["audio_seconds"] else None,
+                    "peak_rss_mb": peak_rss_mb(), "peak_rss_workers_mb": peak_rss_mb(children=True)})
+
+    @contextlib.contextmanager
+    def stage(self, path, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(path, name, time.perf_counter() - started)
+
+    def timed(self, path, name, func, *args):
+        with self.stage(path, name):
+            return func(*args)
+
+    def add(self, path, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stages = self._record(path)["stages"]
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def note(self, path, **fields):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._record(path).update(fields)
+
+    def finish(self, path, status):
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._records.pop(path, None) or self._new_record()
+        run = record.pop("run")
+        wall = time.perf_counter() - record.pop("started")
+        record.pop("pending", None)
+        audio = record.get("audio_seconds")
+        stages = {name: round(seconds, 4) for name, seconds in record["stages"].items()}
+        record = {
+            "event": "file", "path": path, "status": status, "audio_seconds": audio, "stages": stages,
+            "wall_seconds": round(wall, 3), "rtf": round(stages.get("transcribe", 0.0) / audio, 4) if audio else None,
+            "rss_mb": current_rss_mb(), "pid": os.getpid(),
+        }
+        if self._collect:
+            with self._lock:
+                self._collected.append(record)
+        else:
+            self.merge([record], run)
+
+    def fail(self, path, status="error"):
+        # Файл без результата; файлы, ушедшие в пакет Whisper, завершаются позже через finish()
+        with self._lock:
+            record = self._records.get(path)
+            if record is None or record.get("pending"):
+                return
+        self.finish(path, status)
+
+    def take(self):
+        with self._lock:
+            records, self._collected = self._collected, []
+        return records
+
+    def merge(self, records, run=None):
+        # Готовые записи (в т.ч. из процессов пула): счётчики и JSON-строки. run — запуск, к которому они
+        # относятся; по умолчанию текущий
+        run = run or METRICS_RUN.get() or {}
+        for record in records:
+            with self._lock:
+                engine = run.get("engine", "")
+                model = run.get("model", "")
+                record = {"event": record["event"], "engine": engine, "model": model, **record}
+                labels = (("engine", engine), ("model", str(model)))
+                self._counters[("vidtotxt_files_total", labels + (("status", record["status"]),))] += 1
+                self._counters[("vidtotxt_audio_seconds_total", labels)] += record.get("audio_seconds") or 0.0
+                for name, seconds in record["stages"].items():
+                    self._counters[("vidtotxt_stage_seconds_total", labels + (("stage", name),))] += seconds
+                if run:
+                    run["files"][record["status"]] += 1
+                    run["audio_seconds"] += record.get("audio_seconds") or 0.0
+            self._emit(record)
+
+    def prometheus(self):
+        help_text = {
+            "vidtotxt_files_total": ("counter", "Обработанные файлы по статусу"),
+            "vidtotxt_audio_seconds_total": ("counter", "Секунды аудио в обработанных файлах"),
+            "vidtotxt_stage_seconds_total": ("counter", "Суммарное время этапов, с"),
+        }
+        with self._lock:
+            counters = sorted(self._counters.items())
+        lines = []
+        for metric, (kind, text) in help_text.items():
+            lines += [f"# HELP {metric} {text}", f"# TYPE {metric} {kind}"]
+            for (name, labels), value in counters:
+                if name == metric:
+                    label_text = ",".join(f'{k}="{prometheus_escape(v)}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_text}}} {value:g}")
+        rss = current_rss_mb()
+        peak = peak_rss_mb()
+        lines += ["# HELP vidtotxt_resident_memory_bytes Текущий RSS процесса",
+                  "# TYPE vidtotxt_resident_memory_bytes gauge",
+                  f"vidtotxt_resident_memory_bytes {(rss or 0) * 2 ** 20:.0f}",
+                  "# HELP vidtotxt_peak_resident_memory_bytes Пиковый RSS процесса",
+                  "# TYPE vidtotxt_peak_resident_memory_bytes gauge",
+                  f"vidtotxt_peak_resident_memory_bytes {(peak or 0) * 2 ** 20:.0f}",
+                  "# HELP vidtotxt_models_loaded Загруженные модели в реестре",
+                  "# TYPE vidtotxt_models_loaded gauge",
+                  f"vidtotxt_models_loaded {MODELS.loaded_count()}",
+                  "# HELP vidtotxt_run_active Число идущих обработок",
+                  "# TYPE vidtotxt_run_active gauge",
+                  f"vidtotxt_run_active {self._runs}"]
+        return "\n".join(lines) + "\n"
+
+    def _new_record(self):
+        return {"started": time.perf_counter(), "stages": {}, "run": METRICS_RUN.get()}
+
+    def _record(self, path):
+        record = self._records.get(path)
+        if record is None:
+            record = self._records[path] = self._new_record()
+        return record
+
+    def _emit(self, data):
+        if self._sink is None:
+            return
+        data = {"ts": round(time.time(), 3), **data}
+        with self._lock:
+            if self._sink is not None:
+                self._sink.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+
+METRICS = StageMetrics()
+
+def prometheus_escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def serve_metrics(port, host="127.0.0.1", log=None):
+    # GET /metrics — счётчики в текстовом формате Prometheus. Сервер живёт в фоновом потоке
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = METRICS.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="vidtotxt-metrics", daemon=True).start()
+    METRICS.serving = True
+    if log:
+        log(f"📈 Метрики: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+@contextlib.contextmanager
+def profiling(path, log=None):
+    # cProfile видит только текущий поток — в конвейере это поток распознавания.
+    # Потоки декодирования/записи и процессы пула удобнее смотреть py-spy (потоки названы vidtotxt-*)
+    if not path:
+        yield
+        return
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        if log:
+            log(f"🔬 Профиль сохранён: {path} (python -m pstats {path})")
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(15)
+            log(stream.getvalue())
+
+def metrics_from_env(log=None):
+    # VIDTOTXT_METRICS=путь.jsonl (или "-") и VIDTOTXT_METRICS_PORT=9464 — метрики для GUI
+    path = os.environ.get("VIDTOTXT_METRICS", "").strip()
+    port = os.environ.get("VIDTOTXT_METRICS_PORT", "").strip()
+    try:
+        if path:
+            METRICS.enable(path)
+        if port:
+            serve_metrics(int(port), log=log)
+    except (OSError, ValueError) as e:
+        if log:
+            log(f"⚠️ Метрики недоступны: {e}")
+
+
+# --- Конвейер: декодирование следующих файлов и запись результатов идут параллельно с распознаванием ---
+
+PREFETCH_CHUNKS = 256
+# Сколько секунд аудио ffmpeg может прочитать вперёд, пока Vosk распознаёт
+PREFETCH_SECONDS = 64
+
+class PrefetchedChunks:
+    # Читает итератор PCM-кусков в фоновом потоке в ограниченную очередь.
+    # Исключения источника (например, AudioExtractionError) пробрасываются при чтении.
+    _END = object()
+
+    def __init__(self, source, maxsize=PREFETCH_CHUNKS):
+        import queue
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._fill, source),
+                                        name="vidtotxt-prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        import queue
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fill(self, source):
+        try:
+            for data in source:
+                if not self._put(data):
+                    break
+            else:
+                self._put(self._END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+    def __iter__(self):
+        return self
 
-if getattr(sys, 'frozen', False):
-    base_path = sys._MEIPASS
+    def __next__(self):
+        if self._closed.is_set():
+            raise StopIteration
+        item = self._queue.get()
+        if item is self._END:
+            self._closed.set()
+            raise StopIteration
+        if isinstance(item, Exception):
+            self._closed.set()
+            raise item
+        return item
 
-    # Обновляем PATH
-    os.environ['PATH'] = os.pathsep.join([
-        os.path.join(base_path, 'vosk'),
-        os.environ['PATH']
-    ])
+    def close(self):
+        self._closed.set()
 
-    # Для корректной работы Vosk DLL
-    try:
-        os.add_dll_directory(os.path.join(base_path, 'vosk'))
-    except (AttributeError, FileNotFoundError):
-        pass
 
+def run_pipeline(video_files, announce, decode, transcribe, write, stop_requested, decode_ahead=2, write_queue=4,
+                 finish=None, ready=None):
+    # decode(video_path) выполняется в фоновых потоках заранее — не более decode_ahead файлов,
+    # transcribe(video_path, get_audio) — в текущем потоке, write(video_path, result) — в потоке записи
+    # с очередью write_queue. video_files — список или FileFeed, который ещё наполняется.
+    # Результат, готовый не сразу (пакет Whisper), этап распознавания кладёт в deque ready парой (файл, результат);
+    # finish() дорабатывает остаток после последнего файла. Возвращает True, если обработка остановлена
+    import queue
+    from concurrent.futures import ThreadPoolExecutor
 
-# Ensure mel_filters.npz is available
-if getattr(sys, 'frozen', False):
-    whisper_asset_path = os.path.join(sys._MEIPASS, "whisper", "assets", "mel_filters.npz")
-else:
-    whisper_asset_path = os.path.join(os.getcwd(), "whisper", "assets", "mel_filters.npz")
+    decode_ahead = max(1, decode_ahead)
+    slots = threading.Semaphore(decode_ahead)
+    decoded = queue.Queue()
+    writes = queue.Queue(maxsize=max(1, write_queue))
+    cancelled = threading.Event()
 
-os.environ["WHISPER_ASSETS"] = os.path.dirname(whisper_asset_path)
+    def producer(pool):
+        try:
+            for video_path in video_files:
+                with METRICS.stage(video_path, "decode_slot_wait"):
+                    while not slots.acquire(timeout=0.2):
+                        if cancelled.is_set():
+                            break
+                if cancelled.is_set():
+                    break
+                decoded.put((video_path, submit_in_context(pool, METRICS.timed, video_path, "decode", decode,
+                                                       video_path)))
+        except Exception as e:
+            # Ошибка в списке файлов (FileFeed) поднимается в основном потоке
+            decoded.put(e)
+        finally:
+            decoded.put(None)
 
+    def writer():
+        while True:
+            job = writes.get()
+            if job is None:
+                return
+            video_path, result, queued = job
+            METRICS.add(video_path, "write_queue", time.perf_counter() - queued)
+            try:
+                status = METRICS.timed(video_path, "write", write, video_path, result)
+            except Exception as e:
+                print(f"⚠️ Ошибка записи {video_path}: {e}")
+                status = "error"
+            METRICS.finish(video_path, status)
 
-MODELS_INFO = {
-    'tiny':   {'size': '75MB',  'speed': 5, 'quality': 1},
-    'base':   {'size': '142MB', 'speed': 5, 'quality': 1},
-    'small':  {'size': '456MB', 'speed': 4, 'quality': 2},
-    'medium': {'size': '1.5GB', 'speed': 3, 'quality': 4},
-    'large':  {'size': '2.9GB', 'speed': 1, 'quality': 5},
-}
-WHISPER_LANGUAGES = {
-    "🌐 Auto-detect": None,
-    "🇬🇧 English": "en",
-    "🇷🇺 Russian": "ru",
-    "🇫🇷 French": "fr",
-    "🇩🇪 German": "de",
-    "🇪🇸 Spanish": "es",
-    "🇮🇹 Italian": "it",
-    "🇨🇳 Chinese": "zh",
-    "🇯🇵 Japanese": "ja",
-    "🇰🇷 Korean": "ko",
-    "🇺🇦 Ukrainian": "uk",
-    "🇵🇱 Polish": "pl",
-    "🇧🇷 Portuguese": "pt",
-    "🇹🇷 Turkish": "tr"
-    # Добавляй по мере необходимости
-}
+    def close_audio(future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        audio = future.result()
+        for part in audio if isinstance(audio, tuple) else (audio,):
+            if hasattr(part, "close"):
+                part.close()
 
-def model_label(name):
-    info = MODELS_INFO[name]
-    return f"{name.capitalize()} — {info['size']} | Speed {info['speed']}/5 | Quality {info['quality']}/5"
+    def enqueue(video_path, result):
+        with METRICS.stage(video_path, "write_wait"):
+            writes.put((video_path, result, time.perf_counter()))
 
-whisper_stop_flag = False
-vosk_stop_flag = False
+    def enqueue_ready():
+        while ready:
+            enqueue(*ready.popleft())
 
-def extract_audio(video_path, wav_path):
-    audio = AudioSegment.from_file(video_path)
-    audio = audio.set_channels(1)
-    audio = audio.set_frame_rate(16000)
-    audio.export(wav_path, format="wav", parameters=["-acodec", "pcm_s16le"])
+    def discard(future):
+        # Заранее декодированный, но не понадобившийся результат: закрываем потоки ffmpeg
+        if not future.cancel():
+            future.add_done_callback(close_audio)
 
-def transcribe_audio_whisper(wav_path, model, language=None):
+    stopped = False
+    # Имена потоков видны в py-spy dump/record
+    # Потоки получают контекст запуска: cancel_requested() и метрики видят свой запуск
+    writer_thread = threading.Thread(target=contextvars.copy_context().run, args=(writer,), name="vidtotxt-writer",
+                                     daemon=True)
+    writer_thread.start()
     try:
-        transcribe_args = {'verbose': False, "word_timestamps": True}
-        if language:
-            transcribe_args["language"] = language
-        result = model.transcribe(wav_path, **transcribe_args)
-        output_lines = []
-        for segment in result.get("segments", []):
-            start_time = str(datetime.timedelta(seconds=int(segment["start"])))
-            line = f"[{start_time}] {segment['text'].strip()}"
-            output_lines.append(line)
-        return "\n".join(output_lines)
-    except Exception as e:
-        print(f"⚠️ Ошибка в Whisper: {e}")
-        return None
+        with ThreadPoolExecutor(max_workers=decode_ahead, thread_name_prefix="vidtotxt-decode") as pool:
+            threading.Thread(target=contextvars.copy_context().run, args=(producer, pool), name="vidtotxt-producer",
+                             daemon=True).start()
+            try:
+                idx = 0
+                while True:
+                    item = decoded.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    idx += 1
+                    video_path, future = item
+                    if stop_requested():
+                        stopped = True
+                        cancelled.set()
+                        discard(future)
+                        break
 
+                    released = []
 
+                    def get_audio(future=future, released=released, video_path=video_path):
+                        try:
+                            with METRICS.stage(video_path, "decode_wait"):
+                                return future.result()
+                        finally:
+                            if not released:
+                                released.append(True)
+                                slots.release()
 
-def process_videos_whisper(base_folder, model_key, log, skip_existing, lang_code):
-    global whisper_stop_flag
-    whisper_stop_flag = False
+                    announce(idx, file_total(video_files), video_path)
+                    try:
+                        result = transcribe(video_path, get_audio)
+                    finally:
+                        if not released:
+                            released.append(True)
+                            slots.release()
+                    enqueue_ready()
+                    if result is not None:
+                        enqueue(video_path, result)
+                        continue
+                    METRICS.fail(video_path, "stopped" if stop_requested() else "error")
+                    if stop_requested():
+                        stopped = True
+                        cancelled.set()
+                        break
+                if finish is not None and not stopped:
+                    finish()
+            except BaseException:
+                # Исключение этапа распознавания: останавливаем декодирование, иначе поток-производитель
+                # ждал бы освободившегося места вечно
+                cancelled.set()
+                raise
+            finally:
+                if cancelled.is_set():
+                    while True:
+                        item = decoded.get()
+                        if item is None:
+                            break
+                        if isinstance(item, Exception):
+                            continue
+                        discard(item[1])
+                        slots.release()
+    finally:
+        # Уже готовые результаты дописываются и при остановке, и при ошибке
+        if ready is not None:
+            enqueue_ready()
+        writes.put(None)
+        writer_thread.join()
+    return stopped
 
-    model_name = model_key.split(" — ")[0].lower()
-    log(f"🚀 Загрузка модели Whisper: {model_name}...")
-    model = whisper.load_model(model_name)
-    log("✅ Модель загружена, поиск видеофайлов...")
+# --- Реестр моделей: загруженные модели переиспользуются между запусками ---
 
-    supported_ext = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".mpeg", ".mpg")
-    video_files = []
-    for root, _, files in os.walk(base_folder):
-        for f in files:
-            if f.lower().endswith(supported_ext):
-                video_files.append(os.path.join(root, f))
+MODEL_MEMORY_BUDGET_MB = 6144
+MODEL_IDLE_SECONDS = 15 * 60
 
-    log(f"🔎 Найдено файлов: {len(video_files)}")
-    if not video_files:
-        log("❌ Видео-файлы не найдены.")
-        return
+def default_whisper_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
 
-    for idx, video_path in enumerate(video_files, 1):
-        if whisper_stop_flag:
-            log("⛔ Процесс остановлен.")
-            return
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
 
-        log(f"\n🔄 [{idx}/{len(video_files)}] Обработка файла:")
-        log(f"    📄 {video_path}")
+class ModelManager:
+    # Модели по ключу (движок, имя/путь, устройство, точность). Повторная «Обработка» берёт уже загруженную
+    # модель, а не грузит вторую копию; давно не используемые и лишние сверх бюджета памяти выгружаются (LRU).
+    # Модель, взятая через lease(), занята до конца запуска и не выгружается, как бы долго он ни шёл.
+    # whisper/torch/vosk импортируются только при первой загрузке
+    def __init__(self, budget_mb=MODEL_MEMORY_BUDGET_MB, idle_seconds=MODEL_IDLE_SECONDS):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._models = collections.OrderedDict()
+        self._loading = {}
 
-        base_name = os.path.splitext(video_path)[0]
-        wav_path = base_name + ".wav"
-        txt_path = base_name + ".txt"
+    def key(self, engine, spec, device=None, dtype=None):
+        if engine == "whisper":
+            name, precision = parse_whisper_spec(spec)
+            dtype = dtype or precision
+            # int8 и bf16 — режимы для CPU
+            if dtype != "fp32":
+                device = "cpu"
+            return engine, name, device or default_whisper_device(), dtype
+        return engine, os.path.abspath(spec), "cpu", dtype or "native"
 
-        if skip_existing and os.path.exists(txt_path):
-            log(f"    ⏭️ Пропущен (уже есть .txt): {txt_path}")
-            continue
+    def get(self, engine, spec, device=None, dtype=None, log=None, lease=False):
+        # lease=True — модель занята, пока не вызван release (см. lease())
+        key = self.key(engine, spec, device, dtype)
+        with self._lock:
+            model = self._touch(key, lease)
+            if model is not None:
+                return model
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        # Одновременные запросы одной модели ждут одну загрузку
+        with load_lock:
+            with self._lock:
+                model = self._touch(key, lease)
+                if model is not None:
+                    return model
+            if log:
+                log(f"🚀 Загрузка модели {engine}: {spec}...")
+            model = self._load(*key)
+            size = self._estimate_size(model, *key)
+            with self._lock:
+                self._models[key] = {"model": model, "size": size, "last_used": time.time(), "leases": int(lease)}
+                self._loading.pop(key, None)
+                self._evict_locked(keep=key)
+            if log:
+                log("✅ Модель загружена.")
+        return model
 
+    @contextlib.contextmanager
+    def lease(self, engine, spec, device=None, dtype=None, log=None):
+        # Модель на время запуска: evict_idle и бюджет памяти не выгружают её, пока идёт распознавание
+        model = self.get(engine, spec, device, dtype, log, lease=True)
         try:
-            log("    🎧 Вытаскивание аудио...")
-            extract_audio(video_path, wav_path)
-            log("    🎧 Аудио успешно извлечено.")
-        except Exception as e:
-            log(f"    ⚠️ Ошибка при извлечении аудио: {e}")
-            continue
+            yield model
+        finally:
+            self.release(self.key(engine, spec, device, dtype), model)
 
-        try:
-            log("    🖋️ Транскрибация аудио...")
-            text = transcribe_audio_whisper(wav_path, model, lang_code)
-            if text is None:
-                log(f"    ⚠️ Не удалось получить текст для {wav_path}")
+    def release(self, key, model):
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry["model"] is model:
+                entry["leases"] -= 1
+                entry["last_used"] = time.time()
+
+    def preload(self, engine, spec, device=None, dtype=None, log=None):
+        # Фоновая загрузка, например модели по умолчанию при старте GUI
+        def run():
+            try:
+                self.get(engine, spec, device, dtype)
+                if log:
+                    log(f"🔥 Модель {engine} {spec} загружена заранее.")
+            except Exception as e:
+                if log:
+                    log(f"⚠️ Не удалось заранее загрузить модель {spec}: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_locked()
+
+    def loaded_count(self):
+        with self._lock:
+            return len(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def _touch(self, key, lease=False):
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        entry["last_used"] = time.time()
+        entry["leases"] += int(lease)
+        return entry["model"]
+
+    def _evict_locked(self, keep=None):
+        now = time.time()
+        evicted = False
+        for key in [k for k, e in self._models.items()
+                    if k != keep and not e["leases"] and now - e["last_used"] > self.idle_seconds]:
+            del self._models[key]
+            evicted = True
+        total = sum(e["size"] for e in self._models.values())
+        for key in list(self._models):
+            if total <= self.budget:
+                break
+            if key == keep or self._models[key]["leases"]:
                 continue
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(f"# {os.path.basename(video_path)}\n\n")
-                f.write(text)
-            log(f"    ✅ Текст сохранён в: {txt_path}")
-        except Exception as e:
-            log(f"    ⚠️ Ошибка транскрипции: {e}")
-            continue
+            total -= self._models.pop(key)["size"]
+            evicted = True
+        if evicted:
+            gc.collect()
 
-    log("\n✅ Все видео обработаны.")
+    @staticmethod
+    def _load(engine, spec, device, dtype):
+        if engine == "whisper":
+            import whisper
+            model = apply_whisper_precision(whisper.load_model(spec, device=device), dtype)
+            # Один экземпляр отдаётся всем запускам, а декодер Whisper не потокобезопасен (kv-cache хуки ставятся
+            # на общие модули) — распознавание им идёт по очереди, см. whisper_inference_context
+            model.inference_lock = threading.RLock()
+            return model
+        from vosk import Model
+        return Model(spec)
 
+    @staticmethod
+    def _estimate_size(model, engine, spec, device, dtype):
+        if engine == "whisper":
+            size = sum(p.numel() * p.element_size() for p in model.parameters())
+            # Упакованные int8 веса квантованных слоёв не входят в parameters()
+            size += sum(m.weight().numel() for m in model.modules() if hasattr(m, "_packed_params"))
+            return size
+        return dir_size(spec)
 
-def start_process_whisper(video_path, model_key, log, stop_button, skip_existing, language_ui):
-    stop_button.config(state='normal')
-    lang_code = WHISPER_LANGUAGES.get(language_ui)
-    threading.Thread(target=process_videos_whisper, args=(video_path, model_key, log, skip_existing, lang_code), daemon=True).start()
 
+MODELS = ModelManager()
 
+def apply_whisper_precision(model, precision):
+    import torch
+    if precision == "int8":
+        import whisper.model
+        # whisper.model.Linear отличается от nn.Linear только приведением типа весов, а quantize_dynamic
+        # заменяет лишь точный тип nn.Linear
+        for module in model.modules():
+            if type(module) is whisper.model.Linear:
+                module.__class__ = torch.nn.Linear
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif precision == "bf16":
+        # Внутри энкодера и декодера — bfloat16, наружу — float32: DecodingTask принимает признаки аудио
+        # только fp16/fp32, а bf16-выход энкодера под общим autocast он отвергает
+        for module in (model.encoder, model.decoder):
+            module.forward = autocast_forward(module.forward, torch.bfloat16)
+    elif precision != "fp32":
+        raise ValueError(f"неизвестная точность Whisper: {precision}")
+    return model
 
-def stop_process_whisper():
-    global whisper_stop_flag
-    whisper_stop_flag = True
+def autocast_forward(forward, dtype):
+    def run(*args, **kwargs):
+        import torch
+        with torch.autocast("cpu", dtype=dtype):
+            return forward(*args, **kwargs).float()
+    return run
 
-def transcribe_audio_vosk(wav_path, model, log):
-    global vosk_stop_flag
-    wf = wave.open(wav_path, "rb")
-    rec = KaldiRecognizer(model, wf.getframerate())
-    rec.SetWords(True)
-    total = wf.getnframes()
-    read = 0
-    last_percent = -1
-    while True:
-        if vosk_stop_flag:
-            log("\n❌ Процесс остановлен пользователем.")
-            return None
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        rec.AcceptWaveform(data)
-        read += 4000
-        percent = min(100, int(read / total * 100))
-        if percent != last_percent:
-            log(f"    🟩 Прогресс транскрипции: {percent}%", overwrite=True)
-            last_percent = percent
-    log("\n    ✅ Распознавание завершено.")
-    return json.loads(rec.FinalResult())
+def whisper_inference_context(model):
+    # Замок модели (если она из MODELS): общий экземпляр распознаёт по очереди
+    return getattr(model, "inference_lock", None) or contextlib.nullcontext()
 
-def format_transcription(result, pause_threshold=0.8):
-    entries = result.get("result", [])
-    output = []
-    current_sentence = []
-    sentence_start_time = None
-    last_word_end = 0
-    for word in entries:
-        if sentence_start_time is None:
-            sentence_start_time = word['start']
-        if word['start'] - last_word_end > pause_threshold and current_sentence:
-            output.append(f"[{sentence_start_time:.1f}] {' '.join(current_sentence)}")
-            current_sentence = []
-            sentence_start_time = word['start']
-        current_sentence.append(word['word'])
-        last_word_end = word['end']
-    if current_sentence:
-        output.append(f"[{sentence_start_time:.1f}] {' '.join(current_sentence)}")
-    return '\n'.join(output)
-
-def process_videos_vosk(base_folder, model_path, log):
-    global vosk_stop_flag
-    vosk_stop_flag = False
-    log(f"🚀 Загрузка модели из: {model_path}")
-    model = Model(model_path)
-    supported_ext = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".mpeg", ".mpg")
-    video_files = []
-    for root, _, files in os.walk(base_folder):
-        for f in files:
-            if f.lower().endswith(supported_ext):
-                video_files.append(os.path.join(root, f))
-    log(f"🔎 Найдено видеофайлов: {len(video_files)}\n")
-    error_log_path = os.path.join(base_folder, "error_log.txt")
-    if os.path.exists(error_log_path):
-        os.remove(error_log_path)
-    for idx, video_path in enumerate(video_files, 1):
-        if vosk_stop_flag:
-            log("\n❌ Обработка остановлена пользователем.")
-            break
-        log(f"\n🔄 [{idx}/{len(video_files)}] {video_path}")
-        base_name = os.path.splitext(video_path)[0]
-        wav_path = base_name + ".wav"
-        txt_path = base_name + ".txt"
-        try:
-            log("    🎧 Извлечение аудио...")
-            extract_audio(video_path, wav_path)
-        except Exception as e:
-            log(f"    ⚠️ Ошибка аудио: {e}")
-            with open(error_log_path, "a", encoding="utf-8") as log_f:
-                log_f.write(f"[Audio Error] {video_path}: {e}\n")
-            continue
-        try:
-            log("    📝 Транскрибация...")
-            result = transcribe_audio_vosk(wav_path, model, log)
-            if result is None:
+def preload_from_env(log=None):
+    # VIDTOTXT_PRELOAD=whisper:small или vosk:/путь/к/модели — загрузить модель в фоне при старте
+    value = os.environ.get("VIDTOTXT_PRELOAD", "").strip()
+    engine, _, spec = value.partition(":")
+    if engine in ("whisper", "vosk") and spec:
+        MODELS.preload(engine, spec, log=log)
+
+
+# --- Пул процессов: каждый процесс один раз грузит модель и берёт файлы из общей очереди ---
+
+_worker_model = None
+_worker_stop_event = None
+
+def worker_stop_requested():
+    return _worker_stop_event is not None and _worker_stop_event.is_set()
+
+def _init_worker(engine, model_spec, threads, stop_event):
+    global _worker_model, _worker_stop_event
+    _worker_stop_event = stop_event
+    # В оконном exe у дочерних процессов нет stdout/stderr, а tqdm и Kaldi пишут туда
+    if sys.stdout is None:
+        sys.stdout = open(os.devnull, "w")
+    if sys.stderr is None:
+        sys.stderr = open(os.devnull, "w")
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if engine == "whisper":
+        import torch
+        torch.set_num_threads(threads)
+    _worker_model = MODELS.get(engine, model_spec)
+
+def _worker_transcribe(engine, video_path, options):
+    lines = []
+    errors = []
+
+    def log(msg, overwrite=False):
+        # Построчный прогресс из процесса не передаём — только итоговые сообщения
+        if not overwrite:
+            lines.append(msg)
+
+    if worker_stop_requested():
+        return {"status": "stopped", "lines": lines, "errors": errors, "payload": None}
+    if options.get("metrics"):
+        METRICS.collect()
+    if engine == "whisper":
+        status, payload = transcribe_file_whisper(video_path, _worker_model, log, options.get("lang_code"),
+                                                  pool_audio_cache(options), options.get("vad"),
+                                                  options.get("batch_size", 1), options.get("formats", ("txt",)))
+    else:
+        status, payload = transcribe_file_vosk(video_path, _worker_model, log, errors.append, pool_audio_cache(options),
+                                               options.get("vad"), options.get("vad_jobs"),
+                                               options.get("feed_seconds", VOSK_FEED_SECONDS), options.get("spans", 1),
+                                               options.get("formats", ("txt",)))
+    return {"status": status, "lines": lines, "errors": errors, "payload": payload, "metrics": METRICS.take()}
+
+def run_worker_pool(engine, model_spec, video_files, log, workers, threads_per_worker, options, stop_requested,
+                    log_error=None, store=None):
+    # Результаты выводятся в исходном порядке файлов; store(video_path, payload) вызывается для успешных.
+    # Возвращает True, если обработка остановлена
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError as FutureTimeout
+
+    workers = min(workers, len(video_files))
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    if "vad_jobs" in options and not options["vad_jobs"]:
+        # Без явного --vad-jobs VAD в обработчике занимает столько же потоков, сколько ему выделено
+        options = dict(options, vad_jobs=threads)
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+    log(f"🧵 Пул обработчиков: {workers} процессов × {threads} потоков, модель {model_spec} загружается в каждом...")
+
+    stopped = False
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(engine, model_spec, threads, stop_event)) as pool:
+        futures = [pool.submit(_worker_transcribe, engine, video_path, options) for video_path in video_files]
+        for idx, (video_path, future) in enumerate(zip(video_files, futures), 1):
+            while True:
+                if not stopped and stop_requested():
+                    stopped = True
+                    stop_event.set()
+                    for f in futures:
+                        f.cancel()
+                try:
+                    res = future.result(timeout=0.5)
+                except FutureTimeout:
+                    continue
+                except CancelledError:
+                    res = {"status": "stopped", "lines": [], "errors": []}
+                except Exception as e:
+                    # Например, процесс упал из-за нехватки памяти
+                    res = {"status": "error", "lines": [f"    ⚠️ Ошибка процесса-обработчика: {e}"],
+                           "errors": [f"[Worker Error] {video_path}: {e}"]}
                 break
-            formatted_text = format_transcription(result)
-            with wave.open(wav_path, "rb") as wf:
-                duration = round(wf.getnframes() / wf.getframerate(), 1)
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(f"# {os.path.basename(base_name)} | Длительность: {duration} сек\n")
-                f.write(formatted_text)
-            log(f"    💾 Сохранено: {txt_path}")
-        except Exception as e:
-            log(f"    ⚠️ Ошибка транскрипции: {e}")
-            with open(error_log_path, "a", encoding="utf-8") as log_f:
-                log_f.write(f"[Transcription Error] {video_path}: {e}\n")
-            continue
-    log("\n✅ Обработка завершена.")
+            if res["status"] == "stopped" and not res["lines"]:
+                continue
+            log(f"\n🔄 [{idx}/{len(video_files)}] {video_path}")
+            for line in res["lines"]:
+                log(line)
+            if log_error:
+                for line in res["errors"]:
+                    log_error(line)
+            if store and res["status"] == "ok":
+                store(video_path, res["payload"])
+            METRICS.merge(res.get("metrics", []))
+    return stopped
 
-def start_process_vosk(video_path, model_path, log, stop_button):
-    stop_button.config(state='normal')
-    threading.Thread(target=process_videos_vosk, args=(video_path, model_path, log), daemon=True).start()
+# Лог в окне: потоки обработки только кладут строки в очередь, виджет меняется из главного цикла Tk по таймеру.
+# Подряд идущие строки прогресса схлопываются в последнюю, в окне хранятся последние LOG_MAX_LINES строк,
+# полный лог пишется в файл. Файл одного запуска окна не больше LOG_SPILL_MAX_MB (плюс одна предыдущая часть
+# .1), при старте остаются только LOG_KEEP_FILES последних файлов каждой вкладки
+LOG_MAX_LINES = 2000
+LOG_DRAIN_MS = 100
+LOG_MAX_LINE = 400
+LOG_SPILL_MAX_MB = 32
+LOG_KEEP_FILES = 10
 
-def stop_process_vosk():
-    global vosk_stop_flag
-    vosk_stop_flag = True
+def default_log_dir():
+    return os.path.join(default_cache_dir(), "logs")
 
-class StdoutRedirector:
-    def __init__(self, text_widget):
+def prune_log_files(log_dir, prefix, keep=LOG_KEEP_FILES):
+    # Удаляет старые логи <prefix>-<время>.log (и их части .1), кроме keep последних
+    try:
+        names = sorted(name for name in os.listdir(log_dir) if name.startswith(prefix + "-") and name.endswith(".log"))
+    except OSError:
+        return
+    for name in names[:max(0, len(names) - keep)]:
+        for path in (os.path.join(log_dir, name), os.path.join(log_dir, name + ".1")):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+class LogPane:
+    def __init__(self, root, text_widget, spill_path=None, max_lines=LOG_MAX_LINES, interval_ms=LOG_DRAIN_MS):
+        self.root = root
         self.text_widget = text_widget
-        self._stdout = sys.stdout
-        self.last_line_tag = "progress_line"
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._pending = []
+        self._progress_shown = False
+        self._spill = None
+        self._spilled = 0
+        if spill_path:
+            try:
+                os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+                self._spill = open(spill_path, "w", encoding="utf-8", buffering=1 << 16)
+            except OSError:
+                self._spill = None
+        self.spill_path = spill_path if self._spill else None
+        root.after(interval_ms, self._drain)
 
-    def write(self, text):
-        self._stdout.write(text)
+    def log(self, msg, overwrite=False):
+        # Можно вызывать из любого потока. overwrite — строка прогресса, заменяет предыдущую строку прогресса
+        with self._lock:
+            if overwrite and self._pending and self._pending[-1][1]:
+                self._pending[-1] = (msg, True)
+            else:
+                self._pending.append((msg, overwrite))
 
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
         self.text_widget.configure(state='normal')
+        self.text_widget.delete("1.0", "end")
+        self.text_widget.configure(state='disabled')
+        self._progress_shown = False
 
-        if "\r" in text:
-            # Удалить старую строку прогресса
-            self.text_widget.mark_set("progress_start", "end-1l linestart")
-            self.text_widget.mark_set("progress_end", "end-1l lineend")
-            self.text_widget.delete("progress_start", "progress_end")
-            # Вставить новую строку
-            self.text_widget.insert("end", text.replace("\r", ""))
-        else:
-            self.text_widget.insert("end", text)
+    def close(self):
+        if self._spill:
+            self._spill.close()
+            self._spill = None
 
-        self.text_widget.see("end")
-        self.text_widget.configure(state='disabled')
+    def _drain(self):
+        with self._lock:
+            items, self._pending = self._pending, []
+        try:
+            if items:
+                self._spill_items(items)
+                self._show(items)
+        finally:
+            self.root.after(self.interval_ms, self._drain)
+
+    def _spill_items(self, items):
+        if not self._spill:
+            return
+        text = "".join(msg.lstrip("\n") + "\n" for msg, _ in items)
+        try:
+            if self._spilled and self._spilled + len(text) > LOG_SPILL_MAX_MB * 1024 * 1024:
+                # Заполненный файл становится частью .1, запись продолжается в пустой
+                self._spill.close()
+                os.replace(self.spill_path, self.spill_path + ".1")
+                self._spill = open(self.spill_path, "w", encoding="utf-8", buffering=1 << 16)
+                self._spilled = 0
+            self._spill.write(text)
+            self._spilled += len(text)
+        except OSError:
+            self._spill = None
+
+    def _show(self, items):
+        # В окно попадают только строки, которые в нём останутся
+        items = [(msg, overwrite) for msg, overwrite in items if len(msg) <= LOG_MAX_LINE]
+        if len(items) > self.max_lines:
+            items = items[-self.max_lines:]
+            self._progress_shown = False
+        if not items:
+            return
+        widget = self.text_widget
+        widget.configure(state='normal')
+        for msg, overwrite in items:
+            if overwrite and self._progress_shown:
+                widget.delete("end-2l", "end-1l")
+            widget.insert("end", msg + "\n")
+            self._progress_shown = overwrite
+        # Каждая строка заканчивается "\n", поэтому end-1c стоит в начале пустой строки после последней
+        lines = int(widget.index("end-1c").split(".")[0]) - 1
+        if lines > self.max_lines:
+            widget.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        widget.see("end")
+        widget.configure(state='disabled')
+
+
+class StdoutRedirector:
+    # print() и tqdm из потоков обработки: "\r" — строка прогресса, перерисовывается на месте
+    def __init__(self, pane):
+        self.pane = pane
+        self._stdout = sys.stdout
+        self._lock = threading.Lock()
+        self._partial = ""
+        self._progress = False
+
+    def write(self, text):
+        if self._stdout:
+            self._stdout.write(text)
+        with self._lock:
+            for part in re.split(r"([\r\n])", text):
+                if part == "\r":
+                    if self._partial.strip():
+                        self.pane.log(self._partial, overwrite=True)
+                    self._partial, self._progress = "", True
+                elif part == "\n":
+                    self.pane.log(self._partial, overwrite=self._progress)
+                    self._partial, self._progress = "", False
+                else:
+                    self._partial += part
 
     def flush(self):
-        self._stdout.flush()
+        if self._stdout:
+            self._stdout.flush()
 
 
 def open_vosk_link(event=None):
     webbrowser.open_new("https://alphacephei.com/vosk/models")
 
 def gui_app():
+    import tkinter as tk
+    from tkinter import filedialog, scrolledtext, ttk
+
     root = tk.Tk()
     root.title("🎙️ Video Transcriber GUI (Whisper + Vosk)")
     root.geometry("1260x780")
@@ -368,14 +3418,29 @@ def gui_app():
 
     tk.Label(whisper_tab, text="Выберите модель Whisper:", bg=bg_main, font=("Segoe UI", 10, "bold")).pack(anchor='w', padx=15, pady=(10, 0))
     model_var = tk.StringVar(value=model_label("small"))
-    model_labels = [model_label(m) for m in MODELS_INFO]
+    model_labels = [model_label(m) for m in MODELS_INFO] + [model_label(m, "int8") for m in MODELS_INFO]
     dropdown = tk.OptionMenu(whisper_tab, model_var, *model_labels)
     dropdown.config(font=("Segoe UI", 10), bg="white", width=36)
     dropdown.pack(fill='x', padx=15, pady=(0, 10))
 
     skip_existing_var = tk.BooleanVar(value=True)
     skip_checkbox = tk.Checkbutton(whisper_tab, text="Пропускать уже обработанные", variable=skip_existing_var, bg=bg_main, font=("Segoe UI", 9))
-    skip_checkbox.pack(anchor='w', padx=20, pady=(0, 10))
+    skip_checkbox.pack(anchor='w', padx=20, pady=(0, 0))
+    audio_cache_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(whisper_tab, text="Кэш извлечённого аудио (общий для Whisper и Vosk)", variable=audio_cache_var,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    use_cache_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(whisper_tab, text="Кэш результатов (не распознавать повторно те же видео)", variable=use_cache_var,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    vad_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(whisper_tab, text="Пропускать тишину (VAD)", variable=vad_var,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    frame_workers_w = tk.Frame(whisper_tab, bg=bg_main)
+    frame_workers_w.pack(anchor='w', padx=20, pady=(0, 10))
+    tk.Label(frame_workers_w, text="Параллельных процессов:", bg=bg_main, font=("Segoe UI", 9)).pack(side='left')
+    workers_var = tk.IntVar(value=1)
+    tk.Spinbox(frame_workers_w, from_=1, to=os.cpu_count() or 1, textvariable=workers_var, width=4,
+               font=("Segoe UI", 9)).pack(side='left', padx=5)
     tk.Label(whisper_tab, text="Язык (не обязательно):", bg=bg_main, font=("Segoe UI", 10, "bold")).pack(anchor='w',
                                                                                                          padx=15,
                                                                                                          pady=(0, 0))
@@ -388,16 +3453,16 @@ def gui_app():
 
     frame_buttons_w = tk.Frame(whisper_tab, bg=bg_main)
     frame_buttons_w.pack(pady=15)
-    tk.Button(frame_buttons_w, text="🗑️ Удалить .wav", command=lambda: delete_wavs(entry_video_w.get(), log_output_w),
+    tk.Button(frame_buttons_w, text="🗑️ Удалить аудио", command=lambda: delete_wavs(entry_video_w.get(), log_output_w),
               **btn_style).pack(side='left', padx=5)
     tk.Button(frame_buttons_w, text="📄 Собрать TXT", command=lambda: merge_txt(entry_video_w.get(), log_output_w),
               **btn_style).pack(side='left', padx=5)
 
-    btn_start_w = tk.Button(frame_buttons_w, text="▶️ Обработка", command=lambda: start_process_whisper(entry_video_w.get(), model_var.get(), log_output_w, btn_stop_w, skip_existing_var.get(), language_var.get()), **btn_style)
+    btn_start_w = tk.Button(frame_buttons_w, text="▶️ Обработка", command=lambda: start_process_whisper(entry_video_w.get(), model_var.get(), log_output_w, btn_stop_w, skip_existing_var.get(), language_var.get(), audio_cache_var.get(), workers_var.get(), use_cache_var.get(), vad_var.get()), **btn_style)
     btn_start_w.pack(side='left', padx=5)
     btn_stop_w = tk.Button(frame_buttons_w, text="⛔ Остановить", command=stop_process_whisper, state='normal', **btn_style)
     btn_stop_w.pack(side='left', padx=5)
-    tk.Button(frame_buttons_w, text="🧹 Очистить", command=lambda: clear_output(text_output_w), **btn_style).pack(side='left', padx=5)
+    tk.Button(frame_buttons_w, text="🧹 Очистить", command=lambda: pane_w.clear(), **btn_style).pack(side='left', padx=5)
 
     text_output_w = scrolledtext.ScrolledText(whisper_tab, height=28, bg="#ffffff", relief="flat", font=("Consolas", 10), wrap="word", state='disabled')
     text_output_w.pack(fill='both', expand=True, padx=15, pady=(0, 10))
@@ -423,97 +3488,1082 @@ def gui_app():
     skip_existing_var_v = tk.BooleanVar(value=True)
     skip_checkbox_v = tk.Checkbutton(vosk_tab, text="Пропускать уже обработанные", variable=skip_existing_var_v,
                                      bg=bg_main, font=("Segoe UI", 9))
-    skip_checkbox_v.pack(anchor='w', padx=20, pady=(0, 10))
+    skip_checkbox_v.pack(anchor='w', padx=20, pady=(0, 0))
+    audio_cache_var_v = tk.BooleanVar(value=False)
+    tk.Checkbutton(vosk_tab, text="Кэш извлечённого аудио (общий для Whisper и Vosk)", variable=audio_cache_var_v,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    use_cache_var_v = tk.BooleanVar(value=True)
+    tk.Checkbutton(vosk_tab, text="Кэш результатов (не распознавать повторно те же видео)", variable=use_cache_var_v,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    vad_var_v = tk.BooleanVar(value=False)
+    tk.Checkbutton(vosk_tab, text="Пропускать тишину (VAD), участки речи — параллельно", variable=vad_var_v,
+                   bg=bg_main, font=("Segoe UI", 9)).pack(anchor='w', padx=20, pady=(0, 0))
+    frame_workers_v = tk.Frame(vosk_tab, bg=bg_main)
+    frame_workers_v.pack(anchor='w', padx=20, pady=(0, 10))
+    tk.Label(frame_workers_v, text="Параллельных процессов:", bg=bg_main, font=("Segoe UI", 9)).pack(side='left')
+    workers_var_v = tk.IntVar(value=1)
+    tk.Spinbox(frame_workers_v, from_=1, to=os.cpu_count() or 1, textvariable=workers_var_v, width=4,
+               font=("Segoe UI", 9)).pack(side='left', padx=5)
 
     frame_buttons_v = tk.Frame(vosk_tab, bg=bg_main)
     frame_buttons_v.pack(pady=15)
 
 
-    tk.Button(frame_buttons_v, text="🗑️ Удалить .wav", command=lambda: delete_wavs(entry_video_v.get(), log_output_v),
+    tk.Button(frame_buttons_v, text="🗑️ Удалить аудио", command=lambda: delete_wavs(entry_video_v.get(), log_output_v),
               **btn_style).pack(side='left', padx=5)
     tk.Button(frame_buttons_v, text="📄 Собрать TXT", command=lambda: merge_txt(entry_video_v.get(), log_output_v),
               **btn_style).pack(side='left', padx=5)
 
-    btn_start_v = tk.Button(frame_buttons_v, text="▶️ Обработка", command=lambda: start_process_vosk(entry_video_v.get(), entry_model_v.get(), log_output_v, btn_stop_v, skip_existing_var_v.get())
+    btn_start_v = tk.Button(frame_buttons_v, text="▶️ Обработка", command=lambda: start_process_vosk(entry_video_v.get(), entry_model_v.get(), log_output_v, btn_stop_v, skip_existing_var_v.get(), audio_cache_var_v.get(), workers_var_v.get(), use_cache_var_v.get(), vad_var_v.get())
 , **btn_style)
     btn_start_v.pack(side='left', padx=5)
     btn_stop_v = tk.Button(frame_buttons_v, text="⛔ Остановить", command=stop_process_vosk, state='normal', **btn_style)
     btn_stop_v.pack(side='left', padx=5)
-    tk.Button(frame_buttons_v, text="🧹 Очистить", command=lambda: clear_output(text_output_v), **btn_style).pack(side='left', padx=5)
+    tk.Button(frame_buttons_v, text="🧹 Очистить", command=lambda: pane_v.clear(), **btn_style).pack(side='left', padx=5)
 
     text_output_v = scrolledtext.ScrolledText(vosk_tab, height=28, bg="#ffffff", relief="flat", font=("Consolas", 10), wrap="word", state='disabled')
     text_output_v.pack(fill='both', expand=True, padx=15, pady=(0, 10))
 
-    sys.stdout = StdoutRedirector(text_output_w)
-    sys.stderr = StdoutRedirector(text_output_w)
+    started = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    log_dir = default_log_dir()
+    for prefix in ("whisper", "vosk"):
+        prune_log_files(log_dir, prefix, LOG_KEEP_FILES - 1)
+    pane_w = LogPane(root, text_output_w, os.path.join(log_dir, f"whisper-{started}.log"))
+    pane_v = LogPane(root, text_output_v, os.path.join(log_dir, f"vosk-{started}.log"))
+    log_output_w = pane_w.log
+    log_output_v = pane_v.log
+
+    sys.stdout = StdoutRedirector(pane_w)
+    sys.stderr = StdoutRedirector(pane_w)
 
     def merge_txt(base_folder, log):
-        summary_path = os.path.join(base_folder, "summary.txt")
-        with open(summary_path, "w", encoding="utf-8") as summary_file:
-            for root, _, files in os.walk(base_folder):
-                for f in sorted(files):
-                    if f.endswith(".txt"):
-                        base = os.path.splitext(f)[0]
-                        full_video = [base + ext for ext in [".mp4", ".mov", ".avi", ".mkv", ".webm"]]
-                        if any(os.path.exists(os.path.join(root, v)) for v in full_video):
-                            txt_path = os.path.join(root, f)
-                            with open(txt_path, "r", encoding="utf-8") as tf:
-                                summary_file.write(f"\n\n--- {f} ---\n")
-                                summary_file.write(tf.read())
-        log(f"\n📄 Файл summary.txt сохранён в: {summary_path}")
+        # Сборка идёт в фоне, чтобы окно не замирало на больших папках
+        threading.Thread(target=merge_transcripts, args=(base_folder, log), name="vidtotxt-summary",
+                         daemon=True).start()
 
     def delete_wavs(base_folder, log):
+        # Очистка идёт в фоне, как и сборка summary.txt
+        threading.Thread(target=clear_audio, args=(base_folder, log), name="vidtotxt-cleanup", daemon=True).start()
+
+    def clear_audio(base_folder, log):
+        # Очищает кэш извлечённого аудио (если он вообще заводился) и .wav, оставшиеся в папке от прежних версий
+        audio_cache = None
+        if os.path.isdir(os.path.join(default_cache_dir(), "audio")):
+            audio_cache = open_audio_cache(True, log)
+        if audio_cache is not None:
+            count, freed = audio_cache.clear()
+            log(f"\n🗑️ Кэш аудио очищен: {count} файлов, {freed / 1024 / 1024:.0f} МБ")
         deleted = 0
-        for root, _, files in os.walk(base_folder):
-            for f in files:
-                if f.lower().endswith(".wav"):
-                    wav_path = os.path.join(root, f)
-                    video_path = os.path.splitext(wav_path)[0]
-                    if any(os.path.exists(video_path + ext) for ext in [".mp4", ".mov", ".avi", ".mkv", ".webm"]):
-                        try:
-                            os.remove(wav_path)
-                            deleted += 1
-                        except Exception as e:
-                            log(f"⚠️ Не удалось удалить {wav_path}: {e}")
+        index, close_index = open_folder_index(True, log)
+        try:
+            for entry in scan_media(base_folder, ("wav",), index):
+                if entry.status == "paired":
+                    try:
+                        os.remove(entry.path)
+                        deleted += 1
+                    except Exception as e:
+                        log(f"⚠️ Не удалось удалить {entry.path}: {e}")
+        finally:
+            if close_index:
+                index.close()
         log(f"\n🗑️ Удалено {deleted} .wav файлов")
 
-    def log_output_w(msg, overwrite=False):
-        if len(msg) > 400:
-            return
+    footer = tk.Label(root, text="Разработано TG @Smailkiller", fg="#7f8c8d", bg="#ecf0f3", font=("Segoe UI", 9, "italic"))
+    footer.pack(pady=(0, 12))
+
+    preload_from_env(log_output_w)
+    metrics_from_env(log_output_w)
+
+    def evict_idle_models():
+        MODELS.evict_idle()
+        root.after(60000, evict_idle_models)
+
+    root.after(60000, evict_idle_models)
+    if pane_w.spill_path:
+        log_output_w(f"📝 Полный лог: {pane_w.spill_path}")
+    if pane_v.spill_path:
+        log_output_v(f"📝 Полный лог: {pane_v.spill_path}")
+    try:
+        root.mainloop()
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        pane_w.close()
+        pane_v.close()
+
+# =========================== Сравнение точности Whisper ===========================
+
+def transcript_words(text):
+    # Слова без меток времени "[0:00:12]"
+    return re.findall(r"\w+", re.sub(r"^\[[\d:]+\]\s*", "", text or "", flags=re.M).lower())
+
+def word_error_rate(reference, hypothesis):
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    prev = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        cur = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ref_word != hyp_word))
+        prev = cur
+    return prev[-1] / len(reference)
+
+def compare_whisper_precisions(sample_path, model_name, precisions, language=None, log=print):
+    """Распознаёт один файл моделью в каждой точности; WER считается относительно первой в списке."""
+    audio = load_audio_array(sample_path)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    rows, reference = [], None
+    for precision in precisions:
+        spec = whisper_spec(model_name, precision)
+        MODELS.clear()
+        started = time.perf_counter()
+        model = MODELS.get("whisper", spec, log=log)
+        load_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        transcript = transcribe_audio_whisper(audio, model, language)
+        seconds = time.perf_counter() - started
+        words = transcript_words(transcript_text(transcript) if transcript else "")
+        if reference is None:
+            reference = words
+        row = {
+            "precision": precision,
+            "device": MODELS.key("whisper", spec)[2],
+            "load_seconds": round(load_seconds, 2),
+            "transcribe_seconds": round(seconds, 2),
+            "rtf": round(seconds / audio_seconds, 3) if audio_seconds else None,
+            "model_mb": round(ModelManager._estimate_size(model, "whisper", model_name, None, precision) / 2 ** 20, 1),
+            "words": len(words),
+            "wer_vs_" + precisions[0]: round(word_error_rate(reference, words), 4),
+            "ok": transcript is not None,
+        }
+        rows.append(row)
+        log(f"⏱ {spec}: {row['transcribe_seconds']} с, RTF {row['rtf']}, {row['model_mb']} МБ, "
+            f"WER {row['wer_vs_' + precisions[0]]:.2%}")
+    MODELS.clear()
+    return {"sample": os.path.abspath(sample_path), "audio_seconds": round(audio_seconds, 2),
+            "model": model_name, "language": language, "results": rows}
+
+
+# =========================== Бенчмарк ===========================
+
+BENCH_SEED = 20240601
+
+def synth_fixture_pcm(seconds, seed):
+    # Детерминированный «речеподобный» сигнал: слоги из гармоник с вибрато, паузы и слабый шум
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    audio = np.zeros(n, dtype=np.float64)
+    pos = 0
+    while pos < n:
+        end = min(n, pos + int(rng.uniform(0.8, 4.0) * SAMPLE_RATE))
+        t = np.arange(end - pos) / SAMPLE_RATE
+        freq = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+        phase = 2 * np.pi * np.cumsum(freq) / SAMPLE_RATE
+        tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = np.abs(np.sin(np.pi * rng.uniform(2, 5) * t))
+        audio[pos:end] = 0.2 * tone * envelope
+        pos = end + int(rng.uniform(0.3, 1.5) * SAMPLE_RATE)
+    audio += rng.normal(0, 0.003, n)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+def make_bench_fixtures(folder, count=3, seconds=60.0):
+    # Видео-контейнеры (.mkv с PCM-дорожкой), чтобы замер шёл через тот же ffmpeg, что и у настоящих видео.
+    # bitexact — без версии ffmpeg в заголовке, файлы одинаковы от запуска к запуску
+    os.makedirs(folder, exist_ok=True)
+    fixtures = []
+    for i in range(count):
+        path = os.path.join(folder, f"bench_{i + 1:02d}_{int(seconds)}s.mkv")
+        if not os.path.exists(path):
+            pcm = synth_fixture_pcm(seconds, BENCH_SEED + i)
+            cmd = [ffmpeg_path, "-nostdin", "-y", "-v", "error", "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+                   "-i", "-", "-c:a", "pcm_s16le", "-fflags", "+bitexact", "-flags:a", "+bitexact", path]
+            proc = subprocess.run(cmd, input=pcm.tobytes(), capture_output=True, creationflags=_subprocess_flags())
+            if proc.returncode != 0:
+                raise AudioExtractionError(proc.stderr.decode("utf-8", errors="replace").strip()
+                                           or f"ffmpeg завершился с кодом {proc.returncode}")
+        fixtures.append(path)
+    return fixtures
+
+def _bench_stage(stages, name, audio_seconds, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    stage = stages.setdefault(name, {"seconds": 0.0, "audio_seconds": 0.0})
+    stage["seconds"] += seconds
+    stage["audio_seconds"] += audio_seconds
+    return result
+
+def _bench_quiet_log(msg, overwrite=False):
+    pass
 
-        text_output_w.configure(state='normal')
+def _bench_config(engine, model_spec, workers, fixtures, language=None, measure_stages=True):
+    # Выполняется в отдельном процессе, чтобы пиковый RSS относился только к этой конфигурации.
+    # Поэтапные замеры не зависят от числа процессов, их достаточно снять один раз на модель
+    import numpy as np
+    work_dir = tempfile.mkdtemp(prefix="vidtotxt-bench-")
+    try:
+        run = {"engine": engine, "model": model_spec, "workers": workers, "files": len(fixtures)}
+        audio_total = 0.0
+        started = time.perf_counter()
+        model = MODELS.get(engine, model_spec)
+        run["load_seconds"] = round(time.perf_counter() - started, 2)
 
-        # Если строка похожа на прогресс (содержит % и / и frames/s)
-        is_progress = "%" in msg and "/" in msg and "frames/s" in msg
+        stages = {}
+        for idx, fixture in enumerate(fixtures if measure_stages else []):
+            wav_path = os.path.join(work_dir, f"{idx}.wav")
+            out_path = os.path.join(work_dir, f"{idx}.txt")
+            _bench_stage(stages, "extract_audio", 0.0, extract_audio, fixture, wav_path)
+            with wave.open(wav_path, "rb") as wf:
+                audio_seconds = wf.getnframes() / SAMPLE_RATE
+            stages["extract_audio"]["audio_seconds"] += audio_seconds
+            audio_total += audio_seconds
+            if engine == "whisper":
+                with wave.open(wav_path, "rb") as wf:
+                    audio = np.frombuffer(wf.readframes(wf.getnframes()), np.int16).astype(np.float32) / 32768.0
+                transcript = _bench_stage(stages, "whisper", audio_seconds, transcribe_audio_whisper, audio, model,
+                                          language)
+                text = transcript_text(transcript) if transcript else ""
+            else:
+                result = _bench_stage(stages, "vosk", audio_seconds, transcribe_audio_vosk, wav_path, model,
+                                      _bench_quiet_log)
+                text = _bench_stage(stages, "format_transcription", audio_seconds, format_transcription, result)
+            _bench_stage(stages, "write", audio_seconds, atomic_write_text, out_path, text or "")
+        for stage in stages.values():
+            stage["rtf"] = round(stage["seconds"] / stage["audio_seconds"], 4) if stage["audio_seconds"] else None
+            stage["seconds"] = round(stage["seconds"], 3)
+            stage["audio_seconds"] = round(stage["audio_seconds"], 1)
+        if stages:
+            run["stages"] = stages
 
-        if is_progress:
-            # Удаляем последнюю строку
-            text_output_w.delete("end-2l", "end-1l")
-            text_output_w.insert("end", msg + "\n")
+        # Сквозной прогон папки «с нуля»: загрузка модели, конвейер/пул процессов, запись .txt, без кэша
+        batch_dir = os.path.join(work_dir, "batch")
+        os.makedirs(batch_dir)
+        for fixture in fixtures:
+            shutil.copy2(fixture, batch_dir)
+        if not measure_stages:
+            audio_total = sum(probe_duration(fixture) or 0.0 for fixture in fixtures)
+        MODELS.clear()
+        started = time.perf_counter()
+        if engine == "whisper":
+            process_videos_whisper(batch_dir, model_spec, _bench_quiet_log, False, language, workers=workers,
+                                   cache=False)
         else:
-            text_output_w.insert("end", msg + "\n")
+            process_videos_vosk(batch_dir, model_spec, _bench_quiet_log, workers=workers, cache=False)
+        seconds = time.perf_counter() - started
+        written = sum(name.endswith(".txt") for name in os.listdir(batch_dir))
+        run["end_to_end"] = {
+            "seconds": round(seconds, 2),
+            "audio_seconds": round(audio_total, 1),
+            "rtf": round(seconds / audio_total, 4) if audio_total else None,
+            "files_per_hour": round(written * 3600 / seconds, 1) if seconds else None,
+            "written": written,
+        }
+        run["peak_rss_mb"] = peak_rss_mb()
+        run["peak_rss_workers_mb"] = peak_rss_mb(children=True) if workers > 1 else None
+        return run
+    finally:
+        MODELS.clear()
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-        text_output_w.see("end")
-        text_output_w.configure(state='disabled')
+def run_benchmark(fixtures, configs, language=None, log=print):
+    """configs — список (движок, модель, процессов). Каждая конфигурация — в свежем процессе."""
+    import multiprocessing
+    import platform
+    from concurrent.futures import ProcessPoolExecutor
+    ctx = multiprocessing.get_context("spawn")
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(),
+                 "cpu_count": os.cpu_count(), "machine": platform.machine()},
+        "fixtures": [{"name": os.path.basename(f), "bytes": os.path.getsize(f)} for f in fixtures],
+        "runs": [],
+    }
+    measured = set()
+    for engine, model_spec, workers in configs:
+        log(f"⏱ {engine} {model_spec}, процессов: {workers}...")
+        measure_stages = (engine, model_spec) not in measured
+        measured.add((engine, model_spec))
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                run = pool.submit(_bench_config, engine, model_spec, workers, fixtures, language,
+                                  measure_stages).result()
+            except Exception as e:
+                run = {"engine": engine, "model": model_spec, "workers": workers, "error": str(e)}
+                log(f"    ⚠️ Ошибка: {e}")
+        report["runs"].append(run)
+        if "end_to_end" in run:
+            e2e = run["end_to_end"]
+            log(f"    RTF {e2e['rtf']}, {e2e['files_per_hour']} файлов/ч, пик RSS {run['peak_rss_mb']} МБ")
+    return report
 
-    def log_output_v(msg, overwrite=False):
-        if len(msg) < 400:
-            text_output_v.configure(state='normal')
-            if overwrite:
-                text_output_v.delete("end-2l", "end-1l")
-            text_output_v.insert(tk.END, msg + "\n")
-            text_output_v.see(tk.END)
-            text_output_v.configure(state='disabled')
 
-    def clear_output(text_output):
-        text_output.configure(state='normal')
-        text_output.delete("1.0", tk.END)
-        text_output.configure(state='disabled')
+# =========================== Сервер заданий ===========================
+# Долгоживущий процесс с тёплыми моделями: другие сервисы ставят задания по HTTP (JSON), опрашивают статус
+# и забирают результаты. Задания хранятся в SQLite и переживают перезапуск — прерванные возвращаются в очередь.
+# Первыми берутся задания с большим priority, при равном — более старые
 
-    footer = tk.Label(root, text="Разработано TG @Smailkiller", fg="#7f8c8d", bg="#ecf0f3", font=("Segoe UI", 9, "italic"))
-    footer.pack(pady=(0, 12))
+SERVER_PORT = 8765
+JOB_LOG_LINES = 200
+JOB_FINISHED = ("done", "failed", "cancelled")
+
+def job_request(data):
+    # Проверяет тело POST /jobs и приводит его к параметрам process_videos_*. ValueError — ошибка клиента
+    if not isinstance(data, dict):
+        raise ValueError("ожидается JSON-объект")
+    paths = data.get("paths") or ([data["path"]] if data.get("path") else [])
+    if not isinstance(paths, list) or not paths or not all(isinstance(p, str) for p in paths):
+        raise ValueError("paths — список папок и/или видеофайлов")
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise ValueError(f"путь не найден: {', '.join(missing)}")
+    engine = data.get("engine", "whisper")
+    if engine == "whisper":
+        model = data.get("model") or "small"
+        name, precision = parse_whisper_spec(model)
+        if name not in MODELS_INFO or precision not in WHISPER_PRECISIONS:
+            raise ValueError(f"неизвестная модель Whisper: {model}")
+    elif engine == "vosk":
+        model = data.get("model")
+        if not model or not os.path.isdir(model):
+            raise ValueError(f"папка модели Vosk не найдена: {model}")
+    else:
+        raise ValueError(f"неизвестный движок: {engine}")
+    formats = data.get("formats", "txt")
+    formats = parse_formats(",".join(formats) if isinstance(formats, list) else str(formats))
+    request = {
+        "paths": paths, "engine": engine, "model": model, "language": data.get("language") or None,
+        "formats": list(formats), "skip_existing": bool(data.get("skip_existing", False)),
+        "audio_cache": bool(data.get("audio_cache", False)), "vad": bool(data.get("vad", False)),
+        "batch_size": int(data.get("batch_size", 1)), "spans": int(data.get("spans", 1)),
+        "feed_seconds": float(data.get("feed_seconds", VOSK_FEED_SECONDS)),
+    }
+    if request["batch_size"] < 1 or request["spans"] < 1 or request["feed_seconds"] <= 0:
+        raise ValueError("batch_size и spans — от 1, feed_seconds — больше нуля")
+    return request, int(data.get("priority", 0))
+
+class JobStore:
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "jobs.sqlite")
+        elif os.path.isdir(path):
+            path = os.path.join(path, "jobs.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, created REAL, priority INTEGER, engine TEXT, status TEXT, request TEXT,
+                started REAL, finished REAL, error TEXT, log TEXT, results TEXT);
+            CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(status, priority, created);
+        """)
+        with self._lock, self._db:
+            self.requeued = self._db.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'").rowcount
+
+    def add(self, request, priority=0):
+        job_id = hashlib.blake2b(os.urandom(16), digest_size=8).hexdigest()
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO jobs (id, created, priority, engine, status, request) "
+                             "VALUES (?, ?, ?, ?, 'queued', ?)",
+                             (job_id, time.time(), priority, request["engine"],
+                              json.dumps(request, ensure_ascii=False)))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, status=None, limit=100):
+        sql = "SELECT id, created, priority, engine, status, started, finished, error FROM jobs"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def claim(self, engines):
+        # Самое приоритетное задание в очереди для одного из движков со свободным местом -> running
+        if not engines:
+            return None
+        marks = ",".join("?" * len(engines))
+        with self._lock, self._db:
+            row = self._db.execute(f"SELECT * FROM jobs WHERE status = 'queued' AND engine IN ({marks}) "
+                                   "ORDER BY priority DESC, created LIMIT 1", list(engines)).fetchone()
+            if row is None:
+                return None
+            started = time.time()
+            self._db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (started, row["id"]))
+        return dict(self._job(row), status="running", started=started)
+
+    def finish(self, job_id, status, log_lines, results, error=None):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET status = ?, finished = ?, log = ?, results = ?, error = ? WHERE id = ?",
+                             (status, time.time(), "\n".join(log_lines),
+                              json.dumps(results, ensure_ascii=False), error, job_id))
+
+    def cancel_queued(self, job_id):
+        with self._lock, self._db:
+            return self._db.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                    "WHERE id = ? AND status = 'queued'", (time.time(), job_id)).rowcount > 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["results"] = json.loads(job["results"]) if job.get("results") else None
+        job["log"] = job["log"].split("\n") if job.get("log") else []
+        return job
+
+class JobLog:
+    # Последние JOB_LOG_LINES строк лога задания; строки прогресса (overwrite) заменяют предыдущую такую же
+    def __init__(self, echo=None):
+        self.lines = collections.deque(maxlen=JOB_LOG_LINES)
+        self._echo = echo
+        self._progress = False
+
+    def __call__(self, msg, overwrite=False):
+        text = str(msg).strip("\n")
+        if overwrite and self._progress and self.lines:
+            self.lines[-1] = text
+        elif text:
+            self.lines.append(text)
+        self._progress = overwrite
+        if self._echo and not overwrite and text:
+            self._echo(text)
+
+def job_results(request, started, index=None):
+    # Для каждого видео задания — файлы результата; fresh — записаны этим заданием, а не остались от прошлых
+    results = []
+    for video_path in find_video_files(request["paths"], index):
+        base = os.path.splitext(video_path)[0]
+        outputs = {fmt: f"{base}.{fmt}" for fmt in request["formats"] if os.path.exists(f"{base}.{fmt}")}
+        fresh = "txt" in outputs and os.path.getmtime(outputs["txt"]) >= started - 1
+        results.append({"video": video_path, "outputs": outputs, "fresh": fresh})
+    return results
+
+def run_job(request, log, cancel, cache, index):
+    formats = tuple(request["formats"])
+    if request["engine"] == "whisper":
+        process_videos_whisper(request["paths"], request["model"], log, request["skip_existing"], request["language"],
+                               request["audio_cache"], 1, None, 2, 4, cache, request["vad"], request["batch_size"],
+                               index, False, formats, cancel)
+    else:
+        process_videos_vosk(request["paths"], request["model"], log, request["skip_existing"], request["audio_cache"],
+                            1, None, 2, 4, cache, request["vad"], None, request["feed_seconds"], request["spans"],
+                            index, False, formats, cancel)
+
+class JobServer:
+    # Диспетчер: не больше max_jobs заданий одновременно и не больше limits[движок] на движок.
+    # MODELS отдаёт всем заданиям один экземпляр модели Whisper; распознавание им всё равно идёт по очереди
+    # (whisper_inference_context), поэтому по умолчанию задания Whisper идут по одному, а больший лимит лишь
+    # совмещает декодирование и запись одних заданий с распознаванием других. Vosk-задания распознают общей
+    # моделью параллельно. Модели остаются в MODELS между заданиями. ValueError — неизвестный движок или лимит < 1
+    def __init__(self, store, max_jobs=2, limits=None, cache=None, index=None, log=print):
+        self.store = store
+        self.max_jobs = max(1, max_jobs)
+        self.limits = {"whisper": 1, "vosk": self.max_jobs}
+        for engine, limit in (limits or {}).items():
+            if engine not in self.limits:
+                raise ValueError(f"неизвестный движок: {engine}")
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError(f"лимит {engine} должен быть целым не меньше 1: {limit}")
+            self.limits[engine] = limit
+        self.cache = cache
+        self.index = index
+        self.log = log
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._dispatch, name="vidtotxt-jobs", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, data):
+        request, priority = job_request(data)
+        job_id = self.store.add(request, priority)
+        self._wake.set()
+        return job_id
+
+    def job(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            running = self._running.get(job_id)
+        if running is not None:
+            job["log"] = list(running[2].lines)
+        return job
+
+    def cancel(self, job_id):
+        # -> новый статус задания или None, если такого нет
+        with self._lock:
+            running = self._running.get(job_id)
+        if running is not None:
+            running[1].set()
+            return "cancelling"
+        if self.store.cancel_queued(job_id):
+            return "cancelled"
+        job = self.store.get(job_id)
+        return job["status"] if job else None
+
+    def running_count(self):
+        with self._lock:
+            return len(self._running)
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        with self._lock:
+            for _, cancel, _ in self._running.values():
+                cancel.set()
+
+    def _free_engines(self):
+        with self._lock:
+            if len(self._running) >= self.max_jobs:
+                return []
+            busy = collections.Counter(engine for engine, _, _ in self._running.values())
+        return [engine for engine, limit in self.limits.items() if busy[engine] < limit]
+
+    def _dispatch(self):
+        while not self._closed.is_set():
+            job = self.store.claim(self._free_engines())
+            if job is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            cancel = threading.Event()
+            job_log = JobLog(lambda text, job_id=job["id"]: self.log(f"[{job_id}] {text}"))
+            with self._lock:
+                self._running[job["id"]] = (job["engine"], cancel, job_log)
+            threading.Thread(target=self._run, args=(job, cancel, job_log), name=f"vidtotxt-job-{job['id']}",
+                             daemon=True).start()
+
+    def _run(self, job, cancel, job_log):
+        self.log(f"▶️ Задание {job['id']}: {job['engine']} {job['request']['model']}, приоритет {job['priority']}")
+        status, error = "done", None
+        try:
+            run_job(job["request"], job_log, cancel, self.cache, self.index)
+            if cancel.is_set():
+                status = "cancelled"
+        except Exception as e:
+            status, error = "failed", str(e)
+            job_log(f"❌ Ошибка задания: {e}")
+        try:
+            results = job_results(job["request"], job["started"] or time.time(), self.index)
+        except OSError as e:
+            results = []
+            job_log(f"⚠️ Не удалось собрать результаты: {e}")
+        if self._closed.is_set():
+            # Сервер останавливается: задание остаётся running и при следующем запуске вернётся в очередь
+            return
+        self.store.finish(job["id"], status, job_log.lines, results, error)
+        with self._lock:
+            self._running.pop(job["id"], None)
+        self._wake.set()
+        self.log(f"⏹️ Задание {job['id']}: {status}")
+
+def job_result_files(job, fmt="txt"):
+    # Содержимое файлов результата в формате fmt для GET /jobs/<id>/result
+    files = []
+    for item in job.get("results") or []:
+        path = item["outputs"].get(fmt)
+        entry = {"video": item["video"], "path": path, "fresh": item["fresh"], "content": None}
+        if path:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry["content"] = json.load(f) if fmt == "json" else f.read()
+            except (OSError, ValueError) as e:
+                entry["error"] = str(e)
+        files.append(entry)
+    return files
+
+def serve_jobs(server, port=SERVER_PORT, host="127.0.0.1", log=None):
+    # POST /jobs — поставить задание, GET /jobs[?status=] — список, GET /jobs/<id> — статус и лог,
+    # GET /jobs/<id>/result[?format=txt] — результаты, DELETE /jobs/<id> (или POST /jobs/<id>/cancel) — отмена,
+    # GET /health. Возвращает HTTP-сервер; serve_forever() вызывает вызывающий
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            url = urlsplit(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            return parts, {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        def do_GET(self):
+            parts, query = self._route()
+            if parts == ["health"]:
+                self._reply(200, {"status": "ok", "running": server.running_count(), "jobs": server.store.counts(),
+                                  "models": MODELS.loaded_count()})
+            elif parts == ["jobs"]:
+                try:
+                    limit = int(query.get("limit", 100))
+                except ValueError:
+                    limit = 0
+                if limit < 1:
+                    self._reply(400, {"error": "limit — целое число от 1"})
+                    return
+                self._reply(200, {"jobs": server.store.list(query.get("status"), limit)})
+            elif len(parts) in (2, 3) and parts[0] == "jobs":
+                job = server.job(parts[1])
+                if job is None:
+                    self._reply(404, {"error": "задание не найдено"})
+                elif len(parts) == 2:
+                    self._reply(200, job)
+                elif parts[2] == "result":
+                    fmt = query.get("format", "txt")
+                    if job["status"] not in JOB_FINISHED:
+                        self._reply(409, {"id": job["id"], "status": job["status"], "error": "задание ещё не завершено"})
+                    elif fmt not in job["request"]["formats"]:
+                        self._reply(400, {"error": f"формат {fmt} не заказан в задании"})
+                    else:
+                        self._reply(200, {"id": job["id"], "status": job["status"], "format": fmt,
+                                          "files": job_result_files(job, fmt)})
+                else:
+                    self._reply(404, {"error": "неизвестный адрес"})
+            else:
+                self._reply(404, {"error": "неизвестный адрес"})
+
+        def do_POST(self):
+            parts, _ = self._route()
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                self._cancel(parts[1])
+                return
+            if parts != ["jobs"]:
+                self._reply(404, {"error": "неизвестный адрес"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length).decode("utf-8") or "null")
+                job_id = server.submit(data)
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            self._reply(201, {"id": job_id, "status": "queued"})
+
+        def do_DELETE(self):
+            parts, _ = self._route()
+            if len(parts) == 2 and parts[0] == "jobs":
+                self._cancel(parts[1])
+            else:
+                self._reply(404, {"error": "неизвестный адрес"})
+
+        def _cancel(self, job_id):
+            status = server.cancel(job_id)
+            if status is None:
+                self._reply(404, {"error": "задание не найдено"})
+            else:
+                self._reply(200, {"id": job_id, "status": status})
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    if log:
+        log(f"🛰️ Сервер заданий: http://{host}:{httpd.server_address[1]}/jobs")
+    return httpd
+
+
+def cli_log(msg, overwrite=False):
+    if overwrite:
+        print("\r" + msg, end="", flush=True)
+    else:
+        print(msg, flush=True)
+
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(prog="VidToTXT", description="Транскрибация видео в текст (Whisper + Vosk)")
+    sub = parser.add_subparsers(dest="command")
+
+    tr = sub.add_parser("transcribe", help="пакетная транскрибация без GUI")
+    tr.add_argument("paths", nargs="+", help="папки и/или видеофайлы")
+    tr.add_argument("--engine", choices=("whisper", "vosk", "auto"), default="whisper",
+                    help="auto — движок и модель для каждого файла по его языку (см. --route)")
+    tr.add_argument("--model", default="small",
+                    help="имя модели Whisper (tiny/base/small/medium/large) или путь к папке модели Vosk")
+    tr.add_argument("--language", default=None, help="код языка для Whisper (ru, en, ...), по умолчанию автоопределение")
+    tr.add_argument("--route", action="append", default=[], metavar="ЯЗЫК=ДВИЖОК:МОДЕЛЬ",
+                    help="для --engine auto: ru=vosk:/models/vosk-ru, en,de=whisper:small, *=whisper:small "
+                         "(остальные языки); язык определяется Whisper tiny по фрагменту речи (можно несколько раз)")
+    tr.add_argument("--format", default="txt",
+                    help=f"форматы результата через запятую: {', '.join(OUTPUT_FORMATS)} (.txt пишется всегда)")
+    tr.add_argument("--skip-existing", action="store_true", help="пропускать видео, для которых уже есть результат")
+    tr.add_argument("--audio-cache", nargs="?", const=True, default=False, metavar="ПАПКА",
+                    help="кэшировать извлечённое аудио (общее для Whisper и Vosk, по умолчанию в пользовательском кэше)")
+    tr.add_argument("--audio-cache-max-mb", type=float, default=AUDIO_CACHE_MAX_MB, help="лимит размера кэша аудио, МБ")
+    # Прежний флаг: вместо .wav рядом с видео теперь используется кэш аудио
+    tr.add_argument("--keep-wav", dest="audio_cache", action="store_const", const=True, help=argparse.SUPPRESS)
+    tr.add_argument("--workers", type=int, default=1, help="число процессов-обработчиков (каждый грузит свою модель)")
+    tr.add_argument("--threads-per-worker", type=int, default=None,
+                    help="потоков torch/OpenMP на процесс, по умолчанию ядра / процессы")
+    tr.add_argument("--decode-ahead", type=int, default=2,
+                    help="сколько следующих файлов декодировать заранее, пока идёт распознавание текущего")
+    tr.add_argument("--write-queue", type=int, default=4, help="длина очереди записи результатов на диск")
+    tr.add_argument("--vad", action="store_true",
+                    help="пропускать тишину: распознавать только участки речи (Vosk — параллельно)")
+    tr.add_argument("--vad-jobs", type=int, default=None,
+                    help="сколько участков речи Vosk распознавать одновременно, по умолчанию по числу ядер")
+    tr.add_argument("--vosk-feed-seconds", type=float, default=VOSK_FEED_SECONDS,
+                    help="Vosk: сколько секунд аудио подавать распознавателю за раз (больше — меньше накладных расходов)")
+    tr.add_argument("--vosk-spans", type=int, default=1,
+                    help="Vosk: делить длинный файл (от 4 минут) на N отрезков по тихим местам и распознавать их "
+                         "параллельно на общей модели")
+    tr.add_argument("--batch-size", type=int, default=1,
+                    help="Whisper: декодировать 30-секундные окна пакетами по N (в т.ч. из разных файлов)")
+    tr.add_argument("--cache", default=None,
+                    help="файл или папка кэша результатов (по умолчанию в пользовательском кэше)")
+    tr.add_argument("--no-cache", action="store_true", help="не использовать кэш результатов")
+    tr.add_argument("--index", default=None,
+                    help="файл или папка индекса папок (по умолчанию в пользовательском кэше)")
+    tr.add_argument("--no-index", action="store_true",
+                    help="не использовать индекс папок: каждый запуск просматривает все папки")
+    tr.add_argument("--rescan", action="store_true", help="перечитать все папки и обновить индекс")
+    tr.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_MB, help="лимит размера кэша, МБ")
+    tr.add_argument("--cache-max-age-days", type=float, default=CACHE_MAX_AGE_DAYS,
+                    help="удалять записи кэша, не использованные дольше N дней")
+    tr.add_argument("--metrics", default=None,
+                    help="писать время этапов по каждому файлу JSON-строками в файл (или - для stderr)")
+    tr.add_argument("--metrics-port", type=int, default=None,
+                    help="отдавать сводные метрики в формате Prometheus на http://127.0.0.1:PORT/metrics")
+    tr.add_argument("--profile", default=None, help="снять профиль cProfile потока распознавания в файл .pstats")
+
+    sm = sub.add_parser("summary", help="собрать summary.txt из транскриптов папки и обновить индекс поиска")
+    sm.add_argument("folder", help="папка с видео и транскриптами")
+    sm.add_argument("--search-index", default=None,
+                    help="файл или папка индекса транскриптов (по умолчанию в пользовательском кэше)")
+
+    se = sub.add_parser("search", help="полнотекстовый поиск по фразам транскриптов, собранных командой summary")
+    se.add_argument("query", nargs="+", help="слова для поиска (ищутся по началу слова)")
+    se.add_argument("--folder", default=None, help="искать только в транскриптах этой папки")
+    se.add_argument("--limit", type=int, default=20, help="сколько совпадений вывести")
+    se.add_argument("--search-index", default=None, help="файл или папка индекса транскриптов")
+
+    sv = sub.add_parser("serve", help="сервер заданий: очередь по HTTP, модели остаются загруженными между заданиями")
+    sv.add_argument("--host", default="127.0.0.1", help="адрес для входящих запросов")
+    sv.add_argument("--port", type=int, default=SERVER_PORT, help="порт HTTP API")
+    sv.add_argument("--jobs", type=int, default=2, help="сколько заданий выполнять одновременно")
+    sv.add_argument("--jobs-db", default=None, help="файл или папка базы заданий (по умолчанию в пользовательском кэше)")
+    sv.add_argument("--limit", action="append", default=[],
+                    help="сколько заданий движка выполнять одновременно: whisper=2, vosk=4 (можно несколько раз; "
+                         "по умолчанию whisper=1, vosk=--jobs)")
+    sv.add_argument("--preload", action="append", default=[],
+                    help="загрузить модель при старте: whisper:small, vosk:/путь/к/модели (можно несколько раз)")
+    sv.add_argument("--cache", default=None, help="файл или папка кэша результатов")
+    sv.add_argument("--no-cache", action="store_true", help="не использовать кэш результатов")
+    sv.add_argument("--index", default=None, help="файл или папка индекса папок")
+    sv.add_argument("--no-index", action="store_true", help="не использовать индекс папок")
+
+    cp = sub.add_parser("compare-precision", help="сравнить скорость и точность Whisper в fp32/int8/bf16 на CPU")
+    cp.add_argument("sample", help="видео- или аудиофайл для сравнения")
+    cp.add_argument("--model", default="small", choices=tuple(MODELS_INFO), help="модель Whisper")
+    cp.add_argument("--precisions", default=",".join(WHISPER_PRECISIONS),
+                    help="точности через запятую; WER считается относительно первой")
+    cp.add_argument("--language", default=None, help="код языка, по умолчанию автоопределение")
+    cp.add_argument("--json", default=None, help="сохранить результаты в JSON-файл")
+
+    bn = sub.add_parser("bench", help="замер скорости по этапам на детерминированных тестовых файлах")
+    bn.add_argument("--engines", default="whisper", help="движки через запятую: whisper,vosk")
+    bn.add_argument("--whisper-models", default="small", help="модели Whisper через запятую (например tiny,small:int8)")
+    bn.add_argument("--vosk-model", default=None, help="путь к папке модели Vosk")
+    bn.add_argument("--workers", default="1", help="числа процессов через запятую, например 1,2,4")
+    bn.add_argument("--files", type=int, default=3, help="сколько тестовых файлов сгенерировать")
+    bn.add_argument("--seconds", type=float, default=60.0, help="длительность каждого тестового файла, с")
+    bn.add_argument("--fixtures", default=None,
+                    help="папка тестовых файлов: если в ней есть видео, замер идёт по ним, иначе файлы создаются там")
+    bn.add_argument("--language", default=None, help="код языка для Whisper")
+    bn.add_argument("--json", default=None, help="сохранить отчёт в JSON-файл")
+    return parser
+
+
+def run_cli(argv):
+    args = build_cli_parser().parse_args(argv)
+    if args.command == "transcribe":
+        return run_transcribe(args)
+    if args.command == "summary":
+        return run_summary(args)
+    if args.command == "search":
+        return run_search(args)
+    if args.command == "serve":
+        return run_serve(args)
+    if args.command == "compare-precision":
+        return run_compare_precision(args)
+    if args.command == "bench":
+        return run_bench(args)
+    build_cli_parser().print_help()
+    return 2
+
+
+def run_transcribe(args):
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        cli_log(f"❌ Путь не найден: {', '.join(missing)}")
+        return 2
+
+    if args.engine == "whisper":
+        name, precision = parse_whisper_spec(args.model)
+        if name not in MODELS_INFO or precision not in WHISPER_PRECISIONS:
+            cli_log(f"❌ Неизвестная модель Whisper: {args.model}")
+            return 2
+    if args.engine == "auto" and not args.route:
+        cli_log("❌ Для --engine auto нужен хотя бы один --route, например --route ru=vosk:/models/vosk-ru")
+        return 2
+    try:
+        formats = parse_formats(args.format)
+        routes = parse_routes(args.route) if args.engine == "auto" else None
+    except ValueError as e:
+        cli_log(f"❌ {e}")
+        return 2
+    if args.vosk_feed_seconds <= 0:
+        cli_log(f"❌ --vosk-feed-seconds должно быть больше нуля: {args.vosk_feed_seconds}")
+        return 2
+    if args.engine == "vosk" and not os.path.isdir(args.model):
+        cli_log(f"❌ Папка модели Vosk не найдена: {args.model}")
+        return 2
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = TranscriptCache(args.cache, args.cache_max_mb, args.cache_max_age_days)
+        except (OSError, sqlite3.Error) as e:
+            cli_log(f"⚠️ Кэш недоступен, работаем без него: {e}")
+
+    index = None if args.no_index else (args.index or True)
+    audio_cache = open_audio_cache(args.audio_cache, cli_log, args.audio_cache_max_mb)
+
+    try:
+        if args.metrics:
+            METRICS.enable(args.metrics)
+        if args.metrics_port is not None:
+            serve_metrics(args.metrics_port, log=cli_log)
+    except OSError as e:
+        cli_log(f"❌ Метрики недоступны: {e}")
+        return 2
+
+    try:
+        with profiling(args.profile, cli_log):
+            if args.engine == "whisper":
+                process_videos_whisper(args.paths, args.model, cli_log, args.skip_existing, args.language,
+                                       audio_cache, args.workers, args.threads_per_worker, args.decode_ahead,
+                                       args.write_queue, cache, args.vad, args.batch_size, index, args.rescan,
+                                       formats)
+            elif args.engine == "auto":
+                process_videos_routed(args.paths, routes, cli_log, args.skip_existing, audio_cache, args.workers,
+                                      args.threads_per_worker, args.decode_ahead, args.write_queue, cache, args.vad,
+                                      args.batch_size, args.vad_jobs, args.vosk_feed_seconds, args.vosk_spans, index,
+                                      args.rescan, formats)
+            else:
+                process_videos_vosk(args.paths, args.model, cli_log, args.skip_existing, audio_cache,
+                                    args.workers, args.threads_per_worker, args.decode_ahead, args.write_queue, cache,
+                                    args.vad, args.vad_jobs, args.vosk_feed_seconds, args.vosk_spans, index,
+                                    args.rescan, formats)
+    except KeyboardInterrupt:
+        cli_log("\n⛔ Процесс остановлен.")
+        return 130
+    finally:
+        if cache is not None:
+            cache.close()
+        METRICS.disable()
+    return 0
+
+
+def run_summary(args):
+    if not os.path.isdir(args.folder):
+        cli_log(f"❌ Папка не найдена: {args.folder}")
+        return 2
+    summary_path = merge_transcripts(args.folder, cli_log, search_index=args.search_index or True)
+    return 0 if summary_path else 1
+
+
+def run_search(args):
+    try:
+        index = TranscriptIndex(args.search_index)
+    except (OSError, sqlite3.Error) as e:
+        cli_log(f"❌ Индекс транскриптов недоступен: {e}")
+        return 1
+    try:
+        hits = index.search(" ".join(args.query), args.folder, args.limit)
+    finally:
+        index.close()
+    if not hits:
+        cli_log("🔎 Ничего не найдено.")
+        return 1
+    for path, start, snippet in hits:
+        cli_log(f"{path} [{datetime.timedelta(seconds=int(start))}] {snippet}")
+    return 0
+
+
+def run_serve(args):
+    if args.jobs < 1:
+        cli_log("❌ --jobs должно быть не меньше 1")
+        return 2
+    preload = []
+    for value in args.preload:
+        engine, _, spec = value.partition(":")
+        if engine not in ("whisper", "vosk") or not spec:
+            cli_log(f"❌ Неверный --preload: {value} (ожидается whisper:small или vosk:/путь)")
+            return 2
+        preload.append((engine, whisper_spec(*parse_whisper_spec(spec)) if engine == "whisper" else spec))
+    limits = {}
+    for value in args.limit:
+        engine, _, count = value.partition("=")
+        if engine not in ("whisper", "vosk") or not count.strip().isdigit() or int(count) < 1:
+            cli_log(f"❌ Неверный --limit: {value} (ожидается whisper=N или vosk=N, N не меньше 1)")
+            return 2
+        limits[engine] = int(count)
+
+    try:
+        store = JobStore(args.jobs_db)
+    except (OSError, sqlite3.Error) as e:
+        cli_log(f"❌ База заданий недоступна: {e}")
+        return 1
+    if store.requeued:
+        cli_log(f"🔁 Прерванные задания возвращены в очередь: {store.requeued}")
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = TranscriptCache(args.cache)
+        except (OSError, sqlite3.Error) as e:
+            cli_log(f"⚠️ Кэш недоступен, работаем без него: {e}")
+    # Один индекс папок на все задания, чтобы не открывать базу на каждое
+    index, close_index = open_folder_index(None if args.no_index else (args.index or True), cli_log)
+
+    server = JobServer(store, args.jobs, limits, cache, index, cli_log)
+    try:
+        httpd = serve_jobs(server, args.port, args.host, cli_log)
+    except OSError as e:
+        cli_log(f"❌ Не удалось запустить сервер: {e}")
+        return 1
+    for engine, spec in preload:
+        MODELS.preload(engine, spec, log=cli_log)
+    server.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        cli_log("\n⛔ Сервер остановлен.")
+    finally:
+        httpd.server_close()
+        server.close()
+        store.close()
+        if cache is not None:
+            cache.close()
+        if close_index:
+            index.close()
+    return 0
+
+
+def run_compare_precision(args):
+    if not os.path.isfile(args.sample):
+        cli_log(f"❌ Файл не найден: {args.sample}")
+        return 2
+    precisions = [p.strip().lower() for p in args.precisions.split(",") if p.strip()]
+    unknown = [p for p in precisions if p not in WHISPER_PRECISIONS]
+    if unknown or not precisions:
+        cli_log(f"❌ Неизвестная точность: {', '.join(unknown) or args.precisions}")
+        return 2
+    try:
+        report = compare_whisper_precisions(args.sample, args.model, precisions, args.language, cli_log)
+    except AudioExtractionError as e:
+        cli_log(f"❌ Ошибка извлечения аудио: {e}")
+        return 1
+    except KeyboardInterrupt:
+        cli_log("\n⛔ Процесс остановлен.")
+        return 130
+    if args.json:
+        atomic_write_text(args.json, json.dumps(report, ensure_ascii=False, indent=2))
+        cli_log(f"💾 Результаты сохранены: {args.json}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+def run_bench(args):
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    if not engines or any(e not in ("whisper", "vosk") for e in engines):
+        cli_log(f"❌ Неизвестный движок: {args.engines}")
+        return 2
+    try:
+        worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    except ValueError:
+        worker_counts = []
+    if not worker_counts or min(worker_counts) < 1:
+        cli_log(f"❌ Неверное число процессов: {args.workers}")
+        return 2
+
+    configs = []
+    if "whisper" in engines:
+        for spec in (m.strip() for m in args.whisper_models.split(",") if m.strip()):
+            name, precision = parse_whisper_spec(spec)
+            if name not in MODELS_INFO or precision not in WHISPER_PRECISIONS:
+                cli_log(f"❌ Неизвестная модель Whisper: {spec}")
+                return 2
+            configs += [("whisper", spec, w) for w in worker_counts]
+    if "vosk" in engines:
+        if not args.vosk_model or not os.path.isdir(args.vosk_model):
+            cli_log(f"❌ Папка модели Vosk не найдена: {args.vosk_model}")
+            return 2
+        configs += [("vosk", args.vosk_model, w) for w in worker_counts]
+
+    fixtures_dir = args.fixtures or tempfile.mkdtemp(prefix="vidtotxt-fixtures-")
+    try:
+        fixtures = find_video_files(fixtures_dir) if args.fixtures else []
+        if not fixtures:
+            cli_log(f"🎛 Генерация тестовых файлов: {args.files} × {args.seconds:g} с в {fixtures_dir}")
+            fixtures = make_bench_fixtures(fixtures_dir, args.files, args.seconds)
+        report = run_benchmark(fixtures, configs, args.language, cli_log)
+    except AudioExtractionError as e:
+        cli_log(f"❌ Ошибка ffmpeg: {e}")
+        return 1
+    except KeyboardInterrupt:
+        cli_log("\n⛔ Процесс остановлен.")
+        return 130
+    finally:
+        if not args.fixtures:
+            shutil.rmtree(fixtures_dir, ignore_errors=True)
+
+    if args.json:
+        atomic_write_text(args.json, json.dumps(report, ensure_ascii=False, indent=2))
+        cli_log(f"💾 Отчёт сохранён: {args.json}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None):
+    import multiprocessing
+    # Нужно для пула процессов в собранном exe
+    multiprocessing.freeze_support()
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        gui_app()
+        return 0
+    return run_cli(argv)
 
-    root.mainloop()
 
 if __name__ == "__main__":
-    gui_app()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
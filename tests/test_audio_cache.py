@@ -0,0 +1,18 @@
+import os
+import time
+
+import VidToTXT as vt
+
+
+def test_clear_keeps_part_files_being_written(tmp_path):
+    cache = vt.AudioCache(str(tmp_path))
+    (tmp_path / "done.pcm").write_bytes(b"\0" * 4)
+    (tmp_path / "fresh.part").write_bytes(b"\0" * 2)
+    stale = tmp_path / "stale.part"
+    stale.write_bytes(b"\0" * 2)
+    old = time.time() - vt.AUDIO_CACHE_STALE_PART - 60
+    os.utime(stale, (old, old))
+    (tmp_path / "other.txt").write_text("x")
+
+    assert cache.clear() == (2, 6)
+    assert sorted(os.listdir(tmp_path)) == ["fresh.part", "other.txt"]
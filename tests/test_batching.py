@@ -0,0 +1,89 @@
+import collections
+import threading
+
+import numpy as np
+
+import VidToTXT as vt
+
+RATE = vt.SAMPLE_RATE
+
+
+class FakeModel:
+    def __init__(self):
+        self.inference_lock = threading.RLock()
+
+
+def fake_whisper(monkeypatch):
+    # Язык «определяется» по значению сэмплов, каждое окно даёт один сегмент со своим временем
+    calls = []
+
+    def detect_language(model, audio):
+        return ("ru" if audio[0] > 0 else "en"), 0.99
+
+    def decode_whisper_windows(model, items, language=None):
+        calls.append((language, [(s, e) for _, s, e in items]))
+        return [[{"start": s / RATE, "end": e / RATE, "text": f"{language} {s // RATE}"}] for _, s, e in items]
+
+    monkeypatch.setattr(vt, "detect_language", detect_language)
+    monkeypatch.setattr(vt, "decode_whisper_windows", decode_whisper_windows)
+    return calls
+
+
+def windows(seconds, step=10):
+    return [(s * RATE, min(seconds, s + step) * RATE) for s in range(0, seconds, step)]
+
+
+def test_batcher_detects_language_once_per_file(monkeypatch):
+    calls = fake_whisper(monkeypatch)
+    done = {}
+    batcher = vt.WhisperBatcher(FakeModel(), None, 4, lambda key, transcript: done.setdefault(key, transcript))
+    batcher.add("ru.mp4", np.full(50 * RATE, 0.1, np.float32), windows(50))
+    batcher.add("en.mp4", np.full(30 * RATE, -0.1, np.float32), windows(30))
+    batcher.add("empty.mp4", np.zeros(RATE, np.float32), [])
+    batcher.finish()
+
+    # В каждом пакете — окна одного языка, и язык всегда задан
+    assert all(language in ("ru", "en") for language, _ in calls)
+    assert sum(len(items) for _, items in calls) == 8
+    assert all(len(items) <= 4 for _, items in calls)
+
+    ru, en = done["ru.mp4"], done["en.mp4"]
+    assert (ru["language"], ru["duration"]) == ("ru", 50.0)
+    assert (en["language"], en["duration"]) == ("en", 30.0)
+    assert [s["text"] for s in ru["segments"]] == [f"ru {s}" for s in range(0, 50, 10)]
+    assert [s["text"] for s in en["segments"]] == [f"en {s}" for s in range(0, 30, 10)]
+    assert done["empty.mp4"] == vt.whisper_transcript([], 1.0, None)
+
+
+def test_batcher_keeps_given_language(monkeypatch):
+    calls = fake_whisper(monkeypatch)
+    monkeypatch.setattr(vt, "detect_language", None)
+    done = {}
+    batcher = vt.WhisperBatcher(FakeModel(), "de", 3, lambda key, transcript: done.setdefault(key, transcript))
+    batcher.add("a.mp4", np.full(20 * RATE, 0.1, np.float32), windows(20))
+    batcher.add("b.mp4", np.full(20 * RATE, -0.1, np.float32), windows(20))
+    batcher.finish()
+    assert [language for language, _ in calls] == ["de", "de"]
+    assert done["a.mp4"]["language"] == done["b.mp4"]["language"] == "de"
+
+
+def test_batched_results_go_through_the_writer_stage(monkeypatch):
+    fake_whisper(monkeypatch)
+    files = [f"v{i}.mp4" for i in range(5)]
+    ready = collections.deque()
+    batcher = vt.WhisperBatcher(FakeModel(), None, 3, lambda key, transcript: ready.append((key, transcript)))
+    written = []
+
+    def transcribe(video_path, get_audio):
+        batcher.add(video_path, get_audio(), windows(20))
+        return None
+
+    def write(video_path, transcript):
+        written.append((video_path, transcript["duration"], threading.current_thread().name))
+        return "ok"
+
+    stopped = vt.run_pipeline(files, lambda *a: None, lambda path: np.full(20 * RATE, 0.1, np.float32),
+                              transcribe, write, lambda: False, finish=batcher.finish, ready=ready)
+    assert stopped is False
+    assert [path for path, _, _ in written] == files
+    assert all(duration == 20.0 and thread == "vidtotxt-writer" for _, duration, thread in written)
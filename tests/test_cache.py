@@ -0,0 +1,56 @@
+import VidToTXT as vt
+
+
+def open_cache(tmp_path):
+    return vt.TranscriptCache(str(tmp_path / "transcripts.sqlite"))
+
+
+def test_key_follows_content_not_path(tmp_path):
+    a = tmp_path / "a.mp4"
+    b = tmp_path / "copy of a.mp4"
+    c = tmp_path / "c.mp4"
+    a.write_bytes(b"video" * 100)
+    b.write_bytes(b"video" * 100)
+    c.write_bytes(b"other" * 100)
+    cache = open_cache(tmp_path)
+    try:
+        key, digest = cache.key_for(str(a), "whisper", "small", {"language": None})
+        assert digest == vt.content_hash(str(a))
+        assert cache.key_for(str(b), "whisper", "small", {"language": None}) == (key, digest)
+        assert cache.key_for(str(c), "whisper", "small", {"language": None})[0] != key
+        assert cache.key_for(str(a), "whisper", "base", {"language": None})[0] != key
+        assert cache.key_for(str(a), "whisper", "small", {"language": "ru"})[0] != key
+        assert cache.key_for(str(a), "vosk", "small", {"language": None})[0] != key
+    finally:
+        cache.close()
+
+
+def test_put_get_and_hit_path(tmp_path):
+    videos = []
+    for name in ("hit.mp4", "miss.mp4"):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 50)
+        videos.append(str(path))
+    cache = open_cache(tmp_path)
+    try:
+        payload = {"text": "cached"}
+        key, digest = cache.key_for(videos[0], "vosk", "m", {})
+        cache.put(key, payload, "vosk", "m", digest)
+        assert cache.get(key) == payload
+        assert cache._db.execute("SELECT content_hash FROM transcripts WHERE key = ?", (key,)).fetchone() == (digest,)
+
+        written, log, keys = [], [], {}
+        left = list(vt.apply_transcript_cache(cache, videos, "vosk", "m", {},
+                                              lambda path, data: written.append((path, data)) or "ok",
+                                              log.append, keys))
+        assert left == [videos[1]]
+        assert written == [(videos[0], payload)]
+        assert set(keys) == set(videos)
+        assert keys[videos[0]] == (key, digest)
+
+        store = vt.cache_store(cache, keys, "vosk", "m")
+        store(videos[1], {"text": "fresh"})
+        assert cache.get(keys[videos[1]][0]) == {"text": "fresh"}
+        assert any("Взято из кэша: 1" in line for line in log)
+    finally:
+        cache.close()
@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+import VidToTXT as vt
+
+
+def sample_transcript():
+    return vt.whisper_transcript([
+        {"start": 1.0, "end": 2.5, "text": " Привет ", "words": [{"word": " Привет", "start": 1.0, "end": 2.5,
+                                                                  "probability": 0.9}]},
+        {"start": 3.0, "end": 3.2, "text": "  "},
+        {"start": 3661.25, "end": 3662.0, "text": "second"},
+    ], duration=3662.0, language="ru")
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_formats():
+    assert vt.parse_formats(None) == ("txt",)
+    assert vt.parse_formats("srt, VTT,srt,txt") == ("txt", "srt", "vtt")
+    with pytest.raises(ValueError):
+        vt.parse_formats("docx")
+
+
+def test_subtitle_time():
+    assert vt.subtitle_time(3661.25, ",") == "01:01:01,250"
+    assert vt.subtitle_time(0.0005, ".") == "00:00:00.000"
+    assert vt.subtitle_time(59.9996, ".") == "00:01:00.000"
+
+
+def test_write_transcript_all_formats(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"")
+    written = vt.write_transcript(str(video), sample_transcript(), vt.parse_formats("json,srt,vtt"))
+
+    assert written == [str(tmp_path / f"clip.{fmt}") for fmt in ("txt", "json", "srt", "vtt")]
+    assert sorted(os.listdir(tmp_path)) == ["clip.json", "clip.mp4", "clip.srt", "clip.txt", "clip.vtt"]
+    assert read(tmp_path / "clip.txt") == "# clip.mp4\n\n[0:00:01] Привет\n[1:01:01] second"
+
+    data = json.loads(read(tmp_path / "clip.json"))
+    assert data["engine"] == "whisper" and data["duration"] == 3662.0 and data["language"] == "ru"
+    assert [s["text"] for s in data["segments"]] == ["Привет", "second"]
+    assert data["segments"][0]["words"] == [{"word": "Привет", "start": 1.0, "end": 2.5, "conf": 0.9}]
+
+    assert read(tmp_path / "clip.srt") == ("1\n00:00:01,000 --> 00:00:02,500\nПривет\n\n"
+                                           "2\n01:01:01,250 --> 01:01:02,000\nsecond\n\n")
+    assert read(tmp_path / "clip.vtt") == ("WEBVTT\n\n00:00:01.000 --> 00:00:02.500\nПривет\n\n"
+                                           "01:01:01.250 --> 01:01:02.000\nsecond\n\n")
+
+
+def test_writer_transcript_round_trips_and_discard_cleans_up(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"")
+    transcript = sample_transcript()
+    writer = vt.TranscriptWriter(str(video), "whisper", ("txt", "srt"))
+    writer.add(transcript["segments"])
+    writer.close(transcript["duration"], transcript["language"])
+    assert writer.transcript() == transcript
+    assert writer.segments == 2 and writer.words == 1
+    writer.discard()
+    assert os.listdir(tmp_path) == ["clip.mp4"]
@@ -0,0 +1,74 @@
+import pytest
+
+import VidToTXT as vt
+
+
+def open_store(tmp_path):
+    return vt.JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def test_claim_returns_written_start_time(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        job_id = store.add({"engine": "vosk"})
+        job = store.claim(["vosk"])
+        assert job["id"] == job_id and job["status"] == "running"
+        assert job["started"] is not None
+        assert job["started"] == store.get(job_id)["started"]
+        assert store.claim(["vosk"]) is None
+    finally:
+        store.close()
+
+
+def test_claim_order_and_engine_filter(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        low = store.add({"engine": "vosk"})
+        high = store.add({"engine": "vosk"}, priority=5)
+        whisper = store.add({"engine": "whisper"}, priority=10)
+        assert store.claim([]) is None
+        assert store.claim(["vosk"])["id"] == high
+        assert store.claim(["vosk"])["id"] == low
+        assert store.claim(["vosk", "whisper"])["id"] == whisper
+    finally:
+        store.close()
+
+
+def test_restart_requeues_running_jobs(tmp_path):
+    store = open_store(tmp_path)
+    running = store.add({"engine": "vosk"})
+    queued = store.add({"engine": "vosk"})
+    store.claim(["vosk"])
+    store.close()
+
+    store = open_store(tmp_path)
+    try:
+        assert store.requeued == 1
+        job = store.get(running)
+        assert job["status"] == "queued" and job["started"] is None
+        assert store.cancel_queued(queued)
+        assert not store.cancel_queued(queued)
+        assert store.get(queued)["status"] == "cancelled"
+        assert store.counts() == {"queued": 1, "cancelled": 1}
+    finally:
+        store.close()
+
+
+def test_server_engine_limits(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        server = vt.JobServer(store, 4, log=lambda *a, **k: None)
+        assert server.limits == {"whisper": 1, "vosk": 4}
+        server = vt.JobServer(store, 4, {"whisper": 3, "vosk": 2}, log=lambda *a, **k: None)
+        assert server.limits == {"whisper": 3, "vosk": 2}
+        server._running = {1: ("whisper", None, None), 2: ("whisper", None, None), 3: ("vosk", None, None)}
+        assert server._free_engines() == ["whisper", "vosk"]
+        server._running[4] = ("whisper", None, None)
+        assert server._free_engines() == []
+        server._running.pop(3)
+        assert server._free_engines() == ["vosk"]
+        for limits in ({"whisper": 0}, {"vosk": -1}, {"auto": 1}, {"whisper": "2"}):
+            with pytest.raises(ValueError):
+                vt.JobServer(store, 4, limits, log=lambda *a, **k: None)
+    finally:
+        store.close()
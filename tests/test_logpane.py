@@ -0,0 +1,36 @@
+import VidToTXT as vt
+
+
+class FakeRoot:
+    def after(self, ms, func):
+        pass
+
+
+def test_prune_keeps_newest_logs_per_tab(tmp_path):
+    for stamp in ("20260101-000000", "20260102-000000", "20260103-000000"):
+        (tmp_path / f"whisper-{stamp}.log").write_text("w")
+        (tmp_path / f"vosk-{stamp}.log").write_text("v")
+    (tmp_path / "whisper-20260101-000000.log.1").write_text("old part")
+    (tmp_path / "other.txt").write_text("x")
+
+    vt.prune_log_files(str(tmp_path), "whisper", keep=1)
+    vt.prune_log_files(str(tmp_path / "missing"), "whisper")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "other.txt", "vosk-20260101-000000.log", "vosk-20260102-000000.log", "vosk-20260103-000000.log",
+        "whisper-20260103-000000.log"]
+
+
+def test_spill_file_rotates_at_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(vt, "LOG_SPILL_MAX_MB", 100 / (1024 * 1024))
+    path = tmp_path / "logs" / "whisper-1.log"
+    pane = vt.LogPane(FakeRoot(), None, str(path))
+    for i in range(10):
+        pane._spill_items([(f"line {i} " + "x" * 30, False)])
+    pane.close()
+
+    current = path.read_text(encoding="utf-8")
+    previous = (tmp_path / "logs" / "whisper-1.log.1").read_text(encoding="utf-8")
+    assert len(current) <= 100 and len(previous) <= 100
+    assert current.rstrip("\n").endswith("line 9 " + "x" * 30)
+    assert sorted(p.name for p in path.parent.iterdir()) == ["whisper-1.log", "whisper-1.log.1"]
@@ -0,0 +1,65 @@
+import contextvars
+import json
+import threading
+
+import VidToTXT as vt
+
+
+def read_events(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_runs_keep_separate_totals(tmp_path):
+    metrics = vt.StageMetrics()
+    sink = tmp_path / "metrics.jsonl"
+    metrics.enable(str(sink))
+    both_started = threading.Barrier(2)
+    first_finished = threading.Event()
+    gauges = []
+
+    def run(engine, files, wait_for=None):
+        handle = metrics.begin_run(engine, engine + "-model")
+        both_started.wait()
+        if wait_for:
+            wait_for.wait()
+        for path in files:
+            metrics.note(path, audio_seconds=10.0)
+            metrics.add(path, "transcribe", 1.0)
+            # Запись завершает поток записи конвейера с контекстом запуска
+            writer = threading.Thread(target=contextvars.copy_context().run, args=(metrics.finish, path, "ok"))
+            writer.start()
+            writer.join()
+        gauges.append(metrics.prometheus().splitlines()[-1])
+        metrics.end_run(handle)
+        if not wait_for:
+            first_finished.set()
+
+    threads = [threading.Thread(target=run, args=("whisper", ["a1", "a2"])),
+               threading.Thread(target=run, args=("vosk", ["b1"], first_finished))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.disable()
+
+    events = read_events(sink)
+    ends = {e["engine"]: e for e in events if e["event"] == "run_end"}
+    assert ends["whisper"]["files"] == {"ok": 2} and ends["whisper"]["audio_seconds"] == 20.0
+    assert ends["vosk"]["files"] == {"ok": 1} and ends["vosk"]["audio_seconds"] == 10.0
+    files = {e["path"]: e["engine"] for e in events if e["event"] == "file"}
+    assert files == {"a1": "whisper", "a2": "whisper", "b1": "vosk"}
+    assert gauges == ["vidtotxt_run_active 2", "vidtotxt_run_active 1"]
+    assert metrics.begin_run("vosk", "m") is None
+
+
+def test_pool_records_merge_into_current_run(tmp_path):
+    metrics = vt.StageMetrics()
+    sink = tmp_path / "metrics.jsonl"
+    metrics.enable(str(sink))
+    handle = metrics.begin_run("vosk", "m", workers=2)
+    metrics.merge([{"event": "file", "path": "x", "status": "error", "audio_seconds": 3.0, "stages": {}}])
+    metrics.end_run(handle, stopped=True)
+    metrics.disable()
+    end = read_events(sink)[-1]
+    assert (end["event"], end["files"], end["stopped"], end["workers"]) == ("run_end", {"error": 1}, True, 2)
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import VidToTXT as vt
+
+
+class FakeModel:
+    def __init__(self):
+        self.inference_lock = threading.RLock()
+
+
+def test_inference_context_serializes_shared_model():
+    model = FakeModel()
+    entered = threading.Event()
+    with vt.whisper_inference_context(model):
+        def run():
+            with vt.whisper_inference_context(model):
+                entered.set()
+        other = threading.Thread(target=run)
+        other.start()
+        assert not entered.wait(0.2)
+        with vt.whisper_inference_context(model):
+            pass
+    assert entered.wait(2)
+    other.join()
+
+
+def test_inference_context_without_lock():
+    with vt.whisper_inference_context(object()):
+        pass
+
+
+def fake_manager(monkeypatch, **kwargs):
+    monkeypatch.setattr(vt.ModelManager, "_load", staticmethod(lambda engine, spec, device, dtype: FakeModel()))
+    monkeypatch.setattr(vt.ModelManager, "_estimate_size", staticmethod(lambda model, *key: 1024 * 1024))
+    return vt.ModelManager(**kwargs)
+
+
+def test_leased_model_is_not_evicted_while_in_use(monkeypatch, tmp_path):
+    models = fake_manager(monkeypatch, idle_seconds=0)
+    with models.lease("vosk", str(tmp_path)) as model:
+        time.sleep(0.01)
+        models.evict_idle()
+        assert models.loaded_count() == 1
+        assert models.get("vosk", str(tmp_path)) is model
+    time.sleep(0.01)
+    models.evict_idle()
+    assert models.loaded_count() == 0
+
+
+def test_budget_skips_leased_models(monkeypatch, tmp_path):
+    models = fake_manager(monkeypatch, budget_mb=1)
+    with models.lease("vosk", str(tmp_path / "a")) as first:
+        models.get("vosk", str(tmp_path / "b"))
+        # Вторая модель не влезает в бюджет, но первая занята — выгружать её нельзя
+        assert models.get("vosk", str(tmp_path / "a")) is first
+        models.get("vosk", str(tmp_path / "c"))
+        assert models.loaded_count() == 2
+        assert models.get("vosk", str(tmp_path / "a")) is first
+    # Повторный lease той же модели и выход из него не уводят счётчик ниже нуля
+    with models.lease("vosk", str(tmp_path / "a")):
+        with models.lease("vosk", str(tmp_path / "a")):
+            pass
+        models.get("vosk", str(tmp_path / "d"))
+        assert models.get("vosk", str(tmp_path / "a")) is first
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+import VidToTXT as vt
+
+
+def run_in_thread(target, timeout=10):
+    # run_pipeline в отдельном потоке: зависание становится падением теста, а не вечным ожиданием
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = target()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run_pipeline завис"
+    return outcome
+
+
+def producer_finished():
+    deadline = time.time() + 2
+    while any(t.name == "vidtotxt-producer" for t in threading.enumerate()):
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_results_are_written_in_order():
+    files = [f"v{i}.mp4" for i in range(8)]
+    written = []
+
+    def decode(path):
+        # Поздние файлы декодируются быстрее ранних
+        time.sleep(0.02 * (8 - int(path[1])) / 8)
+        return path.upper()
+
+    outcome = run_in_thread(lambda: vt.run_pipeline(
+        files, lambda *a: None, decode, lambda path, get_audio: get_audio() + "!",
+        lambda path, result: written.append((path, result)) or "ok", lambda: False, decode_ahead=3, write_queue=1))
+    assert outcome == {"result": False}
+    assert written == [(path, path.upper() + "!") for path in files]
+
+
+def test_stop_ends_decode_and_write():
+    files = [f"v{i}.mp4" for i in range(20)]
+    decoded, written = [], []
+    stop = threading.Event()
+
+    def transcribe(path, get_audio):
+        audio = get_audio()
+        stop.set()
+        return audio
+
+    outcome = run_in_thread(lambda: vt.run_pipeline(
+        files, lambda *a: None, lambda path: decoded.append(path) or path, transcribe,
+        lambda path, result: written.append(path) or "ok", stop.is_set, decode_ahead=2))
+    assert outcome == {"result": True}
+    assert written == files[:1]
+    assert len(decoded) <= 3
+    assert producer_finished()
+
+
+@pytest.mark.parametrize("stage", ["decode", "transcribe"])
+def test_stage_error_does_not_deadlock(stage):
+    files = [f"v{i}.mp4" for i in range(10)]
+    written = []
+
+    def decode(path):
+        if stage == "decode" and path == files[1]:
+            raise RuntimeError("decode failed")
+        return path
+
+    def transcribe(path, get_audio):
+        audio = get_audio()
+        if stage == "transcribe" and path == files[1]:
+            raise RuntimeError("transcribe failed")
+        return audio
+
+    outcome = run_in_thread(lambda: vt.run_pipeline(
+        files, lambda *a: None, decode, transcribe, lambda path, result: written.append(path) or "ok",
+        lambda: False, decode_ahead=1, write_queue=1))
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert written == files[:1]
+    assert producer_finished()
+
+
+def test_write_error_skips_only_that_file():
+    files = ["a.mp4", "b.mp4", "c.mp4"]
+    written = []
+
+    def write(path, result):
+        if path == "b.mp4":
+            raise OSError("disk full")
+        written.append(path)
+        return "ok"
+
+    outcome = run_in_thread(lambda: vt.run_pipeline(
+        files, lambda *a: None, lambda path: path, lambda path, get_audio: get_audio(), write, lambda: False))
+    assert outcome == {"result": False}
+    assert written == ["a.mp4", "c.mp4"]
+
+
+class VanishingList(list):
+    def __iter__(self):
+        yield self[0]
+        raise OSError("folder vanished")
+
+
+def test_failing_file_list_does_not_hang():
+    written = []
+    outcome = run_in_thread(lambda: vt.run_pipeline(
+        VanishingList(["a.mp4", "b.mp4"]), lambda *a: None, lambda path: path, lambda path, get_audio: get_audio(),
+        lambda path, result: written.append(path) or "ok", lambda: False))
+    assert isinstance(outcome.get("error"), OSError)
+    assert written == ["a.mp4"]
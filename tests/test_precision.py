@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import VidToTXT as vt
+
+
+def tiny_whisper():
+    # Случайные веса вместо скачивания: проверяется только, что все этапы декодирования проходят
+    torch = pytest.importorskip("torch")
+    whisper = pytest.importorskip("whisper")
+    torch.manual_seed(0)
+    dims = whisper.model.ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1)
+    return whisper.model.Whisper(dims).eval()
+
+
+@pytest.mark.parametrize("precision", vt.WHISPER_PRECISIONS)
+def test_every_precision_decodes(precision):
+    model = vt.apply_whisper_precision(tiny_whisper(), precision)
+    audio = np.random.default_rng(0).uniform(-0.1, 0.1, 5 * vt.SAMPLE_RATE).astype(np.float32)
+
+    language, probability = vt.detect_language(model, audio)
+    assert isinstance(language, str) and 0.0 <= probability <= 1.0
+
+    windows = vt.decode_whisper_windows(model, [(audio, 0, len(audio)), (audio, 0, len(audio) // 2)], "en")
+    assert len(windows) == 2
+
+    # transcribe_audio_whisper гасит ошибки и возвращает None — его и ловим
+    transcript = vt.transcribe_audio_whisper(audio, model, "en")
+    assert transcript is not None and transcript["language"] == "en"
+
+
+def test_unknown_precision():
+    pytest.importorskip("torch")
+    with pytest.raises(ValueError):
+        vt.apply_whisper_precision(object(), "fp8")
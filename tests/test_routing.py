@@ -0,0 +1,81 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+import VidToTXT as vt
+
+
+def test_parse_routes(tmp_path):
+    model_dir = str(tmp_path)
+    routes = vt.parse_routes([f"ru=vosk:{model_dir}", "en, DE=whisper:small:int8", "*=whisper:Small"])
+    assert routes == {
+        "ru": ("vosk", model_dir),
+        "en": ("whisper", "small:int8"),
+        "de": ("whisper", "small:int8"),
+        "*": ("whisper", "small"),
+    }
+    # Повторный язык — побеждает последняя запись
+    assert vt.parse_routes(["ru=whisper:tiny", "ru=whisper:base"]) == {"ru": ("whisper", "base")}
+    assert vt.parse_routes([]) == {}
+
+
+@pytest.mark.parametrize("spec", [
+    "ru",                        # нет «=»
+    "ru=",                       # нет движка
+    "ru=vosk",                   # нет модели
+    "ru=vosk:",
+    "ru=deepspeech:model",       # неизвестный движок
+    "ru=whisper:enormous",       # неизвестная модель
+    "ru=whisper:small:int4",     # неизвестная точность
+    "ru=vosk:/no/such/model",    # папки модели нет
+    "xx=whisper:small",          # неизвестный язык
+    "ru,,en=whisper:small",      # пустой код языка
+])
+def test_parse_routes_rejects_malformed(spec):
+    with pytest.raises(ValueError, match="маршрут"):
+        vt.parse_routes([spec])
+
+
+def test_route_for():
+    routes = {"ru": ("vosk", "/m/ru"), "*": ("whisper", "small")}
+    assert vt.route_for(routes, "ru", 0.9) == ("vosk", "/m/ru", "ru")
+    assert vt.route_for(routes, "ru", vt.LANG_MIN_PROBABILITY) == ("vosk", "/m/ru", "ru")
+    # Язык без своего маршрута — по «*» с подсказкой языка
+    assert vt.route_for(routes, "en", 0.9) == ("whisper", "small", "en")
+    # Неуверенно или не определён — по «*» без подсказки
+    assert vt.route_for(routes, "ru", vt.LANG_MIN_PROBABILITY - 0.01) == ("whisper", "small", None)
+    assert vt.route_for(routes, None, 0.0) == ("whisper", "small", None)
+
+
+def test_route_for_without_fallback():
+    routes = {"ru": ("vosk", "/m/ru")}
+    assert vt.route_for(routes, "ru", 0.9) == ("vosk", "/m/ru", "ru")
+    assert vt.route_for(routes, "en", 0.9) is None
+    assert vt.route_for(routes, "ru", 0.1) is None
+    assert vt.route_for(routes, None, 0.0) is None
+    assert vt.route_for({}, "ru", 1.0) is None
+
+
+class BrokenCache:
+    # Кэш, который читается, но не пишет (например, база заблокирована другим процессом)
+    def key_for(self, video_path, engine, model, options):
+        return f"{video_path}:{engine}", "digest"
+
+    def get(self, key):
+        return None
+
+    def put(self, key, payload, engine, model, digest=None):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_route_videos_survives_cache_write_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(vt.MODELS, "lease", lambda *a, **k: contextlib.nullcontext(object()))
+    monkeypatch.setattr(vt, "language_sample", lambda video_path, audio_cache=None: None)
+    monkeypatch.setattr(vt, "detect_language", lambda model, sample: ("ru", 0.9))
+    lines = []
+    routes = {"ru": ("vosk", "/m/ru"), "*": ("whisper", "small")}
+    videos = [str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")]
+    groups = vt.route_videos(videos, routes, lines.append, cache=BrokenCache())
+    assert groups == {("vosk", "/m/ru", "ru"): videos}
+    assert sum("Не удалось сохранить в кэш" in line for line in lines) == 2
@@ -0,0 +1,124 @@
+import itertools
+import os
+import shutil
+import time
+
+import VidToTXT as vt
+
+_AGE = itertools.count(1)
+
+
+def settle(*dirs):
+    # mtime папок в прошлом (каждый раз новый): на них не действует SCAN_MTIME_SLACK_NS
+    stamp = time.time() - 3600 - next(_AGE)
+    for path in dirs:
+        os.utime(path, (stamp, stamp))
+
+
+def make_tree(root):
+    (root / "sub" / "deep").mkdir(parents=True)
+    for name in ("a.mp4", "notes.doc", "sub/b.mkv", "sub/deep/c.avi"):
+        (root / name).write_bytes(b"x")
+    settle(root, root / "sub", root / "sub" / "deep")
+
+
+def scan(root, index, **kwargs):
+    stats = {}
+    entries = list(vt.scan_media(str(root), ("video", "txt"), index, stats=stats, **kwargs))
+    return {os.path.relpath(e.path, root): (e.kind, e.status) for e in entries}, stats
+
+
+def test_first_scan_and_unchanged_rescan(tmp_path):
+    root = tmp_path / "video"
+    root.mkdir()
+    make_tree(root)
+    index = vt.FolderIndex(str(tmp_path / "scan-index.sqlite"))
+    try:
+        entries, stats = scan(root, index)
+        assert list(entries) == ["a.mp4", os.path.join("sub", "b.mkv"), os.path.join("sub", "deep", "c.avi")]
+        assert set(entries.values()) == {("video", "pending")}
+        assert (stats["dirs"], stats["listed"], stats["files"]) == (3, 3, 3)
+
+        again, stats = scan(root, index)
+        assert again == entries
+        assert (stats["dirs"], stats["listed"]) == (3, 0)
+
+        _, stats = scan(root, index, rescan=True)
+        assert stats["listed"] == 3
+    finally:
+        index.close()
+
+
+def test_index_survives_reopen(tmp_path):
+    root = tmp_path / "video"
+    root.mkdir()
+    make_tree(root)
+    path = str(tmp_path / "scan-index.sqlite")
+    index = vt.FolderIndex(path)
+    first, _ = scan(root, index)
+    index.close()
+    index = vt.FolderIndex(path)
+    try:
+        again, stats = scan(root, index)
+        assert again == first and stats["listed"] == 0
+    finally:
+        index.close()
+
+
+def test_changes_invalidate_only_their_directory(tmp_path):
+    root = tmp_path / "video"
+    root.mkdir()
+    make_tree(root)
+    sub, deep = root / "sub", root / "sub" / "deep"
+    index = vt.FolderIndex(str(tmp_path / "scan-index.sqlite"))
+    try:
+        scan(root, index)
+
+        # Новый файл
+        (sub / "new.mp4").write_bytes(b"x")
+        settle(sub)
+        entries, stats = scan(root, index)
+        assert entries[os.path.join("sub", "new.mp4")] == ("video", "pending")
+        assert stats["listed"] == 1
+
+        # Расшифровка рядом с видео: видео done, .txt paired
+        (sub / "b.txt").write_text("text")
+        settle(sub)
+        entries, stats = scan(root, index)
+        assert entries[os.path.join("sub", "b.mkv")] == ("video", "done")
+        assert entries[os.path.join("sub", "b.txt")] == ("txt", "paired")
+        assert stats["listed"] == 1
+
+        # Удалённый файл
+        (deep / "c.avi").unlink()
+        settle(deep)
+        entries, stats = scan(root, index)
+        assert os.path.join("sub", "deep", "c.avi") not in entries
+        assert stats["listed"] == 1
+
+        # Удалённая подпапка уходит из индекса вместе с поддеревом
+        shutil.rmtree(deep)
+        settle(sub)
+        entries, stats = scan(root, index)
+        assert (stats["dirs"], stats["listed"]) == (2, 1)
+        assert index.lookup(str(deep), 0) is None
+        assert index._db.execute("SELECT COUNT(*) FROM dirs WHERE path = ?", (str(deep),)).fetchone() == (0,)
+
+        _, stats = scan(root, index)
+        assert stats["listed"] == 0
+    finally:
+        index.close()
+
+
+def test_recently_changed_directory_is_reread(tmp_path):
+    # mtime моложе SCAN_MTIME_SLACK_NS не сохраняется: изменение в ту же секунду не потеряется
+    root = tmp_path / "video"
+    root.mkdir()
+    (root / "a.mp4").write_bytes(b"x")
+    index = vt.FolderIndex(str(tmp_path / "scan-index.sqlite"))
+    try:
+        scan(root, index)
+        _, stats = scan(root, index)
+        assert stats["listed"] == 1
+    finally:
+        index.close()
@@ -0,0 +1,64 @@
+import os
+
+import VidToTXT as vt
+
+
+def write_transcript(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {os.path.splitext(os.path.basename(path))[0]}.mp4\n\n[0:00:01] {text}\n")
+
+
+def merge(folder, tmp_path, log):
+    folder_index = vt.FolderIndex(str(tmp_path / "scan-index.sqlite"))
+    search_index = vt.TranscriptIndex(str(tmp_path / "transcripts-index.sqlite"))
+    try:
+        assert vt.merge_transcripts(str(folder), log.append, folder_index, search_index)
+        return search_index.search("hello", str(folder)), search_index.search("edited", str(folder))
+    finally:
+        folder_index.close()
+        search_index.close()
+
+
+def summary_text(folder):
+    with open(folder / "summary.txt", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_merge_skips_foreign_txt_and_reuses_unchanged(tmp_path):
+    folder = tmp_path / "video"
+    folder.mkdir()
+    (folder / "a.mp4").write_bytes(b"")
+    write_transcript(folder / "a.txt", "hello world")
+    (folder / "notes.txt").write_text("не транскрипт", encoding="utf-8")
+    log = []
+
+    hello, _ = merge(folder, tmp_path, log)
+    assert "hello world" in summary_text(folder)
+    assert "не транскрипт" not in summary_text(folder)
+    assert [path for path, _, _ in hello] == [str(folder / "a.txt")]
+
+    merge(folder, tmp_path, log)
+    assert "не изменился" in log[-1]
+
+
+def test_merge_notices_in_place_edit(tmp_path):
+    folder = tmp_path / "video"
+    folder.mkdir()
+    (folder / "a.mp4").write_bytes(b"")
+    write_transcript(folder / "a.txt", "hello world")
+    log = []
+    merge(folder, tmp_path, log)
+    # Папка давно не менялась: индекс папок запоминает её и дальше доверяет сохранённым файлам
+    old = os.stat(folder).st_mtime_ns - 3600 * 10 ** 9
+    os.utime(folder, ns=(old, old))
+    merge(folder, tmp_path, log)
+
+    # Правка на месте не меняет mtime папки — индекс отдаёт прежние размер и mtime файла
+    write_transcript(folder / "a.txt", "EDITED text")
+    assert os.stat(folder).st_mtime_ns == old
+
+    hello, edited = merge(folder, tmp_path, log)
+    assert "EDITED text" in summary_text(folder)
+    assert "hello world" not in summary_text(folder)
+    assert hello == []
+    assert [path for path, _, _ in edited] == [str(folder / "a.txt")]
@@ -0,0 +1,76 @@
+import numpy as np
+
+import VidToTXT as vt
+
+RATE = vt.SAMPLE_RATE
+FRAME = RATE * vt.VAD_FRAME_MS // 1000
+
+
+def signal(*parts, seed=0):
+    # parts: (секунды, амплитуда) — тишина с амплитудой 0, «речь» — шум с заданной амплитудой
+    rng = np.random.default_rng(seed)
+    chunks = [amp * rng.uniform(-1, 1, int(seconds * RATE)).astype(np.float32) for seconds, amp in parts]
+    return np.concatenate(chunks)
+
+
+def seconds(regions):
+    return [(s / RATE, e / RATE) for s, e in regions]
+
+
+def close(actual, expected, tolerance=2 * vt.VAD_FRAME_MS / 1000):
+    return len(actual) == len(expected) and all(
+        abs(a - b) <= tolerance for pair, want in zip(actual, expected) for a, b in zip(pair, want))
+
+
+def test_silence_and_empty_input():
+    assert vt.speech_regions(np.zeros(0, np.float32)) == []
+    assert vt.speech_regions(np.zeros(5 * RATE, np.float32)) == []
+    assert vt.speech_regions(np.zeros(5 * RATE, np.int16)) == []
+
+
+def test_speech_in_silence_with_padding_and_short_pauses():
+    audio = signal((1, 0), (1, 0.5), (0.3, 0), (1, 0.5), (2, 0), (1, 0.5), (1, 0))
+    regions = vt.speech_regions(audio)
+    # Пауза 0.3 с короче min_silence и не режет речь, пауза 2 с режет; края расширены на pad
+    assert close(seconds(regions), [(0.8, 3.5), (5.1, 6.5)]), seconds(regions)
+    assert all(0 <= s < e <= len(audio) for s, e in regions)
+
+    # С min_silence меньше паузы первый участок делится на два
+    regions = vt.speech_regions(audio, min_silence=0.1, pad=0)
+    assert close(seconds(regions), [(1.0, 2.0), (2.3, 3.3), (5.3, 6.3)]), seconds(regions)
+
+
+def test_short_blips_are_dropped_and_padding_merges_neighbours():
+    audio = signal((1, 0), (0.1, 0.5), (1, 0), (1, 0.5), (0.6, 0), (1, 0.5), (1, 0))
+    regions = vt.speech_regions(audio, min_silence=0.5, pad=0.4)
+    # Щелчок 0.1 с короче min_speech; участки с паузой 0.6 с после расширения на 0.4 с перекрываются и склеиваются
+    assert close(seconds(regions), [(1.7, 5.1)]), seconds(regions)
+
+
+def test_int16_matches_float():
+    audio = signal((1, 0), (1, 0.5), (1, 0))
+    as_int = (audio * 32767).astype(np.int16)
+    assert vt.speech_regions(as_int) == vt.speech_regions(audio)
+
+
+def test_all_noise_stays_one_region():
+    audio = signal((10, 0.3))
+    assert vt.speech_regions(audio) == [(0, len(audio) // FRAME * FRAME)]
+
+
+def test_long_speech_is_split_within_max_region():
+    audio = signal((1, 0), (7, 0.5), (1, 0))
+    regions = vt.speech_regions(audio, max_region=2.0)
+    assert len(regions) >= 4
+    assert all(e - s <= 2.0 * RATE for s, e in regions)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(regions, regions[1:]))
+    assert close([(regions[0][0] / RATE, regions[-1][1] / RATE)], [(0.8, 8.2)])
+
+
+def test_split_at_quiet_cuts_at_the_quietest_frame():
+    db = np.zeros(200)
+    db[75] = -50
+    db[160] = -50
+    parts = vt.split_at_quiet(db, 0, 200, 100)
+    assert parts == [(0, 75), (75, 160), (160, 200)]
+    assert vt.split_at_quiet(db, 10, 60, 100) == [(10, 60)]
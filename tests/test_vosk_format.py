@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import VidToTXT as vt
+
+
+def reference_format(result, pause_threshold=0.8):
+    # format_transcription до потоковой записи: эталон, который SentenceFormatter должен воспроизводить
+    output = []
+    current_sentence = []
+    sentence_start_time = None
+    last_word_end = 0
+    for word in result.get("result", []):
+        if sentence_start_time is None:
+            sentence_start_time = word['start']
+        if word['start'] - last_word_end > pause_threshold and current_sentence:
+            output.append(f"[{sentence_start_time:.1f}] {' '.join(current_sentence)}")
+            current_sentence = []
+            sentence_start_time = word['start']
+        current_sentence.append(word['word'])
+        last_word_end = word['end']
+    if current_sentence:
+        output.append(f"[{sentence_start_time:.1f}] {' '.join(current_sentence)}")
+    return '\n'.join(output)
+
+
+def sample_words(count=200, seed=1):
+    rng = random.Random(seed)
+    words, t = [], 1.5
+    for i in range(count):
+        t += rng.choice([0.05, 0.1, 0.3, 0.79, 0.81, 2.0])
+        end = t + rng.uniform(0.1, 0.6)
+        words.append({"word": f"w{i}", "start": round(t, 3), "end": round(end, 3), "conf": 1.0})
+        t = end
+    return words
+
+
+def test_format_transcription_matches_reference():
+    result = {"result": sample_words()}
+    assert vt.format_transcription(result) == reference_format(result)
+    assert vt.format_transcription(result, 0.2) == reference_format(result, 0.2)
+    assert vt.format_transcription({"result": []}) == reference_format({"result": []}) == ""
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 17, 1000])
+def test_streamed_chunks_match_whole_result(chunk):
+    words = sample_words()
+    formatter = vt.SentenceFormatter()
+    phrases = []
+    for i in range(0, len(words), chunk):
+        phrases.extend(formatter.feed(words[i:i + chunk]))
+    phrases.extend(formatter.finish())
+
+    assert vt.transcript_text({"engine": "vosk", "segments": phrases}) == reference_format({"result": words})
+    assert [w for phrase in phrases for w in phrase["words"]] == words
+    assert all(p["start"] == p["words"][0]["start"] and p["end"] == p["words"][-1]["end"] for p in phrases)
+    assert formatter.finish() == []
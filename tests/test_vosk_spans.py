@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import VidToTXT as vt
+
+RATE = vt.SAMPLE_RATE
+
+
+def fake_pcm(seconds, gaps=()):
+    # Громкий шум с тихими паузами по 1 с, начинающимися в gaps (секунды)
+    pcm = np.random.default_rng(0).integers(-8000, 8000, int(seconds * RATE), dtype=np.int16)
+    for gap in gaps:
+        pcm[int(gap * RATE):int((gap + 1) * RATE)] = 0
+    return pcm
+
+
+def test_short_file_or_single_span_is_one_open_span():
+    assert vt.plan_vosk_spans("a.mp4", 239.0, 4, min_span=120) == [(0.0, None)]
+    assert vt.plan_vosk_spans("a.mp4", 3600.0, 1) == [(0.0, None)]
+    assert vt.plan_vosk_spans("a.mp4", 0.0, 8) == [(0.0, None)]
+
+
+def test_cuts_land_in_pauses_and_last_span_is_open():
+    pcm = fake_pcm(300, gaps=(95, 204))
+    plan = vt.plan_vosk_spans("a.mp4", 300.0, 3, min_span=100, pcm=pcm)
+    assert len(plan) == 3
+    assert plan[0][0] == 0.0 and plan[-1][1] is None
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(plan, plan[1:]))
+    assert 95 <= plan[1][0] <= 96 and 204 <= plan[2][0] <= 205
+
+
+def test_span_count_is_capped_by_min_span():
+    pcm = fake_pcm(250)
+    plan = vt.plan_vosk_spans("a.mp4", 250.0, 8, min_span=120, pcm=pcm)
+    assert len(plan) == 2 and plan[-1][1] is None
+    assert 115 <= plan[0][1] <= 135
+
+
+def test_cut_search_window_is_clamped_at_file_start():
+    pcm = fake_pcm(12, gaps=(2,))
+    plan = vt.plan_vosk_spans("a.mp4", 12.0, 2, min_span=5, pcm=pcm)
+    assert len(plan) == 2
+    assert 2 <= plan[1][0] <= 3
+
+
+def test_cut_outside_decoded_audio_falls_back_to_even_split():
+    # Длительность из ffprobe больше, чем аудио в кэше: окно поиска пустое, разрез — в расчётной точке
+    plan = vt.plan_vosk_spans("a.mp4", 400.0, 2, min_span=100, pcm=fake_pcm(50))
+    assert plan == [(0.0, 200.0), (200.0, None)]
+
+
+@pytest.mark.parametrize("spans", [2, 5])
+def test_spans_cover_the_file_in_order(spans):
+    pcm = fake_pcm(600, gaps=range(50, 600, 60))
+    plan = vt.plan_vosk_spans("a.mp4", 600.0, spans, min_span=60, pcm=pcm)
+    starts = [start for start, _ in plan]
+    assert len(plan) == spans and starts == sorted(starts) and starts[0] == 0.0
+    assert plan[-1][1] is None